@@ -3,6 +3,14 @@ import math
 import random
 import numpy as np
 
+# cutter subdivisions and share of the point density of the viewport proxy
+PROXY_SUBDIVISIONS = 3
+PROXY_DENSITY = 0.1
+# emission pool: points per square unit when no density is given, and how
+# close to the cutter's surface a pool point has to be to emit
+EMISSION_DENSITY = 2500.0
+EMISSION_BAND = 0.01
+
 
 def purge_orphans():
     """
@@ -33,6 +41,20 @@ def delete_nodes():
             obj.modifiers.remove(modifier)
     
 
+def create_world():
+    """
+    Replace every world with a new one called "World"
+    """
+    # in the case when you modify the world shader
+    # delete and recreate the world object
+    world_names = [world.name for world in bpy.data.worlds]
+    for name in world_names:
+        bpy.data.worlds.remove(bpy.data.worlds[name])
+    # create a new world data block
+    bpy.ops.world.new()
+    bpy.context.scene.world = bpy.data.worlds["World"]
+
+
 def clean_scene():
     """
     Removing all of the objects, collection, materials, particles,
@@ -60,14 +82,7 @@ def clean_scene():
     delete_materials()
     delete_nodes()
 
-    # in the case when you modify the world shader
-    # delete and recreate the world object
-    world_names = [world.name for world in bpy.data.worlds]
-    for name in world_names:
-        bpy.data.worlds.remove(bpy.data.worlds[name])
-    # create a new world data block
-    bpy.ops.world.new()
-    bpy.context.scene.world = bpy.data.worlds["World"]
+    create_world()
 
     purge_orphans()
 
@@ -188,7 +203,98 @@ def create_empty_sphere():
     return empty_sphere
 
 
-def create_dissolve_effect(mesh):
+def create_emission_pool(obj, density, seed=0):
+    """
+    Points spread once over the surface of obj, each with its normal and a random value
+    """
+    mesh = obj.data
+    mesh.calc_loop_triangles()
+    corners = np.empty(len(mesh.loop_triangles) * 3, dtype=np.int32)
+    mesh.loop_triangles.foreach_get("vertices", corners)
+    positions = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", positions)
+    triangles = positions.reshape(-1, 3)[corners.reshape(-1, 3)]
+
+    # area weighted triangles, uniform points inside each
+    edges_a = triangles[:, 1] - triangles[:, 0]
+    edges_b = triangles[:, 2] - triangles[:, 0]
+    cross = np.cross(edges_a, edges_b)
+    areas = np.linalg.norm(cross, axis=1) / 2
+    rng = np.random.default_rng(seed)
+    count = rng.poisson(density * areas.sum()) if areas.sum() > 0 else 0
+    picked = rng.choice(len(areas), size=count, p=areas / areas.sum()) if count else np.empty(0, dtype=np.int64)
+    u = rng.random(count, dtype=np.float32)
+    v = rng.random(count, dtype=np.float32)
+    outside = u + v > 1
+    u[outside], v[outside] = 1 - u[outside], 1 - v[outside]
+    points = triangles[picked, 0] + u[:, None] * edges_a[picked] + v[:, None] * edges_b[picked]
+    normals = cross[picked] / (2 * areas[picked, None])
+
+    # loose vertices in the object's space, they do not render themselves
+    pool = bpy.data.meshes.new("EmissionPool")
+    pool.from_pydata(points.tolist(), [], [])
+    pool.attributes.new("emit_normal", 'FLOAT_VECTOR', 'POINT').data.foreach_set("vector", normals.ravel())
+    # 8 bits are plenty for the speed variation
+    pool.attributes.new("emit_random", 'INT8', 'POINT').data.foreach_set("value", rng.integers(0, 128, count))
+    pool_obj = bpy.data.objects.new("EmissionPool", pool)
+    bpy.context.scene.collection.objects.link(pool_obj)
+    pool_obj.parent = obj
+    return pool_obj
+
+
+def proxy_group():
+    """
+    Shared node group whose output is True in the viewport while proxies are enabled
+    """
+    # one group for every project, toggled through its 'Proxy Enabled' node
+    # (see pipeline/proxy.py); renders are never viewport, they get full resolution
+    if "Proxy" in bpy.data.node_groups:
+        return bpy.data.node_groups["Proxy"]
+    group = bpy.data.node_groups.new(name="Proxy", type='GeometryNodeTree')
+    group.interface.new_socket('Proxy', in_out='OUTPUT', socket_type='NodeSocketBool')
+
+    enabled = group.nodes.new(type='FunctionNodeInputBool')
+    enabled.name = "Proxy Enabled"
+    enabled.boolean = False
+    enabled.location = (-200, 100)
+
+    is_viewport = group.nodes.new(type='GeometryNodeIsViewport')
+    is_viewport.location = (-200, -100)
+
+    both = group.nodes.new(type='FunctionNodeBooleanMath')
+    both.operation = 'AND'
+    both.location = (0, 0)
+
+    group_output = group.nodes.new(type='NodeGroupOutput')
+    group_output.location = (200, 0)
+
+    group.links.new(enabled.outputs['Boolean'], both.inputs[0])
+    group.links.new(is_viewport.outputs['Is Viewport'], both.inputs[1])
+    group.links.new(both.outputs['Boolean'], group_output.inputs['Proxy'])
+    return group
+
+
+def add_proxy_node(node_tree, location=(0, 0)):
+    proxy = node_tree.nodes.new(type='GeometryNodeGroup')
+    proxy.node_tree = proxy_group()
+    proxy.location = location
+    return proxy
+
+
+def proxy_value(node_tree, proxy, full, low, location=(0, 0)):
+    """
+    Math node giving `low` while the proxy is on and `full` otherwise
+    """
+    value = node_tree.nodes.new(type='ShaderNodeMath')
+    value.operation = 'MULTIPLY_ADD'
+    value.inputs[1].default_value = low - full
+    value.inputs[2].default_value = full
+    value.location = location
+    node_tree.links.new(proxy.outputs['Proxy'], value.inputs[0])
+    return value
+
+
+def create_dissolve_effect(mesh, pool):
     # Add a Geometry Nodes modifier to the base sphere
     sphere = create_empty_sphere()
     mod = mesh.modifiers.new(name="GeometryNodes", type='NODES')
@@ -223,22 +329,43 @@ def create_dissolve_effect(mesh):
     transf_ico_sphere = node_tree.nodes.new(type="GeometryNodeTransform")
     transf_ico_sphere.location = (300, 200)
     
-    # Create Distribute Points on Face
-    dist_points_f = node_tree.nodes.new(type="GeometryNodeDistributePointsOnFaces")
-    dist_points_f.inputs['Density'].default_value = 2500.0
-    dist_points_f.location = (1100, 400)
+    # Create Object Info for the emission pool, sampled once by create_emission_pool
+    pool_info = node_tree.nodes.new(type='GeometryNodeObjectInfo')
+    pool_info.inputs[0].default_value = pool
+    pool_info.transform_space = 'RELATIVE'
+    pool_info.location = (700, 800)
+    
+    # Emit from the pool points the cutter's surface passes
+    mesh_to_points = node_tree.nodes.new(type="GeometryNodeMeshToPoints")
+    mesh_to_points.mode = 'VERTICES'
+    mesh_to_points.inputs['Radius'].default_value = 0.08
+    mesh_to_points.location = (1300, 700)
     
     # Create Geometry Proximity
     geo_proxim = node_tree.nodes.new(type="GeometryNodeProximity")
-    geo_proxim.target_element = 'POINTS'
+    geo_proxim.target_element = 'FACES'
     geo_proxim.location = (700, 400)
     
     # Create Geometry Proximity
     math_less_than = node_tree.nodes.new(type="ShaderNodeMath")
-    math_less_than.inputs[1].default_value = 0.0001
+    math_less_than.inputs[1].default_value = EMISSION_BAND
     math_less_than.operation = 'LESS_THAN'
     math_less_than.location = (900, 600)
     
+    # Keep a share of the pool, the same points every frame
+    emit_keep = node_tree.nodes.new(type="FunctionNodeRandomValue")
+    emit_keep.data_type = 'BOOLEAN'
+    emit_keep.location = (900, 800)
+    
+    emit_select = node_tree.nodes.new(type="FunctionNodeBooleanMath")
+    emit_select.operation = 'AND'
+    emit_select.location = (1100, 700)
+    
+    # Viewport proxy: coarser cutter and fewer points
+    proxy = add_proxy_node(node_tree, location=(-200, 500))
+    proxy_subdivisions = proxy_value(node_tree, proxy, 6, PROXY_SUBDIVISIONS, location=(-100, 400))
+    proxy_density_scale = proxy_value(node_tree, proxy, 1.0, PROXY_DENSITY, location=(700, 1000))
+
     # Create Simulation Zone TODO::
     
     # Create Join Geometry
@@ -249,59 +376,44 @@ def create_dissolve_effect(mesh):
     set_points = node_tree.nodes.new(type="GeometryNodeSetPosition")
     set_points.location = (1800, 500)
     
-    # Create Store Named Attribute
-    store_n_attr = node_tree.nodes.new(type="GeometryNodeStoreNamedAttribute")
-    store_n_attr.location = (2000, 500)
-    store_n_attr.data_type = 'FLOAT_VECTOR'
-    store_n_attr.inputs['Name'].default_value = 'Val'
-    
-    # Create Named Attribute
-    named_attr = node_tree.nodes.new(type="GeometryNodeInputNamedAttribute")
-    named_attr.location = (1100, 100)
-    named_attr.data_type = 'FLOAT_VECTOR'
-    named_attr.inputs['Name'].default_value = 'Val'
+    # Drop the pool attributes once the offset has read them, only radius and 'PR' leave the tree
+    # ('Val', the accumulated offset, is left out until the simulation zone can carry it between frames)
+    drop_normal = node_tree.nodes.new(type="GeometryNodeRemoveAttribute")
+    drop_normal.location = (2000, 500)
+    drop_normal.inputs['Name'].default_value = 'emit_normal'
     
-    # Create Route
-    route = node_tree.nodes.new(type="NodeReroute")
-    route.location = (1600, 200)
+    drop_random = node_tree.nodes.new(type="GeometryNodeRemoveAttribute")
+    drop_random.location = (2150, 500)
+    drop_random.inputs['Name'].default_value = 'emit_random'
     
-    # Create Vector Math Add
-    vect_math = node_tree.nodes.new(type="ShaderNodeVectorMath")
-    vect_math.location = (1650, -250)
-    
-    # Create Vector Math Normalize
-    vect_math_norm = node_tree.nodes.new(type="ShaderNodeVectorMath")
-    vect_math_norm.location = (1300, 350)
-    vect_math_norm.operation = 'NORMALIZE'
+    # Create Named Attribute for the pool normal
+    emit_normal = node_tree.nodes.new(type="GeometryNodeInputNamedAttribute")
+    emit_normal.location = (1100, 350)
+    emit_normal.data_type = 'FLOAT_VECTOR'
+    emit_normal.inputs['Name'].default_value = 'emit_normal'
     
     # Create Vector Math Scale
     vect_math_scale = node_tree.nodes.new(type="ShaderNodeVectorMath")
     vect_math_scale.location = (1350, 150)
     vect_math_scale.operation = 'SCALE'
     
-    # Create Random Value 
-    rand_val = node_tree.nodes.new(type="FunctionNodeRandomValue")
-    rand_val.location = (1150, -70)
-    rand_val.inputs['Min'].default_value = 0.005
-    rand_val.inputs['Max'].default_value = 0.02
-    
-    # Create Index
-    indx = node_tree.nodes.new(type="GeometryNodeInputIndex")
-    indx.location = (900, -300)
+    # Create Named Attribute for the pool random value
+    emit_random = node_tree.nodes.new(type="GeometryNodeInputNamedAttribute")
+    emit_random.location = (900, -70)
+    emit_random.data_type = 'INT'
+    emit_random.inputs['Name'].default_value = 'emit_random'
     
-    # Create Scene Time
-    scene_time = node_tree.nodes.new(type="GeometryNodeInputSceneTime")
-    scene_time.location = (800, 200)
+    # Map the random value (0 - 127) to 0.005 - 0.02
+    rand_val = node_tree.nodes.new(type="ShaderNodeMath")
+    rand_val.location = (1150, -70)
+    rand_val.operation = 'MULTIPLY_ADD'
+    rand_val.inputs[1].default_value = 0.015 / 127
+    rand_val.inputs[2].default_value = 0.005
     
     # Create Point Radius
     p_radius = node_tree.nodes.new(type="GeometryNodeSetPointRadius")
     p_radius.location = (2300, 500)
     
-    # Create Point Radius
-    p_radius_dist = node_tree.nodes.new(type="GeometryNodeSetPointRadius")
-    p_radius_dist.location = (1300, 700)
-    p_radius_dist.inputs['Radius'].default_value = 0.08
-    
     # Create Math Substract 
     math_node_sub = node_tree.nodes.new(type="ShaderNodeMath")
     math_node_sub.location = (2150, 200)
@@ -383,6 +495,8 @@ def create_dissolve_effect(mesh):
     # Make particles editables
     store_output_attr = node_tree.nodes.new(type="GeometryNodeStoreNamedAttribute")
     store_output_attr.location = (3300, 400)
+    store_output_attr.data_type = 'FLOAT'
+    store_output_attr.domain = 'POINT'
     store_output_attr.inputs['Name'].default_value = 'PR'
     
     # Set Material Node
@@ -393,10 +507,6 @@ def create_dissolve_effect(mesh):
     group_input_part = node_tree.nodes.new(type="NodeGroupInput")
     group_input_part.location = (2600, 100)
     
-    # Create Group input for density
-    group_input_dens = node_tree.nodes.new(type="NodeGroupInput")
-    group_input_dens.location = (600, 600)
-    
     group_output = node_tree.nodes.new(type='NodeGroupOutput')
     node_tree.interface.new_socket('Mesh', in_out='OUTPUT', socket_type='NodeSocketGeometry')
     group_output.location = (5000, 0)
@@ -409,7 +519,8 @@ def create_dissolve_effect(mesh):
     node_tree.links.new(group_input_part.outputs['Value'], math_node_div.inputs[1])
     node_tree.links.new(group_input_part.outputs['Material'], set_output_material.inputs['Material'])
     node_tree.links.new(math_radius_part.outputs['Radius'], store_output_attr.inputs['Value'])
-    node_tree.links.new(group_input_dens.outputs['Value'], dist_points_f.inputs['Density'])
+    node_tree.links.new(proxy_density_scale.outputs['Value'], emit_keep.inputs['Probability'])
+    node_tree.links.new(proxy_subdivisions.outputs['Value'], ico_sphere.inputs['Subdivisions'])
     node_tree.links.new(mesh_visible.outputs['Geometry'], group_output.inputs['Mesh'])
     node_tree.links.new(mesh_boolean.outputs['Mesh'], mesh_visible.inputs['Geometry'])
     node_tree.links.new(ico_sphere.outputs['Mesh'], transf_ico_sphere.inputs['Geometry'])
@@ -417,32 +528,28 @@ def create_dissolve_effect(mesh):
     node_tree.links.new(obj_info.outputs['Rotation'], transf_ico_sphere.inputs['Rotation'])
     node_tree.links.new(obj_info.outputs['Scale'], transf_ico_sphere.inputs['Scale'])
     node_tree.links.new(transf_ico_sphere.outputs['Geometry'], mesh_boolean.inputs['Mesh 2'])
-    node_tree.links.new(mesh_boolean.outputs['Mesh'], dist_points_f.inputs['Mesh'])
+    node_tree.links.new(pool_info.outputs['Geometry'], mesh_to_points.inputs['Mesh'])
     node_tree.links.new(transf_ico_sphere.outputs['Geometry'], geo_proxim.inputs['Target'])
     node_tree.links.new(geo_proxim.outputs['Distance'], math_less_than.inputs['Value'])
-    node_tree.links.new(math_less_than.outputs['Value'], dist_points_f.inputs['Selection'])
+    node_tree.links.new(math_less_than.outputs['Value'], emit_select.inputs[0])
+    node_tree.links.new(emit_keep.outputs[3], emit_select.inputs[1])
+    node_tree.links.new(emit_select.outputs['Boolean'], mesh_to_points.inputs['Selection'])
     node_tree.links.new(join_geo.outputs['Geometry'], set_points.inputs['Geometry'])
-    node_tree.links.new(set_points.outputs['Geometry'], store_n_attr.inputs['Geometry'])
-    node_tree.links.new(named_attr.outputs['Attribute'], vect_math.inputs[0])
-    node_tree.links.new(vect_math.outputs['Vector'], route.inputs['Input'])
-    node_tree.links.new(route.outputs['Output'], set_points.inputs['Offset'])
-    node_tree.links.new(route.outputs['Output'], store_n_attr.inputs['Value'])
-    node_tree.links.new(dist_points_f.outputs['Normal'], vect_math_norm.inputs['Vector'])
-    node_tree.links.new(vect_math_norm.outputs['Vector'], vect_math_scale.inputs['Vector'])
+    node_tree.links.new(set_points.outputs['Geometry'], drop_normal.inputs['Geometry'])
+    node_tree.links.new(drop_normal.outputs['Geometry'], drop_random.inputs['Geometry'])
+    node_tree.links.new(emit_normal.outputs['Attribute'], vect_math_scale.inputs['Vector'])
     node_tree.links.new(vect_math_scale.outputs['Vector'], vect_math_add_rand.inputs['Vector'])
-    node_tree.links.new(vect_math_add_rand.outputs['Vector'], vect_math.inputs[1])
+    node_tree.links.new(vect_math_add_rand.outputs['Vector'], set_points.inputs['Offset'])
     node_tree.links.new(scene_time_rand.outputs['Seconds'], math_add_rand.inputs['Value'])
     node_tree.links.new(math_add_rand.outputs['Value'], math_div_rand.inputs['Value'])
     node_tree.links.new(math_div_rand.outputs['Value'], noise_text_part.inputs['W'])
     node_tree.links.new(noise_text_part.outputs['Color'], vect_math_sub_rand.inputs['Vector'])
     node_tree.links.new(vect_math_sub_rand.outputs['Vector'], vect_math_scale_rand.inputs['Vector'])
     node_tree.links.new(vect_math_scale_rand.outputs['Vector'], vect_math_add_rand.inputs[1])
-    node_tree.links.new(indx.outputs['Index'], rand_val.inputs['Seed'])
+    node_tree.links.new(emit_random.outputs['Attribute'], rand_val.inputs[0])
     node_tree.links.new(rand_val.outputs['Value'], vect_math_scale.inputs['Scale'])
-    node_tree.links.new(scene_time.outputs['Frame'], dist_points_f.inputs['Seed'])
-    node_tree.links.new(store_n_attr.outputs['Geometry'], p_radius.inputs['Points'])
-    node_tree.links.new(dist_points_f.outputs['Points'], p_radius_dist.inputs['Points'])
-    node_tree.links.new(p_radius_dist.outputs['Points'], join_geo.inputs['Geometry'])
+    node_tree.links.new(drop_random.outputs['Geometry'], p_radius.inputs['Points'])
+    node_tree.links.new(mesh_to_points.outputs['Points'], join_geo.inputs['Geometry'])
     node_tree.links.new(math_radius.outputs['Radius'], math_node_sub.inputs['Value'])
     node_tree.links.new(math_node_sub.outputs['Value'], p_radius.inputs['Radius'])
     node_tree.links.new(p_radius.outputs['Points'], del_geo.inputs['Geometry'])
@@ -451,10 +558,19 @@ def create_dissolve_effect(mesh):
     node_tree.links.new(math_radius_part.outputs['Radius'], math_node_div.inputs['Value'])
     node_tree.links.new(math_node_div.outputs['Value'], out_point_radius.inputs['Radius'])
     node_tree.links.new(del_geo.outputs['Geometry'], out_point_radius.inputs['Points'])
-    
+
+    return mod
+
+
+def set_modifier_input(mod, name, value):
+    """
+    Set a Geometry Nodes modifier input by its interface name
+    """
+    identifier = mod.node_group.interface.items_tree[name].identifier
+    mod[identifier] = value
 
     
-def scene_setup(num_points=1000):
+def scene_setup(num_points=1000, density=None):
     save_as_mp4()
     clean_scene()
     set_environment(num_points)
@@ -468,7 +584,18 @@ def scene_setup(num_points=1000):
     set_camera(loc, rot)
     mesh = bpy.data.objects['textured']
     create_mesh_sand_shader(mesh)
-    create_dissolve_effect(mesh)
+    add_dissolve_effect(mesh, density)
+
+
+def add_dissolve_effect(mesh, density=None):
+    # the pool is sampled here once instead of distributing points every frame
+    pool = create_emission_pool(mesh, EMISSION_DENSITY if density is None else density)
+    mod = create_dissolve_effect(mesh, pool)
+
+    # the 'Value' input divides the particle radius
+    if density is not None:
+        set_modifier_input(mod, "Value", density)
+    return mod
     
     
 def add_lights():
@@ -478,11 +605,37 @@ def add_lights():
     bpy.context.object.data.diffuse_factor = 1.0
 
 
+def build(density=None):
+    """
+    Build the scene without rendering it
+    """
+    scene_setup(density=density)
+
+
+def build_steps(density=None):
+    """
+    build() as named steps, for incremental rebuilds with pipeline/reconcile.py
+    """
+    # values as scene_setup() uses them; 'textured' comes with the .blend and
+    # is not owned by any step, the undo functions strip what the steps add to it
+    return [
+        {"id": "output", "run": save_as_mp4},
+        {"id": "world", "run": create_world},
+        {"id": "environment", "run": set_environment, "args": (1000,), "depends": ("world",)},
+        {"id": "lights", "run": add_lights, "repeat": 3},
+        {"id": "camera", "run": set_camera, "args": ((2.9, -6.4, 1.32), (math.radians(91), 0, math.radians(24)))},
+        {"id": "sand_shader", "run": create_mesh_sand_shader, "args": lambda: (bpy.data.objects['textured'],),
+         "undo": delete_materials},
+        {"id": "dissolve", "run": add_dissolve_effect, "args": lambda: (bpy.data.objects['textured'], density),
+         "undo": delete_nodes},
+    ]
+
+
 def main():
     """
     Python code that creates a Fibinacci Spiral
     """
-    scene_setup()
+    build()
 #    render_loop()
 
 
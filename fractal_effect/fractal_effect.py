@@ -3,6 +3,9 @@ import math
 import random
 import numpy as np
 
+# extrusion levels of the viewport proxy
+PROXY_DEPTH = 3
+
 
 def purge_orphans():
     """
@@ -11,6 +14,20 @@ def purge_orphans():
     bpy.ops.outliner.orphans_purge(do_local_ids=True, do_linked_ids=True, do_recursive=True)
 
 
+def create_world():
+    """
+    Replace every world with a new one called "World"
+    """
+    # in the case when you modify the world shader
+    # delete and recreate the world object
+    world_names = [world.name for world in bpy.data.worlds]
+    for name in world_names:
+        bpy.data.worlds.remove(bpy.data.worlds[name])
+    # create a new world data block
+    bpy.ops.world.new()
+    bpy.context.scene.world = bpy.data.worlds["World"]
+
+
 def clean_scene():
     """
     Removing all of the objects, collection, materials, particles,
@@ -35,14 +52,7 @@ def clean_scene():
     for name in collection_names:
         bpy.data.collections.remove(bpy.data.collections[name])
 
-    # in the case when you modify the world shader
-    # delete and recreate the world object
-    world_names = [world.name for world in bpy.data.worlds]
-    for name in world_names:
-        bpy.data.worlds.remove(bpy.data.worlds[name])
-    # create a new world data block
-    bpy.ops.world.new()
-    bpy.context.scene.world = bpy.data.worlds["World"]
+    create_world()
 
     purge_orphans()
 
@@ -193,7 +203,46 @@ def create_extrude_group(node_tree, to=[0, 0, 250, 0]):
     return extrude_mesh, scale_extr
 
 
-def geometry_node_setup(base_sphere):
+def proxy_group():
+    """
+    Shared node group whose output is True in the viewport while proxies are enabled
+    """
+    # one group for every project, toggled through its 'Proxy Enabled' node
+    # (see pipeline/proxy.py); renders are never viewport, they get full resolution
+    if "Proxy" in bpy.data.node_groups:
+        return bpy.data.node_groups["Proxy"]
+    group = bpy.data.node_groups.new(name="Proxy", type='GeometryNodeTree')
+    group.interface.new_socket('Proxy', in_out='OUTPUT', socket_type='NodeSocketBool')
+
+    enabled = group.nodes.new(type='FunctionNodeInputBool')
+    enabled.name = "Proxy Enabled"
+    enabled.boolean = False
+    enabled.location = (-200, 100)
+
+    is_viewport = group.nodes.new(type='GeometryNodeIsViewport')
+    is_viewport.location = (-200, -100)
+
+    both = group.nodes.new(type='FunctionNodeBooleanMath')
+    both.operation = 'AND'
+    both.location = (0, 0)
+
+    group_output = group.nodes.new(type='NodeGroupOutput')
+    group_output.location = (200, 0)
+
+    group.links.new(enabled.outputs['Boolean'], both.inputs[0])
+    group.links.new(is_viewport.outputs['Is Viewport'], both.inputs[1])
+    group.links.new(both.outputs['Boolean'], group_output.inputs['Proxy'])
+    return group
+
+
+def add_proxy_node(node_tree, location=(0, 0)):
+    proxy = node_tree.nodes.new(type='GeometryNodeGroup')
+    proxy.node_tree = proxy_group()
+    proxy.location = location
+    return proxy
+
+
+def geometry_node_setup(base_sphere, depth=7):
     extrude_nodes = {}
     # Add a Geometry Nodes modifier to the base sphere
     mod = base_sphere.modifiers.new(name="GeometryNodes", type='NODES')
@@ -215,7 +264,7 @@ def geometry_node_setup(base_sphere):
     
     node_tree.links.new(group_input.outputs["Mesh"], extrude.inputs["Mesh"])
     
-    for i in range(1, 7):
+    for i in range(1, depth):
         extrude_mesh, scale_extr = create_extrude_group(node_tree)
         extrude_nodes[f'Extrude_{i}'] = extrude_mesh
         extrude_nodes[f'Scale_{i}'] = scale_extr
@@ -223,33 +272,31 @@ def geometry_node_setup(base_sphere):
         scale = scale_extr
     
     node_tree.links.new(scale.outputs["Geometry"], group_output.inputs["Mesh"])
+
+    # while proxies are on, the levels past PROXY_DEPTH extrude nothing
+    proxy = add_proxy_node(node_tree, location=(-300, -300))
+    full_only = node_tree.nodes.new(type='FunctionNodeBooleanMath')
+    full_only.operation = 'NOT'
+    full_only.location = (-100, -300)
+    node_tree.links.new(proxy.outputs['Proxy'], full_only.inputs[0])
+    for level in range(PROXY_DEPTH, depth):
+        node_tree.links.new(full_only.outputs['Boolean'], extrude_nodes[f'Extrude_{level}'].inputs['Selection'])
     
-    create_animation_loop(
-        extrude_nodes['Scale_6'].inputs["Scale"],
-        "default_value",
-        start_value=0.0,
-        mid_value=0.5,
-        end_value=1.0,
-        start_frame=1
-    )
-    
-    create_animation_loop(
-        extrude_nodes['Scale_1'].inputs["Scale"],
-        "default_value",
-        start_value=0.0,
-        mid_value=0.5,
-        end_value=1.0,
-        start_frame=1
-    )
-    
-    create_animation_loop(
-        extrude_nodes['Scale_4'].inputs["Scale"],
-        "default_value",
-        start_value=0.0,
-        mid_value=0.5,
-        end_value=1.0,
-        start_frame=1
-    )
+    # animate the last level plus levels 1 and 4 when the fractal is deep enough
+    animated_levels = []
+    for level in (depth - 1, 1, 4):
+        if f'Scale_{level}' in extrude_nodes and level not in animated_levels:
+            animated_levels.append(level)
+
+    for level in animated_levels:
+        create_animation_loop(
+            extrude_nodes[f'Scale_{level}'].inputs["Scale"],
+            "default_value",
+            start_value=0.0,
+            mid_value=0.5,
+            end_value=1.0,
+            start_frame=1
+        )
 
 
 def create_sphere_shader(sphere):
@@ -283,18 +330,40 @@ def create_sphere_shader(sphere):
     sphere.data.materials.append(mat)
 
 
-def generate_fractal_sphere():
+def generate_fractal_sphere(depth=7):
     sphere = generate_sphere()
-    geometry_node_setup(sphere)
+    geometry_node_setup(sphere, depth)
     create_sphere_shader(sphere)
 
 
+def build(depth=7):
+    """
+    Build the scene without rendering it
+    """
+    scene_setup()
+    generate_fractal_sphere(depth)
+
+
+def build_steps(depth=7):
+    """
+    build() as named steps, for incremental rebuilds with pipeline/reconcile.py
+    """
+    # values as scene_setup() uses them
+    return [
+        {"id": "output", "run": save_as_mp4},
+        {"id": "world", "run": create_world},
+        {"id": "lights", "run": add_lights},
+        {"id": "environment", "run": set_environment, "args": (140,), "depends": ("world",)},
+        {"id": "camera", "run": set_camera, "args": ((0.0, -11.0, 9.2), (math.radians(50), 0, 0))},
+        {"id": "sphere", "run": generate_fractal_sphere, "args": (depth,)},
+    ]
+
+
 def main():
     """
     Python code that creates a Spike Sphere
     """
-    scene_setup()
-    generate_fractal_sphere()
+    build()
     render_loop()
     
 
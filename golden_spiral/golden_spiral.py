@@ -3,6 +3,12 @@ import math
 import random
 import numpy as np
 
+SPHERE_RADIUS = 3.5
+# sphere meshes from fine to coarse: segments, rings and the smallest
+# projected diameter in pixels the level is used for
+LOD_LEVELS = ((32, 16, 80), (16, 8, 20), (8, 4, 0))
+LOD_NAME = "GoldenSphere.LOD"
+
 
 def purge_orphans():
     """
@@ -11,6 +17,20 @@ def purge_orphans():
     bpy.ops.outliner.orphans_purge(do_local_ids=True, do_linked_ids=True, do_recursive=True)
 
 
+def create_world():
+    """
+    Replace every world with a new one called "World"
+    """
+    # in the case when you modify the world shader
+    # delete and recreate the world object
+    world_names = [world.name for world in bpy.data.worlds]
+    for name in world_names:
+        bpy.data.worlds.remove(bpy.data.worlds[name])
+    # create a new world data block
+    bpy.ops.world.new()
+    bpy.context.scene.world = bpy.data.worlds["World"]
+
+
 def clean_scene():
     """
     Removing all of the objects, collection, materials, particles,
@@ -35,22 +55,23 @@ def clean_scene():
     for name in collection_names:
         bpy.data.collections.remove(bpy.data.collections[name])
 
-    # in the case when you modify the world shader
-    # delete and recreate the world object
-    world_names = [world.name for world in bpy.data.worlds]
-    for name in world_names:
-        bpy.data.worlds.remove(bpy.data.worlds[name])
-    # create a new world data block
-    bpy.ops.world.new()
-    bpy.context.scene.world = bpy.data.worlds["World"]
+    create_world()
 
     purge_orphans()
 
 
 def render_loop():
+    install_lod()
     bpy.ops.render.render(animation=True)
 
 
+def prepare_render(scene):
+    """
+    Called by pipeline/cli.py before any render of the scene
+    """
+    install_lod()
+
+
 def save_as_mp4(name="golden_loop"):
     project_name = name
     bpy.context.scene.render.image_settings.file_format = "FFMPEG"
@@ -206,13 +227,11 @@ def add_lights():
     bpy.context.object.data.angle = math.radians(45)
 
 
-def apply_emission_material(obj):
-    color = (0.913041, 0.1996, 1, 1)
-
+def apply_emission_material(obj, color=(0.913041, 0.1996, 1, 1)):
     mat = bpy.data.materials.new(name="NeonMaterial")
     mat.use_nodes = True
     emission_shader = mat.node_tree.nodes.new(type="ShaderNodeEmission")
-    emission_shader.inputs["Color"].default_value = color # Purple color
+    emission_shader.inputs["Color"].default_value = color # Purple color by default
     emission_shader.inputs["Strength"].default_value = 7.0
     
     # Link emission shader to Material Output
@@ -233,28 +252,169 @@ def generate_coordonates(num_points=1000, scale_factor=0.7, pitch=0.005):
     return x, y, z
 
 
-def generate_golden_spiral():
-    X, Y, Z = generate_coordonates()
-    current_frame = 0
+def create_lod_meshes(template):
+    """
+    One shared sphere mesh per LOD level, the template's own mesh is the finest
+    """
+    meshes = [template.data]
+    for segments, rings, _ in LOD_LEVELS[1:]:
+        bpy.ops.mesh.primitive_uv_sphere_add(segments=segments, ring_count=rings, radius=SPHERE_RADIUS,
+                                             enter_editmode=False, align="WORLD", location=(0, 0, -10))
+        obj = bpy.context.active_object
+        meshes.append(obj.data)
+        bpy.data.objects.remove(obj, do_unlink=True)
+
+    for level, mesh in enumerate(meshes):
+        # the coarse levels of a previous build are kept alive by their fake user
+        old = bpy.data.meshes.get(f"{LOD_NAME}{level}")
+        if old is not None and old != mesh:
+            bpy.data.meshes.remove(old)
+        mesh.name = f"{LOD_NAME}{level}"
+        # levels no sphere uses at the moment are saved with the file too
+        mesh.use_fake_user = True
+        if mesh != template.data:
+            mesh.materials.append(template.data.materials[0])
+    return meshes
+
+
+def lod_levels(camera, positions, resolution, radius=SPHERE_RADIUS):
+    """
+    LOD level for every position, from its projected diameter in pixels; outside the view is the coarsest
+    """
+    matrix = np.array(camera.matrix_world)
+    # camera space: the camera looks down its -Z axis
+    relative = positions - matrix[:3, 3]
+    x, y = relative @ matrix[:3, 0], relative @ matrix[:3, 1]
+    depth = -(relative @ matrix[:3, 2])
+
+    width, height = resolution
+    tan_x = camera.data.sensor_width / (2 * camera.data.lens)
+    tan_y = tan_x * height / width
+    safe_depth = np.maximum(depth, 1e-6)
+    diameter = 2 * radius / (safe_depth * tan_x) * width / 2
+    visible = ((depth > -radius) & (np.abs(x) <= safe_depth * tan_x + radius)
+               & (np.abs(y) <= safe_depth * tan_y + radius))
+
+    levels = np.full(len(positions), len(LOD_LEVELS) - 1)
+    for level in reversed(range(len(LOD_LEVELS) - 1)):
+        levels[visible & (diameter >= LOD_LEVELS[level][2])] = level
+    return levels
+
+
+def view_cameras(scene):
+    """
+    Cameras the active views of a multi-view render look through, only the scene camera otherwise
+    """
+    render = scene.render
+    if not render.use_multiview or render.views_format != "MULTIVIEW":
+        return [scene.camera]
+    views = [view for view in render.views if view.use]
+    # Blender swaps the view suffix the scene camera's name ends with for each view's own
+    suffix = max((view.camera_suffix for view in render.views
+                  if view.camera_suffix and scene.camera.name.endswith(view.camera_suffix)), key=len, default="")
+    prefix = scene.camera.name[:len(scene.camera.name) - len(suffix)]
+    cameras = [scene.objects.get(prefix + view.camera_suffix) for view in views]
+    return [scene.camera if camera is None else camera for camera in cameras]
+
+
+@bpy.app.handlers.persistent
+def update_lod(scene, depsgraph=None):
+    """
+    Give every sphere the mesh matching its size on screen, from the camera of every view that renders it
+    """
+    meshes = [bpy.data.meshes.get(f"{LOD_NAME}{level}") for level in range(len(LOD_LEVELS))]
+    if scene.camera is None or None in meshes:
+        return
+    names = {mesh.name: level for level, mesh in enumerate(meshes)}
+    spheres = [obj for obj in scene.objects if obj.data is not None and obj.data.name in names]
+    if not spheres:
+        return
+
+    def evaluated(obj):
+        return obj if depsgraph is None else obj.evaluated_get(depsgraph)
+
+    render = scene.render
+    resolution = (render.resolution_x * render.resolution_percentage / 100,
+                  render.resolution_y * render.resolution_percentage / 100)
+    # the depsgraph being rendered holds this frame's positions, the original objects need not
+    positions = np.array([evaluated(sphere).matrix_world for sphere in spheres], dtype=np.float64)[:, :3, 3]
+    # the finest level any view needs
+    levels = np.min([lod_levels(evaluated(camera), positions, resolution) for camera in view_cameras(scene)],
+                    axis=0)
+    for sphere, level in zip(spheres, levels):
+        # assigning the mesh it already has would still tag the object for an update
+        if names[sphere.data.name] != level:
+            sphere.data = meshes[level]
+
+
+def install_lod():
+    """
+    Swap sphere meshes on every frame change, with one handler however often the script was loaded
+    """
+    handlers = bpy.app.handlers.frame_change_post
+    # each load of the script makes a new function, and persistent handlers outlive file loads
+    for handler in list(handlers):
+        if handler.__name__ == update_lod.__name__ and handler.__module__ == update_lod.__module__:
+            handlers.remove(handler)
+    handlers.append(update_lod)
 
-    for x, y, z in zip(X, Y, Z):
-        bpy.ops.mesh.primitive_uv_sphere_add(radius=3.5, enter_editmode=False, align="WORLD", location=(0, 0, -10))
-        sphere = bpy.context.active_object
 
+def generate_golden_spiral(num_points=1000, color=(0.913041, 0.1996, 1, 1)):
+    X, Y, Z = generate_coordonates(num_points)
+    current_frame = 0
+
+    # create a single sphere with the operator, every other point is a
+    # linked copy sharing its mesh and material, so the operator count
+    # does not grow with the number of points
+    bpy.ops.mesh.primitive_uv_sphere_add(radius=SPHERE_RADIUS, enter_editmode=False, align="WORLD",
+                                         location=(0, 0, -10))
+    template = bpy.context.active_object
+    apply_emission_material(template, color)
+    create_lod_meshes(template)
+
+    # copy before keyframing, copies would otherwise share the template's action
+    spheres = [template]
+    for _ in range(len(X) - 1):
+        sphere = template.copy()
+        bpy.context.collection.objects.link(sphere)
+        spheres.append(sphere)
+
+    for sphere, x, y, z in zip(spheres, X, Y, Z):
         sphere.keyframe_insert(data_path="location", frame=current_frame)
         current_frame += 1
         sphere.location = (x, y, z)
-        apply_emission_material(sphere)
 
         sphere.keyframe_insert(data_path="location", frame=current_frame)
     
 
+def build(num_points=1000, color=(0.913041, 0.1996, 1, 1)):
+    """
+    Build the scene without rendering it
+    """
+    scene_setup()
+    generate_golden_spiral(num_points, color)
+
+
+def build_steps(num_points=1000, color=(0.913041, 0.1996, 1, 1)):
+    """
+    build() as named steps, for incremental rebuilds with pipeline/reconcile.py
+    """
+    # values as scene_setup() uses them
+    return [
+        {"id": "output", "run": save_as_mp4},
+        {"id": "world", "run": create_world},
+        {"id": "plane", "run": create_reflective_plane},
+        {"id": "environment", "run": set_environment, "args": (1000,), "depends": ("world",)},
+        {"id": "camera", "run": set_camera, "args": ((0, 0, 0), (math.radians(0), 0, 0))},
+        {"id": "spiral", "run": generate_golden_spiral, "args": (num_points, color)},
+    ]
+
+
 def main():
     """
     Python code that creates a Fibinacci Spiral
     """
-    scene_setup()
-    generate_golden_spiral()
+    build()
     render_loop()
     
 
@@ -0,0 +1,3 @@
+"""
+Shared tooling for building, measuring and rendering the Blender projects
+"""
@@ -0,0 +1,238 @@
+"""
+Batch rendering of several projects with builds overlapped with renders.
+
+One Blender process builds the scenes one after another and saves each to
+the build cache; as soon as a scene is saved its render starts in a separate
+process while the next scene is being built. Builds are mostly single
+threaded Python, so they fit next to a render using the remaining cores, and
+the batch takes about as long as the renders alone. Builds already in the
+cache (see pipeline.sweep) are not repeated.
+
+    python -m pipeline.batch golden_spiral spike_sphere fractal_effect dissolve_mesh --out renders/batch
+    python -m pipeline.batch dissolve_mesh golden_spiral --source dissolve_mesh=dissolve.blend \\
+        --set golden_spiral.num_points=2000 --frames 1 120 --profile preview
+
+A manifest with the build and render timeline of every project is written
+to the output directory.
+"""
+import argparse
+import json
+import os
+import queue
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline.launch import BLENDER, blender_env, cli_command, script_command
+from pipeline.profiles import PROFILES
+from pipeline.projects import BUILD_PARAMS, PROJECTS, ROOT
+from pipeline.sweep import build_key
+
+
+def parse_sets(pairs, projects):
+    """
+    build() parameters per project from PROJECT.NAME=VALUE pairs, values are JSON
+    """
+    params = {project: {} for project in projects}
+    for pair in pairs:
+        target, _, text = pair.partition("=")
+        project, _, name = target.partition(".")
+        if project not in params or name not in BUILD_PARAMS[project]:
+            raise SystemExit(f"--set {pair}: expected PROJECT.NAME=VALUE for one of the batch's projects")
+        try:
+            params[project][name] = json.loads(text)
+        except ValueError:
+            params[project][name] = text
+    return params
+
+
+def plan_batch(projects, params, sources, out_dir, cache_dir):
+    """
+    One entry per project with its cached build and render output
+    """
+    plan = []
+    for project in projects:
+        source = sources.get(project)
+        key = build_key(project, params[project], source)
+        blend = os.path.join(cache_dir, f"{project}-{key}.blend")
+        plan.append({
+            "project": project,
+            "params": params[project],
+            "source_blend": source,
+            "blend": blend,
+            "cache_hit": os.path.exists(blend),
+            "output": os.path.join(out_dir, project),
+        })
+    return plan
+
+
+def render_args(entry, args, threads):
+    cli_args = [entry["project"], "--skip-build", "--output", entry["output"], "--profile", args.profile,
+                "--threads", str(threads)]
+    if args.frames:
+        cli_args += ["--frames", *(str(frame) for frame in args.frames)]
+    if args.step:
+        cli_args += ["--step", str(args.step)]
+    return cli_args
+
+
+def read_builds(stream, events):
+    """
+    Forward the build process's BUILT/FAILED lines to the scheduler
+    """
+    for line in stream:
+        fields = line.split()
+        if fields and fields[0] in ("BUILT", "FAILED"):
+            events.put((fields[0], fields[1]))
+        else:
+            sys.stdout.write(f"[build] {line}")
+    events.put(("EXITED", None))
+
+
+def run_batch(plan, args, out_dir, render_threads, log_dir):
+    """
+    Build the missing scenes in one process and render every scene as soon as it is available
+    """
+    os.makedirs(log_dir, exist_ok=True)
+    start = time.perf_counter()
+    entries = {entry["project"]: entry for entry in plan}
+    ready = [entry for entry in plan if entry["cache_hit"]]
+    to_build = [entry for entry in plan if not entry["cache_hit"]]
+
+    events = queue.Queue()
+    builder = None
+    if to_build:
+        jobs_path = os.path.join(out_dir, "builds.json")
+        with open(jobs_path, "w") as jobs_file:
+            json.dump([{key: entry[key] for key in ("project", "params", "blend", "source_blend")}
+                       for entry in to_build], jobs_file, indent=2)
+        command = script_command("batch_build", ["--jobs", jobs_path], None, args.build_threads,
+                                 args.blender, args.fake)
+        builder = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                                   env=blender_env())
+        threading.Thread(target=read_builds, args=(builder.stdout, events), daemon=True).start()
+        to_build[0]["build_started"] = 0.0
+
+    running = {}
+    building = builder is not None
+    while ready or running or building:
+        # builds finished since the last pass release their renders
+        while True:
+            try:
+                kind, project = events.get_nowait()
+            except queue.Empty:
+                break
+            now = time.perf_counter() - start
+            if kind == "EXITED":
+                building = False
+                continue
+            entry = entries[project]
+            entry["build_finished"] = now
+            entry["build_ok"] = kind == "BUILT"
+            position = to_build.index(entry)
+            if position + 1 < len(to_build):
+                to_build[position + 1]["build_started"] = now
+            print(f"{'built' if entry['build_ok'] else 'BUILD FAILED'} {project} at {now:.1f}s")
+            if entry["build_ok"]:
+                ready.append(entry)
+            else:
+                entry["skipped"] = "build failed"
+
+        while ready and len(running) < args.render_workers:
+            entry = ready.pop(0)
+            entry["command"] = cli_command(render_args(entry, args, render_threads), entry["blend"],
+                                           render_threads, args.blender, args.fake)
+            entry["log"] = os.path.join(log_dir, f"{entry['project']}.log")
+            log_file = open(entry["log"], "w")
+            entry["render_started"] = time.perf_counter() - start
+            process = subprocess.Popen(entry["command"], cwd=ROOT, stdout=log_file, stderr=subprocess.STDOUT,
+                                       env=blender_env())
+            running[process] = (entry, log_file)
+
+        for process in list(running):
+            if process.poll() is None:
+                continue
+            entry, log_file = running.pop(process)
+            log_file.close()
+            entry["render_finished"] = time.perf_counter() - start
+            entry["returncode"] = process.returncode
+            render_time = entry["render_finished"] - entry["render_started"]
+            print(f"{'rendered' if process.returncode == 0 else 'RENDER FAILED'} {entry['project']} "
+                  f"in {render_time:.1f}s")
+        time.sleep(0.05)
+
+    if builder is not None:
+        builder.wait()
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render several projects with builds overlapped with renders")
+    parser.add_argument("projects", nargs="+", choices=sorted(PROJECTS))
+    parser.add_argument("--set", action="append", default=[], metavar="PROJECT.NAME=VALUE",
+                        help="build() parameter of one project, value as JSON, can be repeated")
+    parser.add_argument("--source", action="append", default=[], metavar="PROJECT=BLEND",
+                        help=".blend a project's build starts from, e.g. dissolve_mesh=dissolve.blend")
+    parser.add_argument("--frames", type=int, nargs=2, metavar=("START", "END"))
+    parser.add_argument("--step", type=int)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="final")
+    parser.add_argument("--out", default="renders/batch")
+    parser.add_argument("--cache", default=os.path.join(ROOT, ".cache", "builds"))
+    parser.add_argument("--render-workers", type=int, default=1, help="renders running at once")
+    parser.add_argument("--build-threads", type=int, default=1, help="threads of the build process")
+    parser.add_argument("--blender", default=BLENDER)
+    parser.add_argument("--fake", action="store_true", help="run against the bpy stand-in")
+    parser.add_argument("--dry-run", action="store_true", help="only print the plan")
+    args = parser.parse_args(argv)
+
+    sources = {}
+    for pair in args.source:
+        project, _, path = pair.partition("=")
+        sources[project] = os.path.abspath(path)
+    out_dir = os.path.abspath(args.out)
+    cache_dir = os.path.abspath(args.cache)
+    os.makedirs(out_dir, exist_ok=True)
+
+    cores = os.cpu_count() or 1
+    render_threads = max(1, cores // args.render_workers)
+    plan = plan_batch(args.projects, parse_sets(args.set, args.projects), sources, out_dir, cache_dir)
+    for entry in plan:
+        print(f"{entry['project']:<16} {'cached' if entry['cache_hit'] else 'build'}  {entry['blend']}")
+    if args.dry_run:
+        return 0
+
+    started_at = datetime.now().isoformat(timespec="seconds")
+    wall_time = run_batch(plan, args, out_dir, render_threads, os.path.join(out_dir, "logs"))
+
+    render_total = sum(entry["render_finished"] - entry["render_started"]
+                       for entry in plan if "render_finished" in entry)
+    manifest = {
+        "started_at": started_at,
+        "wall_time": wall_time,
+        "render_time": render_total,
+        # 1.0 means the builds were completely hidden behind the renders
+        "overlap_efficiency": render_total / (wall_time * args.render_workers) if wall_time else 0.0,
+        "render_workers": args.render_workers,
+        "render_threads": render_threads,
+        "projects": plan,
+    }
+    manifest_path = os.path.join(out_dir, "manifest.json")
+    with open(manifest_path, "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+
+    failed = [entry["project"] for entry in plan if entry.get("returncode") != 0]
+    print(f"batch of {len(plan)} in {wall_time:.1f}s, renders {render_total:.1f}s "
+          f"({manifest['overlap_efficiency']:.0%}), manifest at {manifest_path}")
+    if failed:
+        print(f"failed: {', '.join(failed)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
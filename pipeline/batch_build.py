@@ -0,0 +1,65 @@
+"""
+Build several projects one after another in a single Blender process.
+
+The build stage of pipeline.batch: every build in the jobs file is started
+from its own empty or source .blend, saved, and announced on stdout with a
+"BUILT <project> <path>" line, so the coordinator can start its render while
+the next scene is still being built. Blender starts up once for all builds.
+
+    blender -b -P pipeline/batch_build.py -- --jobs batch/builds.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if "--fake" in sys.argv:
+        from pipeline import fake_bpy
+        fake_bpy.install()
+
+import bpy
+
+from pipeline.projects import load_project, script_argv
+from pipeline.scene import prepare_project, reset_scene
+
+BUILT = "BUILT"
+FAILED = "FAILED"
+
+
+def build_all(jobs):
+    """
+    Build and save each job in order; a failed build is reported and the next one still runs
+    """
+    failures = 0
+    for job in jobs:
+        started = time.perf_counter()
+        try:
+            reset_scene(job.get("source_blend"))
+            prepare_project(job["project"])
+            load_project(job["project"]).build(**job["params"])
+            os.makedirs(os.path.dirname(job["blend"]), exist_ok=True)
+            bpy.ops.wm.save_as_mainfile(filepath=job["blend"])
+        except Exception as error:
+            failures += 1
+            print(f"{FAILED} {job['project']} {error!r}", flush=True)
+            continue
+        print(f"{BUILT} {job['project']} {job['blend']} {time.perf_counter() - started:.3f}", flush=True)
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build several projects in one Blender process")
+    parser.add_argument("--jobs", required=True, help="JSON list of {project, params, blend, source_blend}")
+    parser.add_argument("--fake", action="store_true", help="run against the bpy stand-in instead of Blender")
+    args = parser.parse_args(script_argv() if argv is None else argv)
+
+    with open(args.jobs) as jobs_file:
+        jobs = json.load(jobs_file)
+    return 1 if build_all(jobs) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""
+Headless benchmark of the project build paths with scaling sweeps.
+
+Each project is rebuilt from an empty file for every value of its size
+parameter; the build time, bpy.ops calls, per-frame evaluation time and
+memory are stored as a JSON baseline, with the bytes each attribute of the
+evaluated geometry takes at the frame where they peak. With --fake the builders run against
+the recording bpy stand-in, which measures the Python-side cost of a build
+on machines without Blender.
+
+    blender -b -P pipeline/benchmark.py -- --out benchmarks/blender.json
+    python -m pipeline.benchmark --fake --out benchmarks/stand-in.json --compare benchmarks/previous.json
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if "--fake" in sys.argv:
+        from pipeline import fake_bpy
+        fake_bpy.install()
+
+import bpy
+
+from pipeline.profiling import OpsCounter, current_rss_mb, datablock_counts, peak_rss_mb
+from pipeline.projects import PROJECTS, load_project, script_argv
+from pipeline.scene import prepare_project, reset_scene
+
+# size parameter of each project's build() and the values swept over
+SWEEPS = {
+    "golden_spiral": ("num_points", (100, 250, 500, 1000, 2000)),
+    "spike_sphere": ("subdivisions", (2, 3, 4, 5, 6)),
+    "fractal_effect": ("depth", (2, 3, 4, 5, 6, 7)),
+    "dissolve_mesh": ("density", (500.0, 1000.0, 2500.0, 5000.0, 10000.0)),
+}
+
+# bytes per element of each attribute data type as Blender stores it
+ATTRIBUTE_BYTES = {
+    "FLOAT": 4, "INT": 4, "INT8": 1, "BOOLEAN": 1, "FLOAT2": 8, "INT32_2D": 8, "FLOAT_VECTOR": 12,
+    "FLOAT_COLOR": 16, "BYTE_COLOR": 4, "QUATERNION": 16, "STRING": 0,
+}
+
+# frames evaluated after each build to measure the per-frame depsgraph cost
+EVAL_FRAMES = 5
+
+
+def sample_frames(scene, count=EVAL_FRAMES):
+    """
+    Frames spread evenly over the scene's frame range
+    """
+    start, end = scene.frame_start, max(scene.frame_end, scene.frame_start)
+    if count <= 1 or end == start:
+        return [start]
+    step = (end - start) / (count - 1)
+    return sorted({round(start + step * index) for index in range(count)})
+
+
+def attribute_bytes(depsgraph):
+    """
+    Bytes per attribute name over every evaluated mesh and point cloud
+
+    Geometry nodes output other than the object's own type, such as the
+    dissolve particles, is only reachable as an instance of the object, so
+    the instances are walked as in export_geometry.frame_records. Data
+    shared by several instances is counted once.
+    """
+    sizes = {}
+    counted = set()
+    for instance in depsgraph.object_instances:
+        obj = instance.object
+        if obj.type not in ("MESH", "POINTCLOUD") or obj.data is None:
+            continue
+        if obj.data.as_pointer() in counted:
+            continue
+        counted.add(obj.data.as_pointer())
+        for attribute in obj.data.attributes:
+            size = len(attribute.data) * ATTRIBUTE_BYTES.get(attribute.data_type, 0)
+            sizes[attribute.name] = sizes.get(attribute.name, 0) + size
+    return sizes
+
+
+def measure_evaluation(scene, frames):
+    """
+    Evaluation time of each frame and the attribute bytes of the frame with the most geometry
+    """
+    timings = []
+    peak = {}
+    for frame in frames:
+        start = time.perf_counter()
+        scene.frame_set(frame)
+        depsgraph = bpy.context.evaluated_depsgraph_get()
+        timings.append(time.perf_counter() - start)
+        sizes = attribute_bytes(depsgraph)
+        if sum(sizes.values()) > sum(peak.values()):
+            peak = sizes
+    return timings, peak
+
+
+def run_case(name, module, param, value, blend_file=None):
+    """
+    Build one project at one size from a fresh file and measure it
+    """
+    reset_scene(blend_file)
+    prepare_project(name)
+
+    ops = OpsCounter()
+    ops.install()
+    start = time.perf_counter()
+    try:
+        module.build(**{param: value})
+    finally:
+        build_time = time.perf_counter() - start
+        ops.uninstall()
+
+    scene = bpy.context.scene
+    timings, sizes = measure_evaluation(scene, sample_frames(scene))
+    return {
+        "project": name,
+        "param": param,
+        "value": value,
+        "build_time": build_time,
+        "ops": sum(ops.calls.values()),
+        "eval_frames": len(timings),
+        "eval_time_mean": sum(timings) / len(timings),
+        "eval_time_max": max(timings),
+        "rss_mb": current_rss_mb(),
+        "peak_rss_mb": peak_rss_mb(),
+        "datablocks": datablock_counts(),
+        "geometry_bytes": sum(sizes.values()),
+        "attribute_bytes": sizes,
+    }
+
+
+def run_benchmarks(projects, repeat=1, blend_files=None):
+    """
+    Sweep every project over its size parameter, keeping the fastest of `repeat` builds
+    """
+    blend_files = blend_files or {}
+    results = []
+    for name in projects:
+        module = load_project(name)
+        param, values = SWEEPS[name]
+        for value in values:
+            runs = [run_case(name, module, param, value, blend_files.get(name)) for _ in range(repeat)]
+            best = min(runs, key=lambda run: run["build_time"])
+            print(f"{name:<16} {param}={value:<8} build {best['build_time']:.3f}s  ops {best['ops']:<6} "
+                  f"eval {best['eval_time_mean'] * 1000:.1f}ms/frame  geometry {best['geometry_bytes'] / 1e6:.1f}MB")
+            results.append(best)
+    return results
+
+
+def compare_to_baseline(results, baseline, tolerance=0.2, min_delta=0.001):
+    """
+    Cases whose build or evaluation time or geometry size grew by more than the tolerance, plus any growth in ops
+    """
+    previous = {(case["project"], case["value"]): case for case in baseline["results"]}
+    regressions = []
+    for case in results:
+        old = previous.get((case["project"], case["value"]))
+        if old is None:
+            continue
+        for key in ("build_time", "eval_time_mean", "geometry_bytes"):
+            if key not in old:
+                # baselines from before the key was recorded
+                continue
+            if case[key] > old[key] * (1 + tolerance) and case[key] - old[key] > min_delta:
+                regressions.append((case["project"], case["param"], case["value"], key, old[key], case[key]))
+        if case["ops"] > old["ops"]:
+            regressions.append((case["project"], case["param"], case["value"], "ops", old["ops"], case["ops"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the project build paths over size sweeps")
+    parser.add_argument("--projects", nargs="+", choices=sorted(PROJECTS), default=list(SWEEPS))
+    parser.add_argument("--out", default="benchmarks/baseline.json", help="where to store the results")
+    parser.add_argument("--repeat", type=int, default=1, help="builds per case, the fastest is kept")
+    parser.add_argument("--dissolve-blend", help=".blend file holding the dissolve project's 'textured' mesh")
+    parser.add_argument("--compare", help="previous results to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--fake", action="store_true", help="run against the recording bpy stand-in")
+    args = parser.parse_args(script_argv())
+
+    blend_files = {"dissolve_mesh": args.dissolve_blend} if args.dissolve_blend else {}
+    results = run_benchmarks(args.projects, args.repeat, blend_files)
+
+    report = {
+        "backend": bpy.app.version_string,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "machine": platform.node(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "results": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    with open(args.out, "w") as out_file:
+        json.dump(report, out_file, indent=2)
+    print(f"results written to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare_to_baseline(results, json.load(baseline_file), args.tolerance)
+        for project, param, value, key, old, new in regressions:
+            print(f"REGRESSION {project} {param}={value}: {key} {old:.4g} -> {new:.4g}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
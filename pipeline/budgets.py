@@ -0,0 +1,99 @@
+"""
+Operator, datablock and property-write budgets for the scene builds.
+
+Every project is built against the recording bpy stand-in at each size of
+its benchmark sweep, and the counts are checked against limits of the form
+base + per_unit * size. A build that goes over its budget fails the check,
+which catches operator-heavy regressions without Blender.
+
+    python -m pipeline.budgets
+    python -m pipeline.budgets --projects golden_spiral --json budgets.json
+"""
+import argparse
+import json
+import os
+import sys
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline import fake_bpy
+from pipeline.projects import PROJECTS, load_project
+
+# (base, per_unit) per counter, the limit is base + per_unit * size where size
+# is the value of the project's sweep parameter in pipeline.benchmark
+BUDGETS = {
+    # operators must not grow with the number of points, objects can
+    "golden_spiral": {"ops": (20, 0), "datablocks": (20, 1), "rna_writes": (150, 1)},
+    "spike_sphere": {"ops": (12, 0), "datablocks": (15, 0), "rna_writes": (80, 0)},
+    "fractal_effect": {"ops": (12, 0), "datablocks": (15, 0), "rna_writes": (60, 5)},
+    "dissolve_mesh": {"ops": (16, 0), "datablocks": (18, 0), "rna_writes": (160, 0)},
+}
+
+
+def measure_build(name, module, param, value):
+    """
+    Counters of one build from an empty file
+    """
+    # imported here, these need the stand-in registered as bpy first
+    from pipeline.scene import prepare_project
+
+    fake_bpy.reset()
+    prepare_project(name)
+    with fake_bpy.recording() as recorder:
+        module.build(**{param: value})
+    return recorder.summary()
+
+
+def check_budgets(projects):
+    """
+    One row per project and size, with the counters, their limits and the counters over budget
+    """
+    from pipeline.benchmark import SWEEPS
+
+    rows = []
+    for name in projects:
+        module = load_project(name)
+        param, values = SWEEPS[name]
+        for value in values:
+            counts = measure_build(name, module, param, value)
+            limits = {key: base + per_unit * value for key, (base, per_unit) in BUDGETS[name].items()}
+            rows.append({
+                "project": name,
+                "param": param,
+                "value": value,
+                "counts": counts,
+                "limits": limits,
+                "over": sorted(key for key, limit in limits.items() if counts[key] > limit),
+            })
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check scene builds against their operator budgets")
+    parser.add_argument("--projects", nargs="+", choices=sorted(PROJECTS), default=list(BUDGETS))
+    parser.add_argument("--json", help="also write the measured counts to this file")
+    args = parser.parse_args(argv)
+
+    fake_bpy.install()
+    rows = check_budgets(args.projects)
+    for row in rows:
+        counts, limits = row["counts"], row["limits"]
+        status = "OVER " + ",".join(row["over"]) if row["over"] else "ok"
+        print(f"{row['project']:<16} {row['param']}={row['value']:<8} "
+              f"ops {counts['ops']}/{limits['ops']:g}  "
+              f"datablocks {counts['datablocks']}/{limits['datablocks']:g}  "
+              f"writes {counts['rna_writes']}/{limits['rna_writes']:g}  {status}")
+    if args.json:
+        with open(args.json, "w") as json_file:
+            json.dump(rows, json_file, indent=2)
+
+    failed = [row for row in rows if row["over"]]
+    if failed:
+        print(f"{len(failed)} builds over budget")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
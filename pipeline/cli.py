@@ -0,0 +1,474 @@
+"""
+Headless command-line entry point for building and rendering the projects.
+
+    blender -b -P pipeline/cli.py -- golden_spiral --points 2000 --frames 1 120 --profile draft --output renders/spiral
+    blender -b dissolve.blend -P pipeline/cli.py -- dissolve_mesh --density 3000 --skip-render --save-blend cache/dissolve.blend
+    blender -b cache/dissolve.blend -P pipeline/cli.py -- dissolve_mesh --skip-build --frames 200 260 --output renders/dissolve
+    blender -b cache/dissolve.blend -P pipeline/cli.py -- dissolve_mesh --skip-build --still 240 --tile 5 4 4 --color-depth 16
+    blender -b cache/dissolve.blend -P pipeline/cli.py -- dissolve_mesh --skip-build --frame-cache .cache/frames
+    blender -b cache/spike.blend -P pipeline/cli.py -- spike_sphere --reconcile --skip-render --save-blend cache/spike.blend
+    blender -b cache/dissolve.blend -P pipeline/cli.py -- dissolve_mesh --skip-build --encode renders/dissolve.mp4 --encode renders/dissolve.gif
+    blender -b cache/spike.blend -P pipeline/cli.py -- spike_sphere --skip-build --warm-up
+    blender -b cache/spiral.blend -P pipeline/cli.py -- golden_spiral --skip-build --views Camera flat=0,0,60,0,0,0
+    blender -b cache/spiral.blend -P pipeline/cli.py -- golden_spiral --skip-build --write-workers 4
+
+--fake runs the same path with plain Python against the bpy stand-in:
+
+    python -m pipeline.cli golden_spiral --fake --skip-render
+"""
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if "--fake" in sys.argv:
+        from pipeline import fake_bpy
+        fake_bpy.install()
+
+import bpy
+import numpy as np
+
+from pipeline.encode import StreamingEncoder
+from pipeline.frame_cache import render_frames, summary
+from pipeline.memguard import ABORT_EXIT_CODE, MemoryBudgetExceeded, RenderGuard, guarded_build, write_report
+from pipeline.multiview import MultiView, parse_view
+from pipeline.profiles import MAX_TIME_STRETCH, PROFILES, apply_output, apply_profile
+from pipeline.profiling import PhaseProfiler
+from pipeline.projects import BUILD_PARAMS, PROJECTS, load_project, script_argv
+from pipeline.proxy import set_proxy
+from pipeline.reconcile import rebuild
+from pipeline.scene import prepare_project
+from pipeline.telemetry import FrameTelemetry
+from pipeline.warmup import warm_up
+from pipeline.writeback import AsyncFrameWriter
+
+# command-line flags that map onto build() keyword arguments
+PARAM_FLAGS = {
+    "points": "num_points",
+    "subdivisions": "subdivisions",
+    "depth": "depth",
+    "density": "density",
+}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="pipeline.cli", description="Build and render a project headlessly")
+    parser.add_argument("project", choices=sorted(PROJECTS))
+
+    params = parser.add_argument_group("build parameters")
+    params.add_argument("--points", type=int, help="golden spiral point count")
+    params.add_argument("--subdivisions", type=int, help="spike sphere ico sphere subdivisions")
+    params.add_argument("--depth", type=int, help="fractal extrusion depth")
+    params.add_argument("--density", type=float, help="dissolve point density")
+    params.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                        help="any other build() parameter, can be repeated")
+
+    render = parser.add_argument_group("render settings")
+    render.add_argument("--frames", type=int, nargs=2, metavar=("START", "END"), help="frame range to render")
+    render.add_argument("--step", type=int, help="render every Nth frame")
+    render.add_argument("--profile", choices=sorted(PROFILES), default="final", help="render quality profile")
+    render.add_argument("--output", default="renders", help="output directory")
+    render.add_argument("--format", choices=("PNG", "EXR", "MP4"), default="PNG",
+                        help="PNG or half float EXR sequence, or a single MP4 file")
+    render.add_argument("--threads", type=int, help="render threads, defaults to all cores")
+    render.add_argument("--time-stretch", type=int, metavar="FACTOR",
+                        help="play the animation FACTOR times slower at FACTOR times the frame rate")
+    render.add_argument("--vector-pass", action="store_true",
+                        help="save each frame's motion towards the next frame for pipeline.interpolate")
+    render.add_argument("--encode", action="append", default=[], metavar="PATH",
+                        help="stream the PNG frames into an .mp4, .gif or .webp while rendering, can be repeated")
+    render.add_argument("--gif-width", type=int, help="scale --encode GIF output to this width")
+    render.add_argument("--color-depth", choices=("8", "16"), help="PNG bits per channel, overrides the profile")
+    render.add_argument("--still", type=int, metavar="FRAME", help="render a single frame instead of the animation")
+    render.add_argument("--views", nargs="+", metavar="VIEW",
+                        help="render every frame from several cameras in one evaluation: the NAME of a camera, "
+                             "or NAME=X,Y,Z,RX,RY,RZ (degrees) for a fixed one")
+    render.add_argument("--tile", type=int, nargs=3, metavar=("INDEX", "COLUMNS", "ROWS"),
+                        help="with --still, render only this tile of a COLUMNS x ROWS grid, see pipeline.tiling")
+    render.add_argument("--overlap", type=int, default=0, metavar="PIXELS",
+                        help="extra pixels rendered around the tile, cropped again when stitching")
+
+    run = parser.add_argument_group("run control")
+    run.add_argument("--skip-build", action="store_true", help="render the opened .blend file as it is")
+    run.add_argument("--skip-render", action="store_true", help="only build the scene")
+    run.add_argument("--reconcile", action="store_true",
+                     help="rebuild only the build steps that changed since the opened .blend was built")
+    run.add_argument("--save-blend", metavar="PATH", help="save the built scene to a .blend file")
+    run.add_argument("--proxy", choices=("on", "off"),
+                     help="low resolution generators in the viewport of the saved file, renders are not affected")
+    run.add_argument("--frame-cache", metavar="DIR",
+                     help="reuse frames whose evaluated state was rendered before, see pipeline.frame_cache")
+    run.add_argument("--dedupe", action="store_true",
+                     help="render frames with the same evaluated state once, repeats link to the first")
+    run.add_argument("--write-workers", type=int, default=0, metavar="N",
+                     help="compress and write PNG frames on N background threads, see pipeline.writeback")
+    run.add_argument("--write-queue", type=int, metavar="FRAMES",
+                     help="frames waiting for a writer thread before the render waits, defaults to 2 per thread")
+    run.add_argument("--staging", metavar="DIR",
+                     help="where Blender leaves frames for the writer threads, defaults to /dev/shm")
+    run.add_argument("--resume", action="store_true",
+                     help="with --write-workers, skip the frames an earlier run listed in its manifest")
+    run.add_argument("--memory-budget", type=float, metavar="MB",
+                     help="keep the process below this RSS: build smaller scenes, then stop with a report")
+    run.add_argument("--warm-up", action="store_true",
+                     help="compile every EEVEE material before the first frame and report the time per material")
+    run.add_argument("--telemetry", action="store_true", help="record per-frame render telemetry")
+    run.add_argument("--phase-report", action="store_true", help="write a per-phase timing report")
+    run.add_argument("--cprofile", action="append", default=[], metavar="PHASE",
+                     help="run a build phase under cProfile, implies --phase-report")
+    run.add_argument("--fake", action="store_true", help="run against the bpy stand-in instead of Blender")
+    return parser
+
+
+def parse_value(kind, text):
+    if kind is tuple:
+        return tuple(float(part) for part in text.split(","))
+    if kind is bool:
+        return text.lower() in ("1", "true", "yes", "on")
+    return kind(text)
+
+
+def build_kwargs(project, args):
+    """
+    build() keyword arguments from the named flags and the --set pairs
+    """
+    accepted = BUILD_PARAMS[project]
+    requested = {}
+    for flag, param in PARAM_FLAGS.items():
+        value = getattr(args, flag)
+        if value is not None:
+            requested[param] = value
+    for pair in args.set:
+        name, _, text = pair.partition("=")
+        if name not in accepted:
+            raise SystemExit(f"{project} has no build parameter '{name}', expected one of {', '.join(accepted)}")
+        requested[name] = parse_value(accepted[name], text)
+
+    unknown = [name for name in requested if name not in accepted]
+    if unknown:
+        raise SystemExit(f"{project} does not take {', '.join(unknown)}")
+    return requested
+
+
+def tile_rects(width, height, index, columns, rows, overlap=0):
+    """
+    Pixel rectangles (x_min, x_max, y_min, y_max) of a grid tile and of the area
+    rendered for it including the overlap, y counted from the bottom like Blender's border
+    """
+    column, row = index % columns, index // columns
+    x_edges = [width * part // columns for part in range(columns + 1)]
+    # tiles are numbered from the top row down
+    y_edges = [height - height * part // rows for part in range(rows + 1)]
+    core = (x_edges[column], x_edges[column + 1], y_edges[row + 1], y_edges[row])
+    rendered = (max(0, core[0] - overlap), min(width, core[1] + overlap),
+                max(0, core[2] - overlap), min(height, core[3] + overlap))
+    return core, rendered
+
+
+def configure_tile(scene, index, columns, rows, overlap=0):
+    """
+    Restrict the render to one tile, cropped, and return its placement in the full frame
+    """
+    render = scene.render
+    width = render.resolution_x * render.resolution_percentage // 100
+    height = render.resolution_y * render.resolution_percentage // 100
+    core, rendered = tile_rects(width, height, index, columns, rows, overlap)
+
+    # Blender truncates border * size to whole pixels, a quarter pixel past
+    # each edge keeps float rounding from moving the edge one pixel down
+    x_min, x_max, y_min, y_max = rendered
+    render.use_border = True
+    render.use_crop_to_border = True
+    render.border_min_x = (x_min + 0.25) / width
+    render.border_max_x = min(1.0, (x_max + 0.25) / width)
+    render.border_min_y = (y_min + 0.25) / height
+    render.border_max_y = min(1.0, (y_max + 0.25) / height)
+    return {"size": [width, height], "tile": [index, columns, rows], "core": list(core), "rendered": list(rendered)}
+
+
+def render_still(scene, project, args):
+    """
+    Render one frame, or one tile of it, and return the written image
+    """
+    if args.tile:
+        index, columns, rows = args.tile
+        scene.render.filepath = os.path.join(os.path.abspath(args.output), f"{project}_tile{index:03d}_")
+        placement = configure_tile(scene, index, columns, rows, args.overlap)
+    scene.frame_set(args.still)
+    bpy.ops.render.render(write_still=True)
+
+    image = scene.render.frame_path(frame=args.still)
+    if args.tile:
+        # sidecar telling the stitcher where the tile goes
+        placement.update(project=project, frame=args.still, image=os.path.basename(image))
+        with open(os.path.splitext(image)[0] + ".json", "w") as sidecar:
+            json.dump(placement, sidecar, indent=2)
+    return image
+
+
+def stretch_time(scene, factor):
+    """
+    Same duration at FACTOR times the frames: frame N of the original timing becomes frame N * FACTOR
+    """
+    scene.render.frame_map_old = 100
+    scene.render.frame_map_new = 100 * factor
+    scene.frame_start *= factor
+    scene.frame_end *= factor
+    scene.render.fps *= factor
+
+
+def capture_vectors(scene):
+    """
+    Save the Vector pass of every written frame next to it as <frame>.vectors.npy
+
+    The compositor routes the pass's motion towards the next frame, its z and
+    w components, to a Viewer node, whose image Python can read after the render.
+    """
+    bpy.context.view_layer.use_pass_vector = True
+    # Cycles leaves the pass empty with motion blur on
+    scene.render.use_motion_blur = False
+    scene.use_nodes = True
+    tree = scene.node_tree
+    layers = next((node for node in tree.nodes if node.bl_idname == "CompositorNodeRLayers"), None)
+    if layers is None:
+        layers = tree.nodes.new("CompositorNodeRLayers")
+    separate = tree.nodes.new("CompositorNodeSeparateColor")
+    combine = tree.nodes.new("CompositorNodeCombineColor")
+    viewer = tree.nodes.new("CompositorNodeViewer")
+    tree.links.new(layers.outputs["Vector"], separate.inputs["Image"])
+    tree.links.new(separate.outputs["Blue"], combine.inputs["Red"])
+    tree.links.new(separate.outputs["Alpha"], combine.inputs["Green"])
+    tree.links.new(combine.outputs["Image"], viewer.inputs["Image"])
+
+    def on_render_write(scene, *handler_args):
+        image = bpy.data.images.get("Viewer Node")
+        if image is None:
+            return
+        width, height = image.size
+        pixels = np.empty(width * height * 4, dtype=np.float32)
+        image.pixels.foreach_get(pixels)
+        # image rows are stored bottom up, frames top down
+        motion = pixels.reshape(height, width, 4)[::-1, :, :2]
+        frame_path = scene.render.frame_path(frame=scene.frame_current)
+        np.save(os.path.splitext(frame_path)[0] + ".vectors.npy", motion)
+
+    bpy.app.handlers.render_write.append(on_render_write)
+    return on_render_write
+
+
+def start_encoder(scene, args, planned=False):
+    """
+    Encoders fed with every frame Blender writes, returns the encoder and its handler
+
+    Planned renders feed the encoder themselves, in sequence order and with
+    reused frames, so no handler is installed for them.
+    """
+    encoder = StreamingEncoder(args.encode, scene.render.fps / scene.render.fps_base, gif_width=args.gif_width)
+    if planned:
+        return encoder, None
+
+    def on_render_write(scene, *handler_args):
+        encoder.add(scene.render.frame_path(frame=scene.frame_current))
+
+    bpy.app.handlers.render_write.append(on_render_write)
+    return encoder, on_render_write
+
+
+def render_planned(scene, project, args, encoder=None):
+    """
+    Render through pipeline.frame_cache and write the plan next to the frames
+    """
+    cache_dir = os.path.abspath(args.frame_cache) if args.frame_cache else None
+    plan = render_frames(scene, cache_dir, dedupe=args.dedupe, on_frame=encoder.add if encoder else None)
+    with open(os.path.join(os.path.abspath(args.output), f"{project}_frames.json"), "w") as plan_file:
+        json.dump({str(frame): entry for frame, entry in plan.items()}, plan_file, indent=2)
+    counts = summary(plan)
+    print(f"{len(plan)} frames: {counts['render']} rendered, {counts['cached']} from the cache, "
+          f"{counts['duplicate']} repeats of earlier frames")
+
+
+def report_warm_up(scene, timings):
+    if not timings:
+        print(f"nothing to warm up, {scene.render.engine} does not compile shaders per material")
+        return
+    for name, seconds in timings:
+        print(f"  compiled {name:<28} {seconds * 1000:.0f}ms")
+    print(f"shader warm-up took {sum(seconds for _, seconds in timings):.2f}s")
+
+
+def configure_render(scene, project, args):
+    """
+    Apply frame range, profile, threads and output location on top of the built scene
+    """
+    if args.frames:
+        scene.frame_start, scene.frame_end = args.frames
+    if args.time_stretch:
+        stretch_time(scene, args.time_stretch)
+    if args.step:
+        scene.frame_step = args.step
+    apply_profile(scene, args.profile)
+
+    if args.threads:
+        scene.render.threads_mode = "FIXED"
+        scene.render.threads = args.threads
+
+    output = os.path.abspath(args.output)
+    os.makedirs(output, exist_ok=True)
+    if args.format == "MP4":
+        scene.render.image_settings.file_format = "FFMPEG"
+        scene.render.ffmpeg.format = "MPEG4"
+    elif args.format == "EXR":
+        scene.render.image_settings.file_format = "OPEN_EXR"
+    else:
+        scene.render.image_settings.file_format = "PNG"
+    apply_output(scene, args.profile)
+    if args.format == "PNG" and args.color_depth:
+        scene.render.image_settings.color_depth = args.color_depth
+    scene.render.filepath = os.path.join(output, f"{project}_")
+
+
+def run(args):
+    module = load_project(args.project)
+    kwargs = build_kwargs(args.project, args)
+    output = os.path.abspath(args.output)
+    memory_report = os.path.join(output, "reports", f"{args.project}_memory.json")
+    # what a degraded build starts again from
+    blend_file = bpy.data.filepath or None
+
+    profiler = None
+    if args.phase_report or args.cprofile:
+        profiler = PhaseProfiler(f"{args.project}-{datetime.now():%Y%m%d-%H%M%S}", args.cprofile)
+        profiler.wrap(module)
+        profiler.start()
+
+    telemetry = None
+    encoder = None
+    guard = None
+    views = None
+    writer = None
+    attempts = []
+    try:
+        if args.memory_budget and not args.skip_build:
+            build = (lambda params: rebuild(args.project, module, **params)) if args.reconcile else None
+            try:
+                kwargs, attempts = guarded_build(args.project, module, kwargs, args.memory_budget, build, blend_file)
+            except MemoryBudgetExceeded as error:
+                print(f"{error}, stopping; see {write_report(error.report, memory_report)}")
+                sys.exit(ABORT_EXIT_CODE)
+        elif args.reconcile:
+            rebuild(args.project, module, **kwargs)
+        elif not args.skip_build:
+            prepare_project(args.project)
+            module.build(**kwargs)
+
+        scene = bpy.context.scene
+        configure_render(scene, args.project, args)
+
+        if args.proxy and not set_proxy(args.proxy == "on"):
+            print(f"{args.project} has no viewport proxy")
+
+        if args.save_blend:
+            os.makedirs(os.path.dirname(os.path.abspath(args.save_blend)), exist_ok=True)
+            bpy.ops.wm.save_as_mainfile(filepath=os.path.abspath(args.save_blend))
+
+        if not args.skip_render:
+            # per-frame handlers of the project, which a saved .blend does not keep
+            prepare_render = getattr(module, "prepare_render", None)
+            if prepare_render is not None:
+                prepare_render(scene)
+            if args.warm_up:
+                report_warm_up(scene, warm_up(scene))
+            if args.views:
+                views = MultiView(scene, args.views)
+                views.install()
+            if args.memory_budget:
+                guard = RenderGuard(scene, args.project, args.memory_budget, memory_report, attempts)
+                guard.install()
+            if args.telemetry:
+                telemetry = FrameTelemetry(os.path.join(output, "telemetry"), name=args.project)
+                telemetry.install()
+            if args.vector_pass:
+                capture_vectors(scene)
+            if args.write_workers:
+                writer = AsyncFrameWriter(scene, args.project, output, PROFILES[args.profile]["png_level"],
+                                          args.write_workers, args.write_queue, args.staging, args.resume)
+                writer.install()
+                if writer.skipped:
+                    print(f"resuming: {len(writer.skipped)} frames are already in {writer.manifest_path}")
+            planned = bool(args.frame_cache or args.dedupe)
+            if args.encode:
+                encoder, on_render_write = start_encoder(scene, args, planned)
+            if args.still is not None and views is not None:
+                render_still(scene, args.project, args)
+                print(f"wrote {', '.join(views.paths(args.still))}")
+            elif args.still is not None:
+                print(f"wrote {render_still(scene, args.project, args)}")
+            elif planned:
+                render_planned(scene, args.project, args, encoder)
+            else:
+                module.render_loop()
+    finally:
+        if writer is not None:
+            failed = writer.uninstall()
+            print(f"wrote {writer.frames} frames in the background, the render waited {writer.waited:.2f}s "
+                  f"for the writers; listed in {writer.manifest_path}")
+            for frame, error in failed:
+                print(f"FAILED to write frame {frame}: {error}, staged copy left in {writer.staging}")
+        if views is not None:
+            views.uninstall()
+        if guard is not None:
+            guard.uninstall()
+        if telemetry is not None:
+            telemetry.uninstall()
+        if encoder is not None:
+            if on_render_write is not None:
+                bpy.app.handlers.render_write.remove(on_render_write)
+            for path, returncode in encoder.close().items():
+                print(f"{'encoded' if returncode == 0 else 'FAILED to encode'} {encoder.frames} frames to {path}")
+            if encoder.error is not None:
+                print(f"encoding stopped at {encoder.error}")
+        if profiler is not None:
+            profiler.stop()
+            print(f"phase report written to {profiler.write(os.path.join(output, 'reports'))}")
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(script_argv() if argv is None else argv)
+    if args.encode and (args.format != "PNG" or args.still is not None):
+        parser.error("--encode streams a PNG sequence, it cannot be combined with --format MP4 or EXR, or --still")
+    if (args.frame_cache or args.dedupe) and (args.format != "PNG" or args.still is not None):
+        parser.error("--frame-cache and --dedupe render a PNG sequence, not --format MP4 or EXR, or --still")
+    if args.write_workers and (args.format != "PNG" or args.still is not None or args.encode or args.frame_cache
+                               or args.dedupe or args.views or args.vector_pass):
+        parser.error("--write-workers writes a PNG sequence, it cannot be combined with --format MP4 or EXR, "
+                     "--still, --encode, --frame-cache, --dedupe, --views or --vector-pass")
+    if args.resume and not args.write_workers:
+        parser.error("--resume reads the manifest of --write-workers, give --write-workers too")
+    if args.write_workers < 0 or (args.write_queue is not None and args.write_queue < 1):
+        parser.error("--write-workers must be 0 or more and --write-queue at least 1")
+    if args.reconcile and args.skip_build:
+        parser.error("--reconcile is a way of building, it cannot be combined with --skip-build")
+    if args.views and (args.format != "PNG" or args.encode or args.frame_cache or args.dedupe or args.tile
+                       or args.vector_pass):
+        parser.error("--views writes a PNG per view and frame, it cannot be combined with --format MP4 or EXR, --encode, "
+                     "--frame-cache, --dedupe, --tile or --vector-pass")
+    for view in args.views or ():
+        try:
+            parse_view(view)
+        except ValueError as error:
+            parser.error(str(error))
+    if args.time_stretch is not None and not 1 <= args.time_stretch <= MAX_TIME_STRETCH:
+        parser.error(f"--time-stretch must be between 1 and {MAX_TIME_STRETCH}")
+    if args.tile and args.still is None:
+        parser.error("--tile needs --still")
+    if args.tile and not 0 <= args.tile[0] < args.tile[1] * args.tile[2]:
+        parser.error(f"tile index must be below {args.tile[1] * args.tile[2]}")
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
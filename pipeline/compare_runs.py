@@ -0,0 +1,109 @@
+"""
+Compare the per-frame telemetry of two render runs.
+
+Frames are matched by frame number; a frame is flagged when it got slower by
+more than the relative threshold and by more than a minimum number of
+seconds, so that noise on very short frames does not drown the report.
+
+    python -m pipeline.compare_runs telemetry/before/dissolve_mesh.json telemetry/after/dissolve_mesh.json
+"""
+import argparse
+import csv
+import json
+import sys
+
+
+def load_frames(path):
+    """
+    Telemetry rows keyed by frame, from either the JSON or the CSV output
+    """
+    if path.endswith(".csv"):
+        with open(path, newline="") as csv_file:
+            rows = list(csv.DictReader(csv_file))
+    else:
+        with open(path) as json_file:
+            rows = json.load(json_file)["frames"]
+
+    frames = {}
+    for row in rows:
+        parsed = {}
+        for key, value in row.items():
+            if value in (None, ""):
+                parsed[key] = None
+            else:
+                parsed[key] = float(value)
+        frames[int(parsed["frame"])] = parsed
+    return frames
+
+
+def compare(before, after, metric="render_time", threshold=0.1, min_delta=0.05):
+    """
+    Per-frame deltas of one metric for the frames present in both runs
+    """
+    rows = []
+    for frame in sorted(set(before) & set(after)):
+        old = before[frame].get(metric)
+        new = after[frame].get(metric)
+        if old is None or new is None:
+            continue
+        delta = new - old
+        ratio = new / old if old else float("inf")
+        rows.append({
+            "frame": frame,
+            "before": old,
+            "after": new,
+            "delta": delta,
+            "ratio": ratio,
+            "slower": delta > min_delta and ratio > 1 + threshold,
+        })
+    return rows
+
+
+def bucket_totals(frames, metric="render_time", bucket=30):
+    """
+    Sum a metric over consecutive frame ranges, to see which part of an animation drives the cost
+    """
+    totals = {}
+    for frame, row in frames.items():
+        if row.get(metric) is None:
+            continue
+        start = (frame - 1) // bucket * bucket + 1
+        totals[start] = totals.get(start, 0.0) + row[metric]
+    return [(start, start + bucket - 1, totals[start]) for start in sorted(totals)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Diff the per-frame telemetry of two runs")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--metric", default="render_time",
+                        choices=("render_time", "eval_time", "peak_memory_mb", "peak_rss_mb"))
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative slowdown to flag, 0.1 = 10%%")
+    parser.add_argument("--min-delta", type=float, default=0.05, help="absolute slowdown to flag")
+    parser.add_argument("--bucket", type=int, default=0, help="also print totals per range of N frames")
+    args = parser.parse_args(argv)
+
+    before = load_frames(args.before)
+    after = load_frames(args.after)
+    rows = compare(before, after, args.metric, args.threshold, args.min_delta)
+    slower = [row for row in rows if row["slower"]]
+
+    total_before = sum(row["before"] for row in rows)
+    total_after = sum(row["after"] for row in rows)
+    print(f"{len(rows)} frames compared on {args.metric}: {total_before:.2f} -> {total_after:.2f}")
+    for row in slower:
+        print(f"  frame {row['frame']:>5}: {row['before']:.3f} -> {row['after']:.3f} "
+              f"(+{row['delta']:.3f}, x{row['ratio']:.2f})")
+
+    if args.bucket:
+        for label, frames in (("before", before), ("after", after)):
+            print(f"{label} per {args.bucket} frames:")
+            for start, end, total in bucket_totals(frames, args.metric, args.bucket):
+                print(f"  {start:>5}-{end:<5} {total:.2f}")
+
+    print(f"{len(slower)} frames slower")
+    return 1 if slower else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
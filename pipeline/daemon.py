@@ -0,0 +1,185 @@
+"""
+Long-lived Blender worker that takes jobs over a local socket.
+
+Starting Blender and importing the pipeline costs more than a draft render
+or a still takes. The daemon pays for it once and then runs jobs one after
+the other. A job is a cli.py command line, run in a scene reset to the
+empty file or to the job's .blend. Everything the job prints, and every
+frame it writes, is streamed back to the client as it happens:
+
+    blender -b -P pipeline/daemon.py -- --socket /tmp/pipeline.sock
+    python -m pipeline.daemon_client --socket /tmp/pipeline.sock -- golden_spiral --profile draft --still 1
+    python -m pipeline.daemon_client --socket /tmp/pipeline.sock --shutdown
+
+Requests and replies are dicts on a multiprocessing connection:
+
+    {"args": ["golden_spiral", "--still", "1"], "blend": None, "cwd": "/home/me/shots"}
+                                                                    run cli.py with these arguments in cwd
+    {"command": "status"}, {"command": "shutdown"}
+
+    {"event": "log", "line": "..."}                                 printed by the job
+    {"event": "frame", "frame": 12, "path": "..."}                  a frame was written
+    {"event": "done", "status": 0, "seconds": 1.52}                 the job's exit status
+
+Relative paths in the arguments are the client's, the job runs in the
+directory the client sent. Project scripts are read again for every job,
+edits are picked up without a restart. The socket is created accessible to its owner only; a job that
+the memory guard stops ends the daemon with it.
+"""
+import argparse
+import os
+import sys
+import time
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+from multiprocessing.connection import Client, Listener
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if "--fake" in sys.argv:
+        from pipeline import fake_bpy
+        fake_bpy.install()
+
+import bpy
+
+from pipeline import cli
+from pipeline.launch import DAEMON_ADDRESS
+from pipeline.projects import script_argv
+from pipeline.scene import reset_scene
+
+
+class Channel:
+    """
+    Sends events to the client; a client that went away no longer stops the job
+    """
+    def __init__(self, connection):
+        self.connection = connection
+        self.closed = False
+
+    def send(self, event):
+        if self.closed:
+            return
+        try:
+            self.connection.send(event)
+        except (OSError, EOFError):
+            self.closed = True
+
+
+class LineStream:
+    """
+    File-like object forwarding whole lines as log events
+    """
+    def __init__(self, channel):
+        self.channel = channel
+        self._pending = ""
+
+    def write(self, text):
+        self._pending += text
+        *lines, self._pending = self._pending.split("\n")
+        for line in lines:
+            self.channel.send({"event": "log", "line": line})
+        return len(text)
+
+    def flush(self):
+        if self._pending:
+            self.channel.send({"event": "log", "line": self._pending})
+            self._pending = ""
+
+
+def open_listener(address):
+    """
+    Listen on address, taking over a socket file a dead daemon left behind
+    """
+    if not address.startswith("\\\\.\\pipe\\") and os.path.exists(address):
+        try:
+            Client(address).close()
+        except ConnectionRefusedError:
+            os.remove(address)
+        else:
+            raise RuntimeError(f"a daemon is already listening on {address}")
+    # no window in which another user could connect
+    umask = os.umask(0o177)
+    try:
+        return Listener(address)
+    finally:
+        os.umask(umask)
+
+
+def run_job(request, channel):
+    """
+    Run one cli.py command line in a fresh scene, returns its exit status
+    """
+    stream = LineStream(channel)
+
+    def on_render_write(scene, *handler_args):
+        channel.send({"event": "frame", "frame": scene.frame_current,
+                      "path": scene.render.frame_path(frame=scene.frame_current)})
+
+    started = time.perf_counter()
+    status = 0
+    cwd = os.getcwd()
+    with redirect_stdout(stream), redirect_stderr(stream):
+        try:
+            os.chdir(request.get("cwd") or cwd)
+            # loading a file also drops the handlers the previous job left behind
+            reset_scene(request.get("blend"))
+            bpy.app.handlers.render_write.append(on_render_write)
+            cli.main(list(request["args"]))
+        except SystemExit as exit:
+            status = exit.code if isinstance(exit.code, int) else int(exit.code is not None)
+        except Exception:
+            traceback.print_exc()
+            status = 1
+        finally:
+            if on_render_write in bpy.app.handlers.render_write:
+                bpy.app.handlers.render_write.remove(on_render_write)
+            os.chdir(cwd)
+            stream.flush()
+    channel.send({"event": "done", "status": status, "seconds": time.perf_counter() - started})
+    return status
+
+
+def serve(address=DAEMON_ADDRESS):
+    """
+    Answer requests one at a time until a shutdown request
+    """
+    listener = open_listener(address)
+    started = time.time()
+    jobs = 0
+    print(f"pipeline daemon {os.getpid()} listening on {address}")
+    sys.stdout.flush()
+    try:
+        while True:
+            with listener.accept() as connection:
+                channel = Channel(connection)
+                try:
+                    request = connection.recv()
+                except (OSError, EOFError):
+                    continue
+                command = request.get("command", "run")
+                if command == "status":
+                    channel.send({"event": "status", "pid": os.getpid(), "jobs": jobs,
+                                  "uptime": time.time() - started, "backend": bpy.app.version_string})
+                elif command == "shutdown":
+                    channel.send({"event": "done", "status": 0, "seconds": 0.0})
+                    return jobs
+                else:
+                    status = run_job(request, channel)
+                    jobs += 1
+                    print(f"job {jobs} {' '.join(request['args'])} exited with {status}")
+                    sys.stdout.flush()
+    finally:
+        listener.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run pipeline jobs in one long-lived Blender process")
+    parser.add_argument("--socket", default=DAEMON_ADDRESS, help="Unix socket path or Windows named pipe")
+    parser.add_argument("--fake", action="store_true", help="run against the bpy stand-in instead of Blender")
+    args = parser.parse_args(script_argv())
+    jobs = serve(args.socket)
+    print(f"pipeline daemon stopped after {jobs} jobs")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Submit jobs to the worker daemon (pipeline/daemon.py) and follow their progress.
+
+    python -m pipeline.daemon_client --start
+    python -m pipeline.daemon_client -- golden_spiral --profile draft --still 1 --output renders/drafts
+    python -m pipeline.daemon_client --blend cache/dissolve.blend -- dissolve_mesh --skip-build --still 240
+    python -m pipeline.daemon_client --status
+    python -m pipeline.daemon_client --shutdown
+
+The arguments after "--" are those of pipeline/cli.py, relative paths in
+them are taken from the client's working directory. The exit status is
+the job's, so scripts can use the client in place of a Blender process.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from multiprocessing.connection import Client
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline.launch import BLENDER, DAEMON_ADDRESS, blender_env, script_command
+from pipeline.projects import ROOT
+
+# output of daemons started by the client, which leave the client's terminal
+DAEMON_LOG = os.path.join(tempfile.gettempdir(), "blender-pipeline-daemon.log")
+
+
+class NotRunning(ConnectionError):
+    def __init__(self, address):
+        super().__init__(f"no daemon listening on {address}")
+        self.address = address
+
+
+def request(message, address=DAEMON_ADDRESS):
+    """
+    Send one request and yield the daemon's events until the final one
+    """
+    try:
+        connection = Client(address)
+    except (FileNotFoundError, ConnectionRefusedError) as error:
+        raise NotRunning(address) from error
+    with connection:
+        connection.send(message)
+        while True:
+            try:
+                event = connection.recv()
+            except EOFError:
+                # the daemon went away mid-job
+                yield {"event": "done", "status": None, "seconds": None}
+                return
+            yield event
+            if event["event"] in ("done", "status"):
+                return
+
+
+def submit(cli_args, address=DAEMON_ADDRESS, blend=None, on_event=None):
+    """
+    Run a cli.py command line on the daemon, returns its exit status, None when the daemon died
+    """
+    for event in request({"args": list(cli_args), "blend": blend, "cwd": os.getcwd()}, address):
+        if on_event is not None:
+            on_event(event)
+        if event["event"] == "done":
+            return event["status"]
+
+
+def is_running(address=DAEMON_ADDRESS):
+    try:
+        Client(address).close()
+    except OSError:
+        return False
+    return True
+
+
+def start_daemon(address=DAEMON_ADDRESS, blender=BLENDER, fake=False, timeout=60.0, log=DAEMON_LOG):
+    """
+    Start a daemon in the background and wait until it accepts connections
+
+    The daemon writes to `log` in a session of its own, so a client whose
+    output is piped or captured does not wait for the daemon to exit.
+    """
+    command = script_command("daemon", ["--socket", address], blender=blender, fake=fake)
+    with open(log, "a") as log_file:
+        process = subprocess.Popen(command, cwd=ROOT, env=blender_env(), stdin=subprocess.DEVNULL,
+                                   stdout=log_file, stderr=subprocess.STDOUT, start_new_session=True)
+    deadline = time.monotonic() + timeout
+    while not is_running(address):
+        if process.poll() is not None:
+            raise RuntimeError(f"daemon exited with {process.returncode} before listening on {address}, "
+                               f"see {log}")
+        if time.monotonic() > deadline:
+            process.terminate()
+            raise TimeoutError(f"daemon did not listen on {address} within {timeout}s")
+        time.sleep(0.1)
+    return process
+
+
+def print_event(event):
+    if event["event"] == "log":
+        print(event["line"])
+    elif event["event"] == "frame":
+        print(f"[frame {event['frame']}] {event['path']}")
+    elif event["event"] == "done" and event["status"] is None:
+        print("the daemon exited during the job")
+    elif event["event"] == "done":
+        print(f"[done] status {event['status']} in {event['seconds']:.2f}s")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    cli_args = argv[argv.index("--") + 1:] if "--" in argv else []
+    argv = argv[:argv.index("--")] if "--" in argv else argv
+
+    parser = argparse.ArgumentParser(description="Run pipeline jobs on the worker daemon")
+    parser.add_argument("--socket", default=DAEMON_ADDRESS, help="Unix socket path or Windows named pipe")
+    parser.add_argument("--blend", help=".blend file the job's scene starts from")
+    parser.add_argument("--start", action="store_true", help="start a daemon unless one is running")
+    parser.add_argument("--status", action="store_true", help="print the daemon's pid, uptime and job count")
+    parser.add_argument("--shutdown", action="store_true", help="stop the daemon once its current job is done")
+    parser.add_argument("--blender", default=BLENDER)
+    parser.add_argument("--fake", action="store_true", help="with --start, run the daemon against the bpy stand-in")
+    args = parser.parse_args(argv)
+
+    if not (args.start or args.status or args.shutdown or cli_args):
+        parser.error("nothing to do: give cli.py arguments after --, or --start, --status or --shutdown")
+    if args.start:
+        if is_running(args.socket):
+            print(f"a daemon is already listening on {args.socket}")
+        else:
+            print(f"daemon {start_daemon(args.socket, args.blender, args.fake).pid} listening on {args.socket}")
+    try:
+        if args.status:
+            for event in request({"command": "status"}, args.socket):
+                print(f"daemon {event['pid']} on {event['backend']}, up {event['uptime']:.0f}s, "
+                      f"{event['jobs']} jobs")
+        if cli_args:
+            status = submit(cli_args, args.socket, args.blend and os.path.abspath(args.blend), print_event)
+            if status != 0:
+                return 1 if status is None else status
+        if args.shutdown:
+            for _ in request({"command": "shutdown"}, args.socket):
+                pass
+            print(f"daemon on {args.socket} stopped")
+    except NotRunning as error:
+        print(f"{error}, start one with --start")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,242 @@
+"""
+Streaming encoders from a rendered PNG sequence to MP4, GIF and WebP loops.
+
+Finished frames are piped into one ffmpeg process per output while the
+render continues, so the videos are done moments after the last frame
+instead of after a separate encode pass. The output format follows the file
+extension:
+
+    .mp4    H.264, yuv420p, fast start
+    .gif    one palette for the whole loop built from the changing pixels
+            (palettegen stats_mode=diff), and dithering limited to the
+            rectangle that changed since the previous frame
+            (paletteuse diff_mode=rectangle), so static areas cost nothing
+    .webp   animated lossy WebP
+
+A GIF takes two passes. Only the palette statistics are gathered while
+the frames are rendered, and the frames are read from disk again for
+dithering when the encoder is closed. A single ffmpeg graph would hold
+every frame in memory until the palette is known, over 5GB for 460 frames
+at 1920x1920. So the frames must stay on disk until the encoder is closed,
+and the GIF is ready a pass over the frames after the last one. Its size
+follows the frames unless --gif-width scales it down.
+
+Inside a render, cli.py --encode feeds the encoders from the render_write
+handler:
+
+    blender -b cache/dissolve.blend -P pipeline/cli.py -- dissolve_mesh --skip-build --encode renders/dissolve_anim.mp4 --encode renders/dissolve_anim.gif
+
+Next to a render running elsewhere, or for a sequence on disk, the watcher
+picks frames up as they are completed:
+
+    python -m pipeline.encode renders/dissolve/dissolve_mesh_####.png --frames 1 460 --fps 30 --out dissolve.mp4 dissolve.gif
+"""
+import argparse
+import os
+import queue
+import re
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+FFMPEG = os.environ.get("FFMPEG", "ffmpeg")
+
+PNG_END = b"IEND\xaeB`\x82"
+
+
+def palette_path(output):
+    return f"{output}.palette.png"
+
+
+def ffmpeg_command(output, fps, ffmpeg=FFMPEG, gif_width=None):
+    """
+    ffmpeg reading concatenated PNG files from stdin and writing one output, for a GIF its palette
+    """
+    command = [ffmpeg, "-hide_banner", "-loglevel", "error", "-y",
+               "-f", "image2pipe", "-c:v", "png", "-framerate", f"{fps:g}", "-i", "-"]
+    extension = os.path.splitext(output)[1].lower()
+    if extension == ".mp4":
+        return command + ["-c:v", "libx264", "-preset", "medium", "-crf", "18", "-pix_fmt", "yuv420p",
+                          "-movflags", "+faststart", output]
+    if extension == ".gif":
+        scale = f"scale={gif_width}:-1:flags=lanczos," if gif_width else ""
+        return command + ["-vf", f"{scale}palettegen=stats_mode=diff", "-frames:v", "1", "-update", "1",
+                          palette_path(output)]
+    if extension == ".webp":
+        return command + ["-c:v", "libwebp_anim", "-lossless", "0", "-q:v", "80", "-loop", "0", output]
+    raise ValueError(f"no encoder for {output}, use .mp4, .gif or .webp")
+
+
+def gif_command(output, fps, ffmpeg=FFMPEG, gif_width=None):
+    """
+    Second GIF pass: the frames from stdin again, dithered to the palette of the first
+    """
+    scale = f"scale={gif_width}:-1:flags=lanczos" if gif_width else "null"
+    graph = (f"[0:v]{scale}[frames];"
+             "[frames][1:v]paletteuse=dither=bayer:bayer_scale=5:diff_mode=rectangle")
+    return [ffmpeg, "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "image2pipe", "-c:v", "png", "-framerate", f"{fps:g}", "-i", "-",
+            "-i", palette_path(output), "-filter_complex", graph, "-loop", "0", output]
+
+
+class StreamingEncoder:
+    """
+    Pipes frames into one ffmpeg process per output from a background thread
+
+    add() only queues the path, the renderer is held up only when the
+    encoders fall more than `backlog` frames behind. A frame that cannot be
+    fed stops the encoders; the feeder keeps taking paths so the renderer
+    never waits on it, and close() reports the outputs as failed with the
+    reason in `error`.
+    """
+    def __init__(self, outputs, fps, ffmpeg=FFMPEG, gif_width=None, backlog=16):
+        if shutil.which(ffmpeg) is None:
+            raise SystemExit(f"{ffmpeg} not found, install ffmpeg or point FFMPEG at it")
+        self.outputs = [os.path.abspath(output) for output in outputs]
+        self.fps = fps
+        self.ffmpeg = ffmpeg
+        self.gif_width = gif_width
+        # frames fed so far, read again by the second pass of GIF outputs
+        self.paths = []
+        self.frames = 0
+        self.error = None
+        self.processes = {}
+        for output in self.outputs:
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+            self.processes[output] = subprocess.Popen(ffmpeg_command(output, fps, ffmpeg, gif_width),
+                                                      stdin=subprocess.PIPE)
+        self._queue = queue.Queue(maxsize=backlog)
+        self._feeder = threading.Thread(target=self._feed, daemon=True)
+        self._feeder.start()
+
+    def _feed(self):
+        while True:
+            path = self._queue.get()
+            if path is None:
+                return
+            if self.error is not None:
+                continue
+            try:
+                self._write(path)
+            except Exception as error:
+                self.error = f"{path}: {type(error).__name__}: {error}"
+
+    def _write(self, path):
+        with open(path, "rb") as frame_file:
+            contents = frame_file.read()
+        for output, process in self.processes.items():
+            try:
+                process.stdin.write(contents)
+            except BrokenPipeError:
+                # ffmpeg gave up, close() reports its exit code
+                pass
+        self.paths.append(path)
+        self.frames += 1
+
+    def add(self, path):
+        self._queue.put(path)
+
+    def _second_pass(self, output):
+        process = subprocess.Popen(gif_command(output, self.fps, self.ffmpeg, self.gif_width),
+                                   stdin=subprocess.PIPE)
+        try:
+            for path in self.paths:
+                with open(path, "rb") as frame_file:
+                    process.stdin.write(frame_file.read())
+            process.stdin.close()
+        except OSError as error:
+            self.error = f"{output}: {type(error).__name__}: {error}"
+            process.kill()
+        returncode = process.wait()
+        if os.path.exists(palette_path(output)):
+            os.remove(palette_path(output))
+        return returncode
+
+    def close(self):
+        """
+        Wait for the queued frames and the encoders, return the exit code per output
+        """
+        self._queue.put(None)
+        self._feeder.join()
+        results = {}
+        for output, process in self.processes.items():
+            if self.error is not None:
+                # a video with a frame missing is not finished
+                process.kill()
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+            results[output] = process.wait()
+            if output.lower().endswith(".gif") and results[output] == 0:
+                results[output] = self._second_pass(output)
+        return results
+
+
+def sequence_path(pattern, frame):
+    """
+    File of a frame in a sequence pattern, '#' runs become the zero-padded frame
+    """
+    if "#" not in pattern:
+        raise ValueError(f"{pattern} has no '#' frame placeholder")
+    return re.sub("#+", lambda match: f"{frame:0{len(match.group())}d}", pattern)
+
+
+def is_complete(path):
+    """
+    True when a PNG has been written up to its end chunk
+    """
+    try:
+        with open(path, "rb") as png_file:
+            png_file.seek(-len(PNG_END), os.SEEK_END)
+            return png_file.read() == PNG_END
+    except OSError:
+        return False
+
+
+def watch_frames(pattern, start, end, step=1, poll=0.5, timeout=None):
+    """
+    Yield the frames of a sequence in order as soon as each one is completely written
+    """
+    waited_since = time.monotonic()
+    for frame in range(start, end + 1, step):
+        path = sequence_path(pattern, frame)
+        while not is_complete(path):
+            if timeout is not None and time.monotonic() - waited_since > timeout:
+                raise SystemExit(f"no complete {path} after {timeout:g}s")
+            time.sleep(poll)
+        waited_since = time.monotonic()
+        yield path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Encode a PNG sequence to MP4/GIF/WebP while it is being rendered")
+    parser.add_argument("pattern", help="frame files, e.g. renders/dissolve_mesh_####.png")
+    parser.add_argument("--frames", type=int, nargs=2, required=True, metavar=("START", "END"))
+    parser.add_argument("--step", type=int, default=1)
+    parser.add_argument("--fps", type=float, default=30)
+    parser.add_argument("--out", nargs="+", required=True, help="output files, format from the extension")
+    parser.add_argument("--gif-width", type=int, help="scale GIF output to this width")
+    parser.add_argument("--timeout", type=float, help="give up when a frame takes longer than this many seconds")
+    parser.add_argument("--ffmpeg", default=FFMPEG)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    encoder = StreamingEncoder(args.out, args.fps, args.ffmpeg, args.gif_width)
+    try:
+        for path in watch_frames(args.pattern, *args.frames, step=args.step, timeout=args.timeout):
+            encoder.add(path)
+    finally:
+        results = encoder.close()
+    for output, returncode in results.items():
+        print(f"{'ok  ' if returncode == 0 else 'FAIL'} {output}")
+    if encoder.error is not None:
+        print(f"encoding stopped at {encoder.error}")
+    print(f"{encoder.frames} frames encoded in {time.perf_counter() - started:.1f}s")
+    return 1 if any(results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,332 @@
+"""
+Render time and memory estimates from a sample of probe renders.
+
+The scene is built, or opened, once. A stratified sample of frames is
+rendered at reduced resolution and samples, and a least-squares cost model
+is fitted to the probe times:
+
+    render time = a + b * Mpx + Mpx * samples * (c + d * u + e * u^2)
+
+where Mpx is the rendered megapixels and u the position of the frame in the
+range (0 at the first frame, 1 at the last), so scenes that get heavier
+over the animation are followed. The renderer's reported peak memory is
+fitted the same way over Mpx and u. One probe is repeated with half the
+threads to measure how well the renderer scales, which decides what
+splitting the machine into several worker processes costs.
+
+From the model, the predicted wall time and peak memory of the full frame
+range are reported for every profile and worker count:
+
+    blender -b cache/dissolve.blend -P pipeline/estimate.py -- dissolve_mesh --skip-build --workers 1 2 4
+    python -m pipeline.estimate spike_sphere --fake --probe-frames 4
+
+The estimate covers rendering only; scene builds are measured by
+pipeline/benchmark.py.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if "--fake" in sys.argv:
+        from pipeline import fake_bpy
+        fake_bpy.install()
+
+import bpy
+import numpy as np
+
+from pipeline.profiles import PROFILES
+from pipeline.profiling import current_rss_mb
+from pipeline.projects import PROJECTS, load_project, script_argv
+from pipeline.scene import prepare_project
+from pipeline.telemetry import PEAK_PATTERN, UNITS_MB, configured_samples
+
+
+def stratified_frames(start, end, count):
+    """
+    The middle frame of each of `count` equal strata of the range
+    """
+    count = max(1, min(count, end - start + 1))
+    width = (end - start + 1) / count
+    return [start + int(width * (index + 0.5)) for index in range(count)]
+
+
+def position(frame, start, end):
+    return (frame - start) / (end - start) if end > start else 0.0
+
+
+def set_samples(scene, samples):
+    if scene.render.engine == "CYCLES":
+        scene.cycles.samples = samples
+    else:
+        scene.eevee.taa_render_samples = samples
+
+
+def megapixels(scene, percentage):
+    return scene.render.resolution_x * scene.render.resolution_y * (percentage / 100) ** 2 / 1e6
+
+
+class Prober:
+    """
+    Renders single frames in memory and times them, with the renderer's peak memory when it reports one
+    """
+    def __init__(self, scene):
+        self.scene = scene
+        self._peak = None
+
+    def on_render_stats(self, stats, *args):
+        for value, unit in PEAK_PATTERN.findall(stats):
+            self._peak = max(float(value) * UNITS_MB[unit], self._peak or 0.0)
+
+    def render(self, frame, percentage, samples, threads=None):
+        scene = self.scene
+        started = time.perf_counter()
+        scene.frame_set(frame)
+        eval_time = time.perf_counter() - started
+
+        scene.render.resolution_percentage = percentage
+        set_samples(scene, samples)
+        if threads:
+            scene.render.threads_mode = "FIXED"
+            scene.render.threads = threads
+        else:
+            scene.render.threads_mode = "AUTO"
+        self._peak = None
+        bpy.app.handlers.render_stats.append(self.on_render_stats)
+        try:
+            started = time.perf_counter()
+            bpy.ops.render.render()
+            render_time = time.perf_counter() - started
+        finally:
+            bpy.app.handlers.render_stats.remove(self.on_render_stats)
+        return {
+            "frame": frame,
+            "resolution_percentage": percentage,
+            "samples": samples,
+            "threads": threads,
+            "megapixels": megapixels(scene, percentage),
+            "eval_time": eval_time,
+            "render_time": render_time,
+            "peak_memory_mb": self._peak,
+        }
+
+
+def time_features(megapixels, samples, u):
+    return np.array([1.0, megapixels, megapixels * samples, megapixels * samples * u, megapixels * samples * u * u])
+
+
+def memory_features(megapixels, u):
+    return np.array([1.0, megapixels, u])
+
+
+def fit(rows, features, target):
+    """
+    Least-squares coefficients of target over the feature rows
+    """
+    matrix = np.array([features(row) for row in rows])
+    values = np.array([row[target] for row in rows])
+    coefficients, *_ = np.linalg.lstsq(matrix, values, rcond=None)
+    return coefficients
+
+
+def thread_scaling(full, reduced, threads):
+    """
+    Parallel fraction p of Amdahl's law, t(T) ~ (1 - p) + p / T, from renders at T and T / 2 threads
+    """
+    if threads < 2 or full <= 0:
+        return 1.0
+    ratio = reduced / full
+    denominator = (ratio - 1) + (2 - ratio) / threads
+    if denominator <= 0:
+        return 1.0
+    return float(np.clip((ratio - 1) / denominator, 0.0, 1.0))
+
+
+def makespan(frame_times, workers, chunk_size):
+    """
+    Wall time of chunks of frames handed to whichever worker frees up first, like the farm does
+    """
+    finish = [0.0] * workers
+    for first in range(0, len(frame_times), chunk_size):
+        index = finish.index(min(finish))
+        finish[index] += sum(frame_times[first:first + chunk_size])
+    return max(finish)
+
+
+def predict(model, scene_info, profile, workers, cores, chunk_size):
+    """
+    Predicted wall time and peak memory of the whole range for one profile on `workers` processes
+    """
+    settings = PROFILES[profile]
+    percentage = settings["resolution_percentage"]
+    samples = settings[f"{scene_info['engine_key']}_samples"] or scene_info["samples"]
+    pixels = scene_info["width"] * scene_info["height"] * (percentage / 100) ** 2 / 1e6
+    frames = range(scene_info["frame_start"], scene_info["frame_end"] + 1, scene_info["frame_step"])
+    positions = [position(frame, scene_info["frame_start"], scene_info["frame_end"]) for frame in frames]
+
+    # renders measured on all cores slow down by the serial fraction when each process gets fewer
+    threads = max(1, cores // workers)
+    parallel = model["parallel_fraction"]
+    slowdown = ((1 - parallel) + parallel / threads) / ((1 - parallel) + parallel / cores)
+    eval_times = np.interp(positions, model["eval_positions"], model["eval_times"])
+    frame_times = [max(0.0, float(time_features(pixels, samples, u) @ model["time"])) * slowdown + eval_time
+                   for u, eval_time in zip(positions, eval_times)]
+
+    if model["memory"] is not None:
+        renderer_peak = max(float(memory_features(pixels, u) @ model["memory"]) for u in positions)
+    else:
+        renderer_peak = 0.0
+    process_peak = model["base_rss_mb"] + max(0.0, renderer_peak)
+    return {
+        "profile": profile,
+        "workers": workers,
+        "threads_per_worker": threads,
+        "frames": len(frame_times),
+        "resolution_percentage": percentage,
+        "samples": samples,
+        "render_time": sum(frame_times),
+        "wall_time": model["startup_time"] + makespan(frame_times, workers, chunk_size),
+        "peak_memory_mb": process_peak * workers,
+    }
+
+
+def probe_scene(scene, frames, percentages, sample_fractions):
+    """
+    Probe renders over frames x resolution x samples, plus the thread scaling probe
+    """
+    cores = os.cpu_count() or 1
+    samples = configured_samples(scene)
+    sample_counts = sorted({max(1, round(samples * fraction)) for fraction in sample_fractions})
+    prober = Prober(scene)
+
+    # the first render compiles shaders and builds caches, it is not representative
+    prober.render(frames[0], min(percentages), min(sample_counts))
+    rows = [prober.render(frame, percentage, count)
+            for frame in frames for percentage in percentages for count in sample_counts]
+
+    middle = frames[len(frames) // 2]
+    full = prober.render(middle, max(percentages), max(sample_counts), cores)
+    reduced = prober.render(middle, max(percentages), max(sample_counts), max(1, cores // 2))
+    return rows, thread_scaling(full["render_time"], reduced["render_time"], cores), [full, reduced]
+
+
+def estimate(scene, args):
+    """
+    Probe the scene, fit the model and predict every profile and worker count
+    """
+    cores = os.cpu_count() or 1
+    render = scene.render
+    scene_info = {
+        "engine": render.engine,
+        "engine_key": "cycles" if render.engine == "CYCLES" else "eevee",
+        "samples": configured_samples(scene),
+        "width": render.resolution_x,
+        "height": render.resolution_y,
+        "frame_start": scene.frame_start,
+        "frame_end": scene.frame_end,
+        "frame_step": scene.frame_step,
+    }
+    frames = stratified_frames(scene.frame_start, scene.frame_end, args.probe_frames)
+    base_rss = current_rss_mb() or 0.0
+
+    started = time.perf_counter()
+    rows, parallel, scaling_rows = probe_scene(scene, frames, args.probe_resolution, args.probe_samples)
+    probe_time = time.perf_counter() - started
+    for row in rows:
+        row["u"] = position(row["frame"], scene.frame_start, scene.frame_end)
+
+    peaks = [row for row in rows if row["peak_memory_mb"] is not None]
+    eval_by_frame = {}
+    for row in rows:
+        eval_by_frame.setdefault(row["u"], []).append(row["eval_time"])
+    model = {
+        "time": fit(rows, lambda row: time_features(row["megapixels"], row["samples"], row["u"]), "render_time"),
+        "memory": fit(peaks, lambda row: memory_features(row["megapixels"], row["u"]), "peak_memory_mb")
+        if len(peaks) >= 3 else None,
+        "parallel_fraction": parallel,
+        "eval_positions": sorted(eval_by_frame),
+        "eval_times": [min(eval_by_frame[u]) for u in sorted(eval_by_frame)],
+        "base_rss_mb": base_rss,
+        "startup_time": args.startup_time,
+    }
+
+    fitted = np.array([time_features(row["megapixels"], row["samples"], row["u"]) @ model["time"] for row in rows])
+    measured = np.array([row["render_time"] for row in rows])
+    predictions = [predict(model, scene_info, profile, workers, cores, args.chunk_size)
+                   for profile in args.profiles for workers in args.workers]
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "backend": bpy.app.version_string,
+        "cpu_count": cores,
+        "scene": scene_info,
+        "probe_time": probe_time,
+        "probes": rows,
+        "scaling_probes": scaling_rows,
+        "model": {
+            "time_coefficients": model["time"].tolist(),
+            "memory_coefficients": None if model["memory"] is None else model["memory"].tolist(),
+            "parallel_fraction": parallel,
+            "base_rss_mb": base_rss,
+            "startup_time": args.startup_time,
+            "fit_error": float(np.abs(fitted - measured).mean()),
+        },
+        "predictions": predictions,
+    }
+
+
+def format_duration(seconds):
+    hours, rest = divmod(int(round(seconds)), 3600)
+    return f"{hours}:{rest // 60:02d}:{rest % 60:02d}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Predict render time and memory from sampled probe renders")
+    parser.add_argument("project", choices=sorted(PROJECTS))
+    parser.add_argument("--skip-build", action="store_true", help="estimate the opened .blend file as it is")
+    parser.add_argument("--frames", type=int, nargs=2, metavar=("START", "END"), help="frame range to estimate")
+    parser.add_argument("--step", type=int, help="render every Nth frame")
+    parser.add_argument("--probe-frames", type=int, default=6, help="frames sampled from the range")
+    parser.add_argument("--probe-resolution", type=int, nargs="+", default=[10, 20], metavar="PERCENT",
+                        help="resolution percentages the probes render at")
+    parser.add_argument("--probe-samples", type=float, nargs="+", default=[1 / 16, 1 / 4], metavar="FRACTION",
+                        help="fractions of the configured samples the probes render with")
+    parser.add_argument("--profiles", nargs="+", choices=sorted(PROFILES), default=sorted(PROFILES))
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4], help="worker process counts")
+    parser.add_argument("--chunk-size", type=int, default=10, help="frames per farm chunk")
+    parser.add_argument("--startup-time", type=float, default=0.0,
+                        help="seconds a worker needs to start and load the scene, added to the wall time")
+    parser.add_argument("--out", help="write the probes, model and predictions as JSON")
+    parser.add_argument("--fake", action="store_true", help="run against the bpy stand-in instead of Blender")
+    args = parser.parse_args(script_argv())
+
+    if not args.skip_build:
+        prepare_project(args.project)
+        load_project(args.project).build()
+    scene = bpy.context.scene
+    if args.frames:
+        scene.frame_start, scene.frame_end = args.frames
+    if args.step:
+        scene.frame_step = args.step
+
+    report = estimate(scene, args)
+    model = report["model"]
+    print(f"{len(report['probes'])} probes in {report['probe_time']:.1f}s, mean fit error "
+          f"{model['fit_error'] * 1000:.1f}ms, parallel fraction {model['parallel_fraction']:.2f}")
+    for row in report["predictions"]:
+        print(f"{row['profile']:<8} {row['workers']} x {row['threads_per_worker']:<3} threads  "
+              f"{row['frames']} frames  wall {format_duration(row['wall_time'])}  "
+              f"peak {row['peak_memory_mb']:.0f} MB")
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as report_file:
+            json.dump(report, report_file, indent=2)
+        print(f"estimate written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
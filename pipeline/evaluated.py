@@ -0,0 +1,190 @@
+"""
+Fingerprints of the evaluated scene state of a frame.
+
+A frame's fingerprint covers everything that ends up in the rendered image:
+the world matrix, evaluated geometry and materials of every visible object
+and instance, the camera, the world and the render settings. Two frames
+with the same fingerprint render to the same image, which is what the frame
+cache and loop detection build on.
+
+The depsgraph is the one bpy.context hands out, so geometry is taken as
+evaluated for the viewport; a geometry nodes tree that branches on
+Is Viewport is fingerprinted on its viewport branch and its inputs. The
+viewport proxies (pipeline.proxy) are such a branch, frame_cache switches
+them off while it takes fingerprints.
+"""
+import hashlib
+
+import numpy as np
+
+# bump when the fingerprint changes meaning, invalidates every cached frame
+FINGERPRINT_VERSION = 2
+
+# per attribute data type: foreach_get property, values per element, buffer type
+ATTRIBUTE_LAYOUT = {
+    "FLOAT": ("value", 1, np.float32),
+    "INT": ("value", 1, np.int32),
+    "INT8": ("value", 1, np.int32),
+    "BOOLEAN": ("value", 1, np.bool_),
+    "FLOAT2": ("vector", 2, np.float32),
+    "INT32_2D": ("value", 2, np.int32),
+    "FLOAT_VECTOR": ("vector", 3, np.float32),
+    "FLOAT_COLOR": ("color", 4, np.float32),
+    "BYTE_COLOR": ("color", 4, np.float32),
+    "QUATERNION": ("value", 4, np.float32),
+}
+
+CAMERA_PROPS = ("type", "lens", "ortho_scale", "sensor_width", "sensor_height", "sensor_fit", "shift_x", "shift_y",
+                "clip_start", "clip_end")
+LIGHT_PROPS = ("type", "energy", "color", "shadow_soft_size", "spot_size", "spot_blend")
+RENDER_PROPS = ("engine", "resolution_x", "resolution_y", "resolution_percentage", "pixel_aspect_x",
+                "pixel_aspect_y", "use_border", "use_crop_to_border", "border_min_x", "border_max_x",
+                "border_min_y", "border_max_y", "film_transparent")
+IMAGE_PROPS = ("file_format", "color_mode", "color_depth", "compression")
+VIEW_PROPS = ("view_transform", "look", "exposure", "gamma")
+CYCLES_PROPS = ("samples", "seed", "use_animated_seed", "use_denoising", "max_bounces", "device")
+EEVEE_PROPS = ("taa_render_samples", "use_bloom", "bloom_threshold", "bloom_intensity", "bloom_radius", "use_gtao",
+               "use_ssr")
+
+
+def _plain(value):
+    """
+    Hashable, address-free stand-in for an RNA property value
+    """
+    if isinstance(value, (bool, int, float, str)) or value is None:
+        return value
+    name = getattr(value, "name_full", None)
+    if isinstance(name, str):
+        # datablock pointer
+        return name
+    try:
+        return tuple(_plain(part) for part in value)
+    except TypeError:
+        return type(value).__name__
+
+
+def _props(struct, names):
+    return repr(tuple((name, _plain(getattr(struct, name, None))) for name in names)).encode()
+
+
+def _update_array(digest, collection, prop, width, dtype):
+    values = np.empty(len(collection) * width, dtype=dtype)
+    if len(values):
+        collection.foreach_get(prop, values)
+    digest.update(values.tobytes())
+
+
+def geometry_hash(data, object_type):
+    """
+    Digest of evaluated mesh, point cloud or curves data: topology and every generic attribute
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(object_type.encode())
+    if object_type == "MESH":
+        _update_array(digest, data.loops, "vertex_index", 1, np.int32)
+        _update_array(digest, data.polygons, "loop_start", 1, np.int32)
+        _update_array(digest, data.polygons, "material_index", 1, np.int32)
+    if object_type in ("MESH", "POINTCLOUD", "CURVES"):
+        for attribute in sorted(data.attributes, key=lambda attribute: attribute.name):
+            layout = ATTRIBUTE_LAYOUT.get(attribute.data_type)
+            if layout is None:
+                continue
+            digest.update(f"{attribute.name}:{attribute.domain}:{attribute.data_type}".encode())
+            _update_array(digest, attribute.data, *layout)
+    elif object_type == "CAMERA":
+        digest.update(_props(data, CAMERA_PROPS))
+    elif object_type == "LIGHT":
+        digest.update(_props(data, LIGHT_PROPS))
+    return digest.digest()
+
+
+def node_tree_hash(tree, seen=None):
+    """
+    Digest of a node tree's nodes, unlinked input values and links, node groups included
+    """
+    seen = {} if seen is None else seen
+    if tree.name_full in seen:
+        return seen[tree.name_full]
+    digest = hashlib.blake2b(digest_size=16)
+    for node in sorted(tree.nodes, key=lambda node: node.name):
+        digest.update(f"{node.bl_idname}:{node.name}:{node.mute}".encode())
+        for socket in node.inputs:
+            if not socket.is_linked and hasattr(socket, "default_value"):
+                digest.update(repr((socket.identifier, _plain(socket.default_value))).encode())
+        if node.bl_idname in ("ShaderNodeGroup", "GeometryNodeGroup") and node.node_tree is not None:
+            digest.update(node_tree_hash(node.node_tree, seen))
+    for link in tree.links:
+        digest.update(f"{link.from_node.name}.{link.from_socket.identifier}>"
+                      f"{link.to_node.name}.{link.to_socket.identifier}".encode())
+    seen[tree.name_full] = digest.digest()
+    return seen[tree.name_full]
+
+
+def material_hash(material, depsgraph, seen):
+    if material is None:
+        return b""
+    if material.name_full not in seen:
+        evaluated = material.evaluated_get(depsgraph)
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(_props(evaluated, ("diffuse_color", "blend_method")))
+        if evaluated.use_nodes and evaluated.node_tree is not None:
+            digest.update(node_tree_hash(evaluated.node_tree))
+        seen[material.name_full] = digest.digest()
+    return seen[material.name_full]
+
+
+def render_settings_hash(scene):
+    """
+    Digest of the settings shared by every frame: render, output, color management, world and compositor
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"v{FINGERPRINT_VERSION}".encode())
+    render = scene.render
+    digest.update(_props(render, RENDER_PROPS))
+    digest.update(_props(render.image_settings, IMAGE_PROPS))
+    digest.update(_props(scene.view_settings, VIEW_PROPS))
+    if render.engine == "CYCLES":
+        digest.update(_props(scene.cycles, CYCLES_PROPS))
+        if scene.cycles.use_animated_seed:
+            # the noise pattern changes every frame
+            digest.update(f"frame {scene.frame_current}".encode())
+    else:
+        digest.update(_props(scene.eevee, EEVEE_PROPS))
+    if scene.world is not None and scene.world.use_nodes:
+        digest.update(node_tree_hash(scene.world.node_tree))
+    if scene.use_nodes and scene.node_tree is not None:
+        digest.update(node_tree_hash(scene.node_tree))
+    return digest.digest()
+
+
+def frame_fingerprint(scene, depsgraph):
+    """
+    Hex digest of the evaluated state of the scene's current frame
+    """
+    geometry = {}
+    materials = {}
+    instances = []
+    for instance in depsgraph.object_instances:
+        obj = instance.object
+        if not instance.is_instance and obj.original.hide_render:
+            continue
+        if obj.type in ("EMPTY", "ARMATURE", "LATTICE"):
+            continue
+        data = obj.data
+        key = data.as_pointer()
+        if key not in geometry:
+            geometry[key] = geometry_hash(data, obj.type)
+        digest = hashlib.blake2b(geometry[key], digest_size=16)
+        digest.update(np.asarray(instance.matrix_world, dtype=np.float32).tobytes())
+        for slot in obj.material_slots:
+            digest.update(material_hash(slot.material, depsgraph, materials))
+        instances.append(digest.digest())
+
+    # instance order is not guaranteed between evaluations
+    fingerprint = hashlib.blake2b(render_settings_hash(scene), digest_size=20)
+    for digest in sorted(instances):
+        fingerprint.update(digest)
+    if scene.camera is not None:
+        fingerprint.update(np.asarray(scene.camera.evaluated_get(depsgraph).matrix_world, dtype=np.float32).tobytes())
+        fingerprint.update(geometry_hash(scene.camera.data, "CAMERA"))
+    return fingerprint.hexdigest()
@@ -0,0 +1,191 @@
+"""
+Export the evaluated geometry of every frame to a geometry stream.
+
+Each frame is evaluated and what ends up in the render is written to a
+chunked binary stream (see pipeline.geostream) that other tools read with
+NumPy alone:
+
+    points      point clouds made by geometry nodes, e.g. the dissolve particles, with
+                position, radius and every named attribute such as 'PR'
+    instances   objects sharing one mesh, e.g. the golden spiral spheres, grouped per mesh
+                with their world matrices, locations and scales
+    mesh        with --meshes, evaluated meshes with their topology and attributes
+
+    blender -b cache/dissolve.blend -P pipeline/export_geometry.py -- dissolve_mesh --skip-build --out exports/dissolve
+    blender -b -P pipeline/export_geometry.py -- golden_spiral --frames 1 120 --out exports/spiral
+    python -m pipeline.export_geometry golden_spiral --fake --frames 1 10 --out exports/spiral
+"""
+import argparse
+import fnmatch
+import os
+import sys
+import time
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if "--fake" in sys.argv:
+        from pipeline import fake_bpy
+        fake_bpy.install()
+
+import bpy
+import numpy as np
+
+from pipeline.evaluated import ATTRIBUTE_LAYOUT
+from pipeline.geostream import GeometryWriter
+from pipeline.projects import PROJECTS, load_project, script_argv
+from pipeline.scene import prepare_project
+
+# stored narrower than foreach_get can fill them
+STORED_TYPES = {"INT8": np.int8}
+
+
+def read_array(collection, prop, width, dtype):
+    values = np.empty(len(collection) * width, dtype=dtype)
+    if len(values):
+        collection.foreach_get(prop, values)
+    return values.reshape(-1, width) if width > 1 else values
+
+
+def read_attributes(data):
+    """
+    Every generic attribute of evaluated geometry as {name: (array, domain)}, internal ones left out
+    """
+    arrays = {}
+    for attribute in data.attributes:
+        layout = ATTRIBUTE_LAYOUT.get(attribute.data_type)
+        if attribute.name.startswith(".") or layout is None:
+            continue
+        values = read_array(attribute.data, *layout)
+        if attribute.data_type in STORED_TYPES:
+            values = values.astype(STORED_TYPES[attribute.data_type])
+        arrays[attribute.name] = (values, attribute.domain)
+    return arrays
+
+
+def mesh_attributes(mesh):
+    arrays = read_attributes(mesh)
+    arrays["corner_verts"] = (read_array(mesh.loops, "vertex_index", 1, np.int32), "CORNER")
+    arrays["face_offsets"] = (read_array(mesh.polygons, "loop_start", 1, np.int32), "FACE")
+    return arrays
+
+
+def bounds_radius(mesh):
+    """
+    Distance of the farthest vertex from the mesh origin, a sphere's radius
+    """
+    positions = read_array(mesh.vertices, "co", 3, np.float32)
+    return float(np.sqrt((positions ** 2).sum(axis=1).max())) if len(positions) else 0.0
+
+
+def unique_key(records, key):
+    if key not in records:
+        return key
+    index = 1
+    while f"{key}#{index}" in records:
+        index += 1
+    return f"{key}#{index}"
+
+
+def frame_records(depsgraph, patterns=None, meshes=False):
+    """
+    The records of the current frame, see the module docstring
+    """
+    records = {}
+    groups = {}
+    for instance in depsgraph.object_instances:
+        obj = instance.object
+        if patterns and not any(fnmatch.fnmatchcase(obj.name, pattern) for pattern in patterns):
+            continue
+        if not instance.is_instance and obj.original.hide_render:
+            continue
+        matrix = np.array(instance.matrix_world, dtype=np.float32)
+
+        if obj.type == "POINTCLOUD" or (obj.type == "MESH" and meshes):
+            kind = "points" if obj.type == "POINTCLOUD" else "mesh"
+            attributes = mesh_attributes(obj.data) if kind == "mesh" else read_attributes(obj.data)
+            key = unique_key(records, f"{obj.name}/{kind}")
+            records[key] = {
+                "kind": kind,
+                "object": obj.name,
+                "count": len(obj.data.vertices) if kind == "mesh" else len(obj.data.points),
+                "matrix_world": matrix.ravel().tolist(),
+                "attributes": attributes,
+            }
+        elif obj.type == "MESH":
+            group = groups.setdefault(obj.data.name, {"mesh": obj.data, "objects": [], "matrices": []})
+            group["objects"].append(obj.name)
+            group["matrices"].append(matrix)
+
+    for name, group in groups.items():
+        matrices = np.array(group["matrices"], dtype=np.float32).reshape(-1, 4, 4)
+        records[unique_key(records, f"{name}/instances")] = {
+            "kind": "instances",
+            "mesh": name,
+            "count": len(matrices),
+            "objects": group["objects"],
+            "bounds_radius": bounds_radius(group["mesh"]),
+            "attributes": {
+                "matrix_world": (matrices, "INSTANCE"),
+                "location": (matrices[:, :3, 3], "INSTANCE"),
+                "scale": (np.linalg.norm(matrices[:, :3, :3], axis=1), "INSTANCE"),
+            },
+        }
+    return records
+
+
+def export(scene, writer, patterns=None, meshes=False):
+    """
+    Evaluate and write every frame of the scene's range, returns the seconds spent per frame
+    """
+    timings = []
+    for frame in range(scene.frame_start, scene.frame_end + 1, scene.frame_step):
+        started = time.perf_counter()
+        scene.frame_set(frame)
+        writer.add_frame(frame, frame_records(bpy.context.evaluated_depsgraph_get(), patterns, meshes))
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export evaluated geometry of every frame to a geometry stream")
+    parser.add_argument("project", choices=sorted(PROJECTS))
+    parser.add_argument("--out", required=True, help="stream directory, replaced if it exists")
+    parser.add_argument("--skip-build", action="store_true", help="export the opened .blend file as it is")
+    parser.add_argument("--frames", type=int, nargs=2, metavar=("START", "END"))
+    parser.add_argument("--step", type=int)
+    parser.add_argument("--objects", nargs="+", metavar="PATTERN", help="only objects matching these names")
+    parser.add_argument("--meshes", action="store_true", help="also export evaluated meshes in full")
+    parser.add_argument("--chunk-mb", type=int, default=256, help="size at which a new chunk file is started")
+    parser.add_argument("--fake", action="store_true", help="run against the bpy stand-in instead of Blender")
+    args = parser.parse_args(script_argv())
+
+    if not args.skip_build:
+        prepare_project(args.project)
+        load_project(args.project).build()
+    scene = bpy.context.scene
+    if args.frames:
+        scene.frame_start, scene.frame_end = args.frames
+    if args.step:
+        scene.frame_step = args.step
+
+    out = os.path.abspath(args.out)
+    header = {
+        "project": args.project,
+        "frame_start": scene.frame_start,
+        "frame_end": scene.frame_end,
+        "frame_step": scene.frame_step,
+        "fps": scene.render.fps / scene.render.fps_base,
+    }
+    writer = GeometryWriter(out, header, args.chunk_mb * 1024 * 1024)
+    try:
+        timings = export(scene, writer, args.objects, args.meshes)
+    finally:
+        writer.close()
+
+    size = sum(os.path.getsize(os.path.join(out, name)) for name in os.listdir(out))
+    print(f"exported {len(timings)} frames to {out}, {size / 1e6:.1f} MB, "
+          f"{sum(timings) / max(1, len(timings)) * 1000:.1f}ms per frame")
+
+
+if __name__ == "__main__":
+    main()
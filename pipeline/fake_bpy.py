@@ -0,0 +1,1187 @@
+"""
+Recording stand-in for the parts of bpy used by the project scripts.
+
+Installing it registers this module as "bpy" so the scripts can be imported
+and their build paths run with plain Python. Operators perform just enough
+bookkeeping for the builders to run (objects get created, selected, deleted)
+and every operator call, datablock creation and RNA property write made from
+Python is recorded, which makes the Python-side cost of a build measurable
+on machines without Blender.
+"""
+import os
+import re
+import sys
+from collections import Counter
+from contextlib import contextmanager
+
+
+class Recorder:
+    """
+    Keeps the operator calls, datablock creations and property writes made since the last reset
+    """
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.ops = Counter()
+        self.datablocks = Counter()
+        self.rna_writes = Counter()
+
+    def summary(self):
+        return {
+            "ops": sum(self.ops.values()),
+            "datablocks": sum(self.datablocks.values()),
+            "rna_writes": sum(self.rna_writes.values()),
+            "ops_by_name": dict(self.ops),
+            "datablocks_by_type": dict(self.datablocks),
+            "rna_writes_by_property": dict(self.rna_writes),
+        }
+
+
+recorder = Recorder()
+
+
+@contextmanager
+def recording():
+    """
+    Count what happens inside the block, e.g. one scene build
+    """
+    recorder.reset()
+    yield recorder
+
+
+def _unique_name(existing, name):
+    if name not in existing:
+        return name
+    index = 1
+    while f"{name}.{index:03d}" in existing:
+        index += 1
+    return f"{name}.{index:03d}"
+
+
+class Struct:
+    """
+    Generic RNA struct, unknown properties spring into existence on first access
+    """
+    def __init__(self, **props):
+        for key, value in props.items():
+            object.__setattr__(self, key, value)
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        value = Struct()
+        object.__setattr__(self, name, value)
+        return value
+
+    def __setattr__(self, name, value):
+        recorder.rna_writes[f"{type(self).__name__}.{name}"] += 1
+        object.__setattr__(self, name, value)
+
+    def keyframe_insert(self, data_path, frame=None, index=-1):
+        if frame is None:
+            frame = context.scene.frame_current
+        keys = self.__dict__.setdefault("_keyframes", {})
+        if data_path not in keys:
+            _animated.append((self, data_path))
+        value = getattr(self, data_path)
+        if isinstance(value, (list, tuple)):
+            value = tuple(value)
+        keys.setdefault(data_path, []).append((float(frame), value))
+        keys[data_path].sort(key=lambda key: key[0])
+        return True
+
+    def animation_keys(self, data_path):
+        return list(self.__dict__.get("_keyframes", {}).get(data_path, []))
+
+
+# (owner, data_path) pairs with keyframes, evaluated on frame change
+_animated = []
+
+
+def _interpolate(keys, frame):
+    if frame <= keys[0][0]:
+        return keys[0][1]
+    if frame >= keys[-1][0]:
+        return keys[-1][1]
+    for (f0, v0), (f1, v1) in zip(keys, keys[1:]):
+        if f0 <= frame <= f1:
+            t = (frame - f0) / (f1 - f0) if f1 != f0 else 0.0
+            if isinstance(v0, tuple):
+                return tuple(a + (b - a) * t for a, b in zip(v0, v1))
+            if isinstance(v0, (int, float)) and not isinstance(v0, bool):
+                return v0 + (v1 - v0) * t
+            return v0
+    return keys[-1][1]
+
+
+def _evaluate_animation(frame):
+    for owner, data_path in _animated:
+        keys = owner.animation_keys(data_path)
+        if keys:
+            object.__setattr__(owner, data_path, _interpolate(keys, frame))
+
+
+class Collection:
+    """
+    Ordered collection addressable by name or index
+    """
+    def __init__(self, items=None):
+        self._items = list(items or [])
+
+    def _find(self, name):
+        for item in self._items:
+            if item.name == name:
+                return item
+        return None
+
+    def __getitem__(self, key):
+        if isinstance(key, (int, slice)):
+            return self._items[key]
+        item = self._find(key)
+        if item is None:
+            raise KeyError(f"bpy_prop_collection[key]: key \"{key}\" not found")
+        return item
+
+    def __contains__(self, key):
+        if isinstance(key, str):
+            return self._find(key) is not None
+        return key in self._items
+
+    def __iter__(self):
+        return iter(list(self._items))
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key, default=None):
+        item = self._find(key)
+        return default if item is None else item
+
+    def keys(self):
+        return [item.name for item in self._items]
+
+    def values(self):
+        return list(self._items)
+
+    def items(self):
+        return [(item.name, item) for item in self._items]
+
+
+class ID(Struct):
+    """
+    Datablock with a unique name inside its bpy.data collection
+    """
+    def __init__(self, name, **props):
+        object.__setattr__(self, "_owner", None)
+        object.__setattr__(self, "_props", {})
+        super().__init__(**props)
+        object.__setattr__(self, "name", name)
+
+    def __setattr__(self, name, value):
+        recorder.rna_writes[f"{type(self).__name__}.{name}"] += 1
+        if name == "name" and self._owner is not None:
+            self._owner.rename(self, value)
+            return
+        object.__setattr__(self, name, value)
+
+    def __getitem__(self, key):
+        return self._props[key]
+
+    def __setitem__(self, key, value):
+        self._props[key] = value
+
+    def __delitem__(self, key):
+        del self._props[key]
+
+    def __contains__(self, key):
+        return key in self._props
+
+    def get(self, key, default=None):
+        return self._props.get(key, default)
+
+    def keys(self):
+        return self._props.keys()
+
+    @property
+    def name_full(self):
+        return self.name
+
+    def evaluated_get(self, depsgraph):
+        return self
+
+    @property
+    def original(self):
+        return self
+
+    def as_pointer(self):
+        return id(self)
+
+    def copy(self):
+        clone = type(self).__new__(type(self))
+        state = dict(self.__dict__)
+        for key, value in state.items():
+            if isinstance(value, Collection):
+                copied = type(value).__new__(type(value))
+                copied.__dict__.update(value.__dict__)
+                copied._items = list(value._items)
+                state[key] = copied
+        state["_props"] = dict(self._props)
+        state["_owner"] = None
+        if "_keyframes" in state:
+            state["_keyframes"] = {path: list(keys) for path, keys in state["_keyframes"].items()}
+            _animated.extend((clone, path) for path in state["_keyframes"])
+        object.__setattr__(clone, "__dict__", state)
+        return self._owner.adopt(clone) if self._owner is not None else clone
+
+
+class IDCollection(Collection):
+    """
+    bpy.data collection of datablocks of one type
+    """
+    def __init__(self, name, factory):
+        super().__init__()
+        self._name = name
+        self._factory = factory
+        self._by_name = {}
+
+    def _find(self, name):
+        return self._by_name.get(name)
+
+    def adopt(self, item):
+        name = _unique_name(self._by_name, item.name)
+        object.__setattr__(item, "name", name)
+        object.__setattr__(item, "_owner", self)
+        self._items.append(item)
+        self._by_name[name] = item
+        recorder.datablocks[self._name] += 1
+        return item
+
+    def rename(self, item, name):
+        if self._by_name.get(item.name) is item:
+            del self._by_name[item.name]
+        name = _unique_name(self._by_name, name)
+        object.__setattr__(item, "name", name)
+        self._by_name[name] = item
+
+    def new(self, name, *args, **kwargs):
+        return self.adopt(self._factory(name, *args, **kwargs))
+
+    def remove(self, item, do_unlink=True):
+        self._items.remove(item)
+        del self._by_name[item.name]
+        object.__setattr__(item, "_owner", None)
+        if isinstance(item, Object):
+            for collection in [context.scene.collection] + list(data.collections):
+                if item in collection.objects:
+                    collection.objects.unlink(item)
+
+
+class ObjectList(Collection):
+    """
+    Objects linked into a collection
+    """
+    def link(self, obj):
+        if obj not in self._items:
+            self._items.append(obj)
+
+    def unlink(self, obj):
+        self._items.remove(obj)
+
+
+class LayerObjects(Collection):
+    """
+    Objects visible to the view layer, i.e. linked into the scene or one of its collections
+    """
+    def __init__(self):
+        self._active = None
+
+    @property
+    def _items(self):
+        found = {}
+        for collection in [context.scene.collection] + list(data.collections):
+            for obj in collection.objects._items:
+                found.setdefault(id(obj), obj)
+        return list(found.values())
+
+    @property
+    def active(self):
+        if self._active is not None and self._active._owner is None:
+            self._active = None
+        return self._active
+
+    @active.setter
+    def active(self, obj):
+        self._active = obj
+
+
+class SceneCollection(Struct):
+    def __init__(self, name="Scene Collection"):
+        super().__init__(name=name, objects=ObjectList(), children=Collection())
+
+
+class Socket(Struct):
+    def __init__(self, name, node):
+        super().__init__(name=name, identifier=name, node=node, default_value=[0.0, 0.0, 0.0, 0.0],
+                         enabled=True, hide=False)
+
+    @property
+    def links(self):
+        tree = self.node.id_data
+        return [link for link in tree.links if link.to_socket is self or link.from_socket is self]
+
+    @property
+    def is_linked(self):
+        return bool(self.links)
+
+
+class Sockets(Collection):
+    """
+    Node sockets, created on first lookup since the stand-in has no node type database
+    """
+    def __init__(self, node):
+        super().__init__()
+        self._node = node
+        self._by_index = {}
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            if key not in self._by_index:
+                self._by_index[key] = Socket(str(key), self._node)
+                self._items.append(self._by_index[key])
+            return self._by_index[key]
+        item = self._find(key)
+        if item is None:
+            item = Socket(key, self._node)
+            self._items.append(item)
+        return item
+
+    def __contains__(self, key):
+        return True
+
+
+# names Blender gives to freshly added nodes, keyed by node type
+NODE_NAMES = {
+    "ShaderNodeBsdfPrincipled": "Principled BSDF",
+    "ShaderNodeOutputMaterial": "Material Output",
+    "ShaderNodeEmission": "Emission",
+    "ShaderNodeBsdfGlossy": "Glossy BSDF",
+    "ShaderNodeBackground": "Background",
+    "ShaderNodeOutputWorld": "World Output",
+    "NodeGroupInput": "Group Input",
+    "NodeGroupOutput": "Group Output",
+}
+
+
+class Node(Struct):
+    def __init__(self, name, node_type, tree):
+        super().__init__(name=name, bl_idname=node_type, type=node_type, id_data=tree,
+                         location=(0.0, 0.0), label="", mute=False)
+        object.__setattr__(self, "inputs", Sockets(self))
+        object.__setattr__(self, "outputs", Sockets(self))
+
+
+class Nodes(Collection):
+    def __init__(self, tree):
+        super().__init__()
+        self._tree = tree
+
+    def new(self, type):
+        base = NODE_NAMES.get(type, type)
+        node = Node(_unique_name(set(self.keys()), base), type, self._tree)
+        self._items.append(node)
+        return node
+
+    def remove(self, node):
+        for link in list(self._tree.links):
+            if link.from_node is node or link.to_node is node:
+                self._tree.links.remove(link)
+        self._items.remove(node)
+
+    def clear(self):
+        for node in list(self._items):
+            self.remove(node)
+
+
+class Link(Struct):
+    def __init__(self, from_socket, to_socket):
+        super().__init__(from_socket=from_socket, to_socket=to_socket,
+                         from_node=from_socket.node, to_node=to_socket.node, is_valid=True)
+
+
+class Links(Collection):
+    def new(self, from_socket, to_socket):
+        # an input socket accepts a single link, like in Blender
+        for link in list(self._items):
+            if link.to_socket is to_socket:
+                self._items.remove(link)
+        link = Link(from_socket, to_socket)
+        self._items.append(link)
+        return link
+
+    def remove(self, link):
+        self._items.remove(link)
+
+    def clear(self):
+        self._items.clear()
+
+
+class InterfaceItems(Collection):
+    def new_socket(self, name, in_out="INPUT", socket_type="NodeSocketFloat"):
+        item = Struct(name=name, in_out=in_out, socket_type=socket_type, item_type="SOCKET",
+                      identifier=f"Socket_{len(self._items)}", default_value=0.0)
+        self._items.append(item)
+        return item
+
+    def remove(self, item):
+        self._items.remove(item)
+
+    @property
+    def items_tree(self):
+        return self
+
+
+class NodeTree(ID):
+    def __init__(self, name, type="ShaderNodeTree"):
+        super().__init__(name, bl_idname=type, type=type)
+        object.__setattr__(self, "nodes", Nodes(self))
+        object.__setattr__(self, "links", Links())
+        object.__setattr__(self, "interface", InterfaceItems())
+
+
+class Material(ID):
+    def __init__(self, name):
+        super().__init__(name, node_tree=None, diffuse_color=(0.8, 0.8, 0.8, 1.0))
+        object.__setattr__(self, "_use_nodes", False)
+
+    @property
+    def use_nodes(self):
+        return self._use_nodes
+
+    @use_nodes.setter
+    def use_nodes(self, value):
+        if value and self.node_tree is None:
+            tree = NodeTree("Shader Nodetree")
+            bsdf = tree.nodes.new("ShaderNodeBsdfPrincipled")
+            output = tree.nodes.new("ShaderNodeOutputMaterial")
+            tree.links.new(bsdf.outputs["BSDF"], output.inputs["Surface"])
+            object.__setattr__(self, "node_tree", tree)
+        object.__setattr__(self, "_use_nodes", bool(value))
+
+
+class World(ID):
+    def __init__(self, name):
+        super().__init__(name, use_nodes=True)
+        tree = NodeTree("Shader Nodetree")
+        background = tree.nodes.new("ShaderNodeBackground")
+        output = tree.nodes.new("ShaderNodeOutputWorld")
+        tree.links.new(background.outputs["Background"], output.inputs["Surface"])
+        object.__setattr__(self, "node_tree", tree)
+
+
+class MaterialSlots(list):
+    def append(self, material):
+        super().append(material)
+
+    def pop(self, index=-1):
+        return super().pop(index)
+
+
+class Elements:
+    """
+    Mesh element array with only a length; foreach_get reads zeros
+    """
+    def __init__(self, count):
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def foreach_get(self, prop, values):
+        values[:] = 0
+
+    def foreach_set(self, prop, values):
+        pass
+
+
+class MeshAttributes:
+    """
+    Generic attributes of a mesh, 'position' always first
+    """
+    def __init__(self, mesh):
+        self._mesh = mesh
+        self._custom = []
+
+    def new(self, name, type, domain):
+        attribute = Struct(name=name, domain=domain, data_type=type, data=Elements(self._mesh.vertex_count))
+        self._custom.append(attribute)
+        return attribute
+
+    def __iter__(self):
+        position = Struct(name="position", domain="POINT", data_type="FLOAT_VECTOR", data=self._mesh.vertices)
+        return iter([position] + self._custom)
+
+
+class Mesh(ID):
+    def __init__(self, name, vertex_count=0, face_count=0):
+        super().__init__(name, vertex_count=vertex_count, face_count=face_count)
+        object.__setattr__(self, "materials", MaterialSlots())
+        object.__setattr__(self, "attributes", MeshAttributes(self))
+
+    def from_pydata(self, vertices, edges, faces):
+        object.__setattr__(self, "vertex_count", len(vertices))
+        object.__setattr__(self, "face_count", len(faces))
+
+    def calc_loop_triangles(self):
+        pass
+
+    @property
+    def vertices(self):
+        return Elements(self.vertex_count)
+
+    @property
+    def polygons(self):
+        return Elements(self.face_count)
+
+    @property
+    def loops(self):
+        return Elements(self.face_count * 4)
+
+    @property
+    def loop_triangles(self):
+        return Elements(self.face_count * 2)
+
+
+class Curve(ID):
+    def __init__(self, name, type="CURVE"):
+        super().__init__(name, path_duration=100, use_path=True)
+        object.__setattr__(self, "materials", MaterialSlots())
+        object.__setattr__(self, "splines", Splines())
+
+
+class Points(Collection):
+    def add(self, count=1):
+        for _ in range(count):
+            self._items.append(Struct(co=(0.0, 0.0, 0.0, 1.0), select=False))
+
+
+class Splines(Collection):
+    def __init__(self):
+        super().__init__()
+        self.active = None
+
+    def new(self, type):
+        spline = Struct(type=type, points=Points())
+        spline.points.add(1)
+        self._items.append(spline)
+        self.active = spline
+        return spline
+
+
+class Camera(ID):
+    def __init__(self, name):
+        super().__init__(name, lens=50.0, sensor_width=36.0, sensor_fit="AUTO", passepartout_alpha=0.5,
+                         clip_start=0.1, clip_end=1000.0, type="PERSP")
+
+
+class Light(ID):
+    def __init__(self, name, type="POINT"):
+        super().__init__(name, type=type, energy=10.0, color=(1.0, 1.0, 1.0), diffuse_factor=1.0, angle=0.0)
+
+
+class Modifier(Struct):
+    def __init__(self, name, type):
+        super().__init__(name=name, type=type, node_group=None, show_viewport=True, show_render=True)
+        object.__setattr__(self, "_inputs", {})
+
+    def __getitem__(self, key):
+        return self._inputs[key]
+
+    def __setitem__(self, key, value):
+        self._inputs[key] = value
+
+    def get(self, key, default=None):
+        return self._inputs.get(key, default)
+
+    def keys(self):
+        return self._inputs.keys()
+
+
+class Modifiers(Collection):
+    def new(self, name, type):
+        modifier = Modifier(_unique_name(set(self.keys()), name), type)
+        self._items.append(modifier)
+        return modifier
+
+    def remove(self, modifier):
+        self._items.remove(modifier)
+
+
+# names Blender gives to constraints, keyed by constraint type
+CONSTRAINT_NAMES = {
+    "TRACK_TO": "Track To",
+    "FOLLOW_PATH": "Follow Path",
+    "COPY_LOCATION": "Copy Location",
+    "DAMPED_TRACK": "Damped Track",
+}
+
+
+class Constraints(Collection):
+    def new(self, type):
+        name = CONSTRAINT_NAMES.get(type, type.replace("_", " ").title())
+        constraint = Struct(name=_unique_name(set(self.keys()), name), type=type, target=None)
+        self._items.append(constraint)
+        return constraint
+
+    def remove(self, constraint):
+        self._items.remove(constraint)
+
+
+class Object(ID):
+    def __init__(self, name, object_data=None):
+        super().__init__(name, data=object_data, mode="OBJECT", location=(0.0, 0.0, 0.0),
+                         rotation_euler=(0.0, 0.0, 0.0), scale=(1.0, 1.0, 1.0), hide_select=False,
+                         hide_viewport=False, hide_render=False, active_material_index=0, parent=None)
+        object.__setattr__(self, "modifiers", Modifiers())
+        object.__setattr__(self, "constraints", Constraints())
+        object.__setattr__(self, "_selected", False)
+        object.__setattr__(self, "_hidden", False)
+
+    @property
+    def type(self):
+        if self.data is None:
+            return "EMPTY"
+        return {Mesh: "MESH", Curve: "CURVE", Camera: "CAMERA", Light: "LIGHT"}.get(type(self.data), "MESH")
+
+    @property
+    def matrix_world(self):
+        x, y, z = self.location
+        return [[1.0, 0.0, 0.0, x], [0.0, 1.0, 0.0, y], [0.0, 0.0, 1.0, z], [0.0, 0.0, 0.0, 1.0]]
+
+    @property
+    def material_slots(self):
+        if not isinstance(self.data, (Mesh, Curve)):
+            return []
+        return [Struct(material=material, name=material.name if material else "") for material in self.data.materials]
+
+    @property
+    def active_material(self):
+        materials = getattr(self.data, "materials", None) or []
+        if 0 <= self.active_material_index < len(materials):
+            return materials[self.active_material_index]
+        return None
+
+    def select_set(self, state):
+        object.__setattr__(self, "_selected", bool(state))
+
+    def select_get(self):
+        return self._selected
+
+    def hide_set(self, state):
+        object.__setattr__(self, "_hidden", bool(state))
+
+    def hide_get(self):
+        return self._hidden
+
+
+class RenderViews(Collection):
+    """
+    Multi-view render views, starting out with the stereo pair
+    """
+    def __init__(self):
+        super().__init__([Struct(name="left", camera_suffix="_L", use=True),
+                          Struct(name="right", camera_suffix="_R", use=True)])
+
+    def new(self, name):
+        view = Struct(name=name, camera_suffix="", use=True)
+        self._items.append(view)
+        return view
+
+    def remove(self, view):
+        self._items.remove(view)
+
+
+class RenderSettings(Struct):
+    def active_views(self):
+        if not self.use_multiview:
+            return [None]
+        return [view for view in self.views if view.use]
+
+    def frame_path(self, frame=None, preview=False, view=""):
+        """
+        Output file of a frame: '#' runs become the zero-padded frame, otherwise four digits are appended,
+        followed by the view's suffix when a view of a multi-view render is named
+        """
+        if frame is None:
+            frame = context.scene.frame_current
+        path = self.filepath
+        if "#" in path:
+            path = re.sub("#+", lambda match: f"{frame:0{len(match.group())}d}", path)
+        else:
+            path = f"{path}{frame:04d}"
+        if view and self.use_multiview:
+            path += next(item.camera_suffix for item in self.views if item.name == view)
+        if self.use_file_extension and self.image_settings.file_format == "PNG" and not path.endswith(".png"):
+            path += ".png"
+        return path
+
+
+class Scene(ID):
+    def __init__(self, name="Scene"):
+        object.__setattr__(self, "_use_nodes", False)
+        object.__setattr__(self, "node_tree", None)
+        super().__init__(name, frame_start=1, frame_end=250, frame_current=1, frame_step=1, camera=None,
+                         world=None)
+        render = RenderSettings(engine="BLENDER_EEVEE", fps=24, fps_base=1.0, resolution_x=1920, resolution_y=1080,
+                                resolution_percentage=100, filepath="/tmp/", use_border=False,
+                                use_crop_to_border=False, border_min_x=0.0, border_max_x=1.0, border_min_y=0.0,
+                                border_max_y=1.0, threads_mode="AUTO", threads=1, use_persistent_data=False,
+                                use_file_extension=True, use_overwrite=True, use_placeholder=False,
+                                pixel_aspect_x=1.0, pixel_aspect_y=1.0, film_transparent=False,
+                                use_multiview=False, views_format="STEREO_3D", views=RenderViews(),
+                                image_settings=Struct(file_format="PNG", color_mode="RGBA", color_depth="8",
+                                                      compression=15, exr_codec="ZIP"),
+                                ffmpeg=Struct(format="MPEG4", codec="H264"))
+        object.__setattr__(self, "render", render)
+        object.__setattr__(self, "cycles", Struct(samples=4096, device="CPU", preview_samples=1024,
+                                                  use_denoising=True, tile_size=2048, seed=0,
+                                                  use_animated_seed=False, max_bounces=12))
+        object.__setattr__(self, "eevee", Struct(taa_render_samples=64, taa_samples=16, use_bloom=False,
+                                                 use_ssr=False, use_gtao=False))
+        object.__setattr__(self, "view_settings", Struct(look="None", view_transform="AgX", exposure=0.0, gamma=1.0))
+        object.__setattr__(self, "collection", SceneCollection())
+
+    @property
+    def objects(self):
+        return Collection(data.objects)
+
+    @property
+    def use_nodes(self):
+        return self._use_nodes
+
+    @use_nodes.setter
+    def use_nodes(self, value):
+        # like Blender, the first enable creates the default compositor tree
+        if value and self.node_tree is None:
+            tree = NodeTree("Compositing Nodetree", "CompositorNodeTree")
+            layers = tree.nodes.new("CompositorNodeRLayers")
+            composite = tree.nodes.new("CompositorNodeComposite")
+            tree.links.new(layers.outputs["Image"], composite.inputs["Image"])
+            object.__setattr__(self, "node_tree", tree)
+        object.__setattr__(self, "_use_nodes", bool(value))
+
+    def frame_set(self, frame, subframe=0.0):
+        for handler in app.handlers.frame_change_pre:
+            handler(self, None)
+        object.__setattr__(self, "frame_current", int(frame))
+        _evaluate_animation(frame + subframe)
+        for handler in app.handlers.frame_change_post:
+            handler(self, context.evaluated_depsgraph_get())
+
+
+class Depsgraph(Struct):
+    def __init__(self):
+        super().__init__()
+
+    @property
+    def scene(self):
+        return context.scene
+
+    @property
+    def objects(self):
+        return [obj for obj in data.objects if obj in context.view_layer.objects]
+
+    @property
+    def object_instances(self):
+        return [Struct(object=obj, is_instance=False, matrix_world=obj.matrix_world) for obj in self.objects]
+
+    def update(self):
+        pass
+
+
+class ViewLayer(Struct):
+    def __init__(self):
+        super().__init__(name="ViewLayer", use_pass_vector=False, use_pass_z=False)
+        object.__setattr__(self, "objects", LayerObjects())
+
+    def update(self):
+        pass
+
+
+class Context(Struct):
+    def __init__(self):
+        super().__init__()
+        object.__setattr__(self, "scene", None)
+        object.__setattr__(self, "view_layer", ViewLayer())
+        object.__setattr__(self, "_depsgraph", Depsgraph())
+
+    @property
+    def active_object(self):
+        return self.view_layer.objects.active
+
+    @property
+    def collection(self):
+        return self.scene.collection
+
+    @property
+    def object(self):
+        return self.view_layer.objects.active
+
+    @property
+    def selected_objects(self):
+        return [obj for obj in self.view_layer.objects if obj.select_get()]
+
+    def evaluated_depsgraph_get(self):
+        return self._depsgraph
+
+
+class Handlers(Struct):
+    def __init__(self):
+        super().__init__()
+        for name in ("frame_change_pre", "frame_change_post", "render_init", "render_pre", "render_post",
+                     "render_write", "render_stats", "render_complete", "render_cancel",
+                     "depsgraph_update_pre", "depsgraph_update_post", "load_pre", "load_post",
+                     "save_pre", "save_post"):
+            object.__setattr__(self, name, [])
+
+    @staticmethod
+    def persistent(function):
+        return function
+
+
+class Data(Struct):
+    def __init__(self):
+        super().__init__()
+        collections = {
+            "objects": Object,
+            "meshes": Mesh,
+            "curves": Curve,
+            "materials": Material,
+            "node_groups": NodeTree,
+            "worlds": World,
+            "cameras": Camera,
+            "lights": Light,
+            "collections": lambda name: ID(name, objects=ObjectList(), children=Collection()),
+            "images": lambda name, width=0, height=0, **kwargs: ID(name, size=(width, height), filepath=""),
+            "actions": ID,
+            "textures": ID,
+            "particles": ID,
+            "scenes": Scene,
+        }
+        for name, factory in collections.items():
+            object.__setattr__(self, name, IDCollection(name, factory))
+        object.__setattr__(self, "filepath", "")
+
+    @property
+    def scene_collection(self):
+        return context.scene.collection
+
+    def batch_remove(self, ids):
+        for item in list(ids):
+            if item._owner is not None:
+                item._owner.remove(item)
+
+
+def _link_new_object(name, object_data, location=(0.0, 0.0, 0.0), rotation=(0.0, 0.0, 0.0),
+                     scale=(1.0, 1.0, 1.0)):
+    obj = data.objects.new(name, object_data)
+    object.__setattr__(obj, "location", tuple(location))
+    object.__setattr__(obj, "rotation_euler", tuple(rotation))
+    object.__setattr__(obj, "scale", tuple(scale))
+    context.scene.collection.objects.link(obj)
+    for other in context.view_layer.objects:
+        other.select_set(False)
+    obj.select_set(True)
+    context.view_layer.objects.active = obj
+    return obj
+
+
+def _uv_sphere_add(segments=32, ring_count=16, radius=1.0, location=(0.0, 0.0, 0.0),
+                   rotation=(0.0, 0.0, 0.0), scale=(1.0, 1.0, 1.0), **kwargs):
+    mesh = data.meshes.new("Sphere", segments * (ring_count - 1) + 2, segments * ring_count)
+    _link_new_object("Sphere", mesh, location, rotation, scale)
+
+
+def _ico_sphere_add(subdivisions=2, radius=1.0, location=(0.0, 0.0, 0.0), rotation=(0.0, 0.0, 0.0),
+                    scale=(1.0, 1.0, 1.0), **kwargs):
+    faces = 20 * 4 ** (subdivisions - 1)
+    mesh = data.meshes.new("Icosphere", faces // 2 + 2, faces)
+    _link_new_object("Icosphere", mesh, location, rotation, scale)
+
+
+def _plane_add(size=2.0, location=(0.0, 0.0, 0.0), rotation=(0.0, 0.0, 0.0), scale=(1.0, 1.0, 1.0), **kwargs):
+    _link_new_object("Plane", data.meshes.new("Plane", 4, 1), location, rotation, scale)
+
+
+def _nurbs_path_add(radius=1.0, location=(0.0, 0.0, 0.0), rotation=(0.0, 0.0, 0.0), **kwargs):
+    curve = data.curves.new("NurbsPath", "CURVE")
+    spline = curve.splines.new("NURBS")
+    spline.points.add(4)
+    _link_new_object("NurbsPath", curve, location, rotation)
+
+
+def _camera_add(location=(0.0, 0.0, 0.0), rotation=(0.0, 0.0, 0.0), **kwargs):
+    _link_new_object("Camera", data.cameras.new("Camera"), location, rotation)
+
+
+def _light_add(type="POINT", location=(0.0, 0.0, 0.0), rotation=(0.0, 0.0, 0.0), **kwargs):
+    name = type.title()
+    _link_new_object(name, data.lights.new(name, type), location, rotation)
+
+
+def _empty_add(type="PLAIN_AXES", location=(0.0, 0.0, 0.0), rotation=(0.0, 0.0, 0.0),
+               scale=(1.0, 1.0, 1.0), **kwargs):
+    obj = _link_new_object("Empty", None, location, rotation, scale)
+    object.__setattr__(obj, "empty_display_type", type)
+
+
+def _select_all(action="TOGGLE"):
+    objects = list(context.view_layer.objects)
+    if action == "TOGGLE":
+        action = "DESELECT" if any(obj.select_get() for obj in objects) else "SELECT"
+    for obj in objects:
+        if action == "SELECT":
+            obj.select_set(True)
+        elif action == "DESELECT":
+            obj.select_set(False)
+        elif action == "INVERT":
+            obj.select_set(not obj.select_get())
+
+
+def _delete(**kwargs):
+    for obj in list(context.view_layer.objects):
+        if obj.select_get():
+            data.objects.remove(obj)
+
+
+def _editmode_toggle(**kwargs):
+    obj = context.active_object
+    if obj is not None:
+        object.__setattr__(obj, "mode", "OBJECT" if obj.mode == "EDIT" else "EDIT")
+
+
+def _constraint_add(type, **kwargs):
+    context.active_object.constraints.new(type)
+
+
+def _material_slot_remove(**kwargs):
+    obj = context.active_object
+    materials = obj.data.materials
+    if materials:
+        materials.pop(min(obj.active_material_index, len(materials) - 1))
+
+
+def _orphans_purge(**kwargs):
+    used = set()
+    for obj in data.objects:
+        if obj.data is not None:
+            used.add(id(obj.data))
+            used.update(id(mat) for mat in getattr(obj.data, "materials", []) if mat is not None)
+        for modifier in obj.modifiers:
+            if modifier.node_group is not None:
+                used.add(id(modifier.node_group))
+    if context.scene.world is not None:
+        used.add(id(context.scene.world))
+    for name in ("meshes", "curves", "materials", "node_groups", "cameras", "lights", "worlds"):
+        collection = getattr(data, name)
+        for item in list(collection):
+            if id(item) not in used and not item.get("use_fake_user", False):
+                collection.remove(item)
+
+
+def _read_homefile(**kwargs):
+    _reset_data()
+
+
+def _save_as_mainfile(filepath="", **kwargs):
+    # nothing to serialize, but later runs expect the file to exist
+    with open(filepath, "w") as blend_file:
+        blend_file.write("stand-in .blend\n")
+    data.filepath = filepath
+
+
+def _open_mainfile(filepath="", **kwargs):
+    _reset_data()
+    data.filepath = filepath
+
+
+def _world_new(**kwargs):
+    data.worlds.new("World")
+
+
+def _render_pixels(scene, frame):
+    """
+    Deterministic stand-in image of a frame: a gradient over the full frame, so
+    border renders cut out exactly the pixels a full render has in that place
+    """
+    import numpy as np
+
+    render = scene.render
+    width = render.resolution_x * render.resolution_percentage // 100
+    height = render.resolution_y * render.resolution_percentage // 100
+    # render border in pixels the way Blender derives it, y counted from the bottom
+    x_min, x_max, y_min, y_max = 0, width, 0, height
+    if render.use_border:
+        x_min, x_max = int(render.border_min_x * width), int(render.border_max_x * width)
+        y_min, y_max = int(render.border_min_y * height), int(render.border_max_y * height)
+
+    depth = 16 if render.image_settings.color_depth == "16" else 8
+    peak = (1 << depth) - 1
+    rows = np.arange(height)[::-1, None]
+    columns = np.arange(width)[None, :]
+    pixels = np.empty((height, width, 4), dtype=np.uint16 if depth == 16 else np.uint8)
+    pixels[:, :, 0] = (columns * peak) // max(1, width - 1)
+    pixels[:, :, 1] = (rows * peak) // max(1, height - 1)
+    pixels[:, :, 2] = ((columns + rows + frame * 7) % 256) * peak // 255
+    pixels[:, :, 3] = peak
+
+    top, bottom = height - y_max, height - y_min
+    if render.use_border and render.use_crop_to_border:
+        return pixels[top:bottom, x_min:x_max]
+    if render.use_border:
+        cropped = np.zeros_like(pixels)
+        cropped[top:bottom, x_min:x_max] = pixels[top:bottom, x_min:x_max]
+        return cropped
+    return pixels
+
+
+def _write_frame(scene, frame):
+    from pipeline.imageio import write_png
+
+    if scene.render.image_settings.file_format != "PNG":
+        return
+    for view in scene.render.active_views():
+        path = scene.render.frame_path(frame=frame, view=view.name if view else "")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        write_png(path, _render_pixels(scene, frame), compression=1)
+
+
+def _render(animation=False, write_still=False, **kwargs):
+    scene = context.scene
+    for handler in app.handlers.render_init:
+        handler(scene, None)
+    frames = [scene.frame_current]
+    if animation:
+        frames = range(scene.frame_start, scene.frame_end + 1, scene.frame_step)
+    for frame in frames:
+        # Blender skips frames whose file exists, before evaluating them
+        if animation and not scene.render.use_overwrite and os.path.exists(scene.render.frame_path(frame=frame)):
+            continue
+        if animation:
+            scene.frame_set(frame)
+        for handler in app.handlers.render_pre:
+            handler(scene, None)
+        for handler in app.handlers.render_stats:
+            handler(f"Fra:{frame} Mem:0.00M (Peak 0.00M) | Time:00:00.00 | Sample 1/1")
+        for handler in app.handlers.render_post:
+            handler(scene, None)
+        if animation or write_still:
+            _write_frame(scene, frame)
+            for handler in app.handlers.render_write:
+                handler(scene, None)
+    for handler in app.handlers.render_complete:
+        handler(scene, None)
+    return {"FINISHED"}
+
+
+# operators that change the stand-in's state; every other operator only gets recorded
+OPERATORS = {
+    "mesh.primitive_uv_sphere_add": _uv_sphere_add,
+    "mesh.primitive_ico_sphere_add": _ico_sphere_add,
+    "mesh.primitive_plane_add": _plane_add,
+    "curve.primitive_nurbs_path_add": _nurbs_path_add,
+    "object.camera_add": _camera_add,
+    "object.light_add": _light_add,
+    "object.empty_add": _empty_add,
+    "object.select_all": _select_all,
+    "object.delete": _delete,
+    "object.editmode_toggle": _editmode_toggle,
+    "object.constraint_add": _constraint_add,
+    "object.material_slot_remove": _material_slot_remove,
+    "outliner.orphans_purge": _orphans_purge,
+    "world.new": _world_new,
+    "wm.read_homefile": _read_homefile,
+    "wm.read_factory_settings": _read_homefile,
+    "wm.save_as_mainfile": _save_as_mainfile,
+    "wm.open_mainfile": _open_mainfile,
+    "render.render": _render,
+}
+
+
+class _BPyOpsSubModOp:
+    """
+    Operator callable, mirrors the attributes of Blender's own wrapper class
+    """
+    __slots__ = ("_module", "_func")
+
+    def __init__(self, module, func):
+        self._module = module
+        self._func = func
+
+    def idname_py(self):
+        return f"{self._module}.{self._func}"
+
+    def poll(self, *args):
+        return True
+
+    def __call__(self, *args, **kwargs):
+        name = self.idname_py()
+        recorder.ops[name] += 1
+        handler = OPERATORS.get(name)
+        if handler is not None:
+            result = handler(**kwargs)
+            if result is not None:
+                return result
+        return {"FINISHED"}
+
+
+class _BPyOpsSubMod:
+    def __init__(self, module):
+        self._module = module
+
+    def __getattr__(self, func):
+        if func.startswith("_"):
+            raise AttributeError(func)
+        return _BPyOpsSubModOp(self._module, func)
+
+
+class _BPyOps:
+    def __getattr__(self, module):
+        if module.startswith("_"):
+            raise AttributeError(module)
+        return _BPyOpsSubMod(module)
+
+
+def _reset_data():
+    global data, context
+    _animated.clear()
+    data = Data()
+    context = Context()
+    scene = data.scenes.new("Scene")
+    object.__setattr__(context, "scene", scene)
+    scene.world = data.worlds.new("World")
+
+
+def reset():
+    """
+    Start from an empty file with one scene, like Blender's factory startup minus the default cube
+    """
+    global ops, app
+    _reset_data()
+    ops = _BPyOps()
+    app = Struct(version=(4, 1, 0), version_string="4.1.0 (stand-in)", background=True,
+                 binary_path="", handlers=Handlers())
+    recorder.reset()
+
+
+def install():
+    """
+    Register the stand-in as the "bpy" module and reset it
+    """
+    reset()
+    sys.modules["bpy"] = sys.modules[__name__]
+    return sys.modules[__name__]
+
+
+data = context = ops = app = None
+path = Struct(abspath=lambda filepath, **kwargs: filepath)
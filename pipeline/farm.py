@@ -0,0 +1,360 @@
+"""
+Shared-directory render farm.
+
+A farm directory visible to every node holds the job description and the
+state of each chunk of the frame range. Workers coordinate only through
+files in it:
+
+    job.json                    project, .blend, frame range, chunk size, render options
+    leases/0001-0010.lease      claimed by a worker, the file's mtime is its heartbeat
+    done/0001-0010.done         finished chunks
+    logs/                       one log per render attempt
+
+A chunk is claimed by hard-linking a private file to its lease name, which
+is atomic on local and network file systems alike. The owner touches the
+lease while rendering; a lease whose mtime has not moved for the lease
+timeout, measured on the observer's own clock so node clock skew does not
+matter, is reclaimed by renaming it away. Two workers can find the same
+lease stale; the slower one checks the lease it moved and hands back a
+fresh lease the faster one claimed in the meantime. In the narrow window
+left, a fresh lease can still be lost; its owner's heartbeat then stops
+that render, which wastes the work but never mixes two renders' output.
+
+    python -m pipeline.farm submit /shared/farm --project dissolve_mesh --blend /shared/dissolve.blend --frames 1 460
+    python -m pipeline.farm work /shared/farm                    # on every node
+    python -m pipeline.farm status /shared/farm
+
+The local coordinator runs several workers against one directory on this
+machine, e.g. with the bpy stand-in to exercise the protocol:
+
+    python -m pipeline.farm local /tmp/farm --workers 4 --fake
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline.launch import BLENDER, blender_env, cli_command
+from pipeline.projects import PROJECTS, ROOT
+
+
+def chunk_name(start, end):
+    return f"{start:04d}-{end:04d}"
+
+
+def chunks(job):
+    """
+    (start, end) frame ranges of a job, in render order
+    """
+    start, end = job["frames"]
+    size = job["chunk_size"]
+    return [(first, min(first + size - 1, end)) for first in range(start, end + 1, size)]
+
+
+def load_job(farm_dir):
+    with open(os.path.join(farm_dir, "job.json")) as job_file:
+        return json.load(job_file)
+
+
+def write_atomic(path, text):
+    temporary = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(temporary, "w") as temporary_file:
+        temporary_file.write(text)
+        temporary_file.flush()
+        os.fsync(temporary_file.fileno())
+    os.replace(temporary, path)
+
+
+def submit(farm_dir, job):
+    """
+    Create the farm directory for a job
+    """
+    for sub_dir in ("leases", "done", "logs"):
+        os.makedirs(os.path.join(farm_dir, sub_dir), exist_ok=True)
+    write_atomic(os.path.join(farm_dir, "job.json"), json.dumps(job, indent=2))
+
+
+def status(farm_dir):
+    """
+    Chunk names grouped by state: done, leased or pending
+    """
+    job = load_job(farm_dir)
+    done = set(os.listdir(os.path.join(farm_dir, "done")))
+    leased = set(os.listdir(os.path.join(farm_dir, "leases")))
+    state = {"done": [], "leased": [], "pending": []}
+    for start, end in chunks(job):
+        name = chunk_name(start, end)
+        if f"{name}.done" in done:
+            state["done"].append(name)
+        elif f"{name}.lease" in leased:
+            state["leased"].append(name)
+        else:
+            state["pending"].append(name)
+    return state
+
+
+class Worker:
+    """
+    Claims chunks from a farm directory and renders them until none are left
+    """
+    def __init__(self, farm_dir, worker_id=None, threads=None, blender=BLENDER, fake=False):
+        self.farm_dir = os.path.abspath(farm_dir)
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.threads = threads
+        self.blender = blender
+        self.fake = fake
+        self.job = load_job(self.farm_dir)
+        self.lease_timeout = self.job.get("lease_timeout", 120)
+        self.heartbeat = max(1.0, self.lease_timeout / 4)
+        self.poll_interval = min(5.0, self.heartbeat)
+        # lease -> (mtime, local time that mtime was first seen)
+        self._observed = {}
+
+    def _path(self, kind, name):
+        extension = {"leases": "lease", "done": "done"}[kind]
+        return os.path.join(self.farm_dir, kind, f"{name}.{extension}")
+
+    def claim(self, name):
+        """
+        Atomically create the chunk's lease, False when another worker holds it
+        """
+        lease = self._path("leases", name)
+        private = f"{lease}.{self.worker_id}.{uuid.uuid4().hex}"
+        with open(private, "w") as private_file:
+            json.dump({"worker": self.worker_id, "claimed_at": time.time()}, private_file)
+        try:
+            os.link(private, lease)
+            return True
+        except FileExistsError:
+            return False
+        finally:
+            os.unlink(private)
+
+    def owns(self, name):
+        try:
+            with open(self._path("leases", name)) as lease_file:
+                return json.load(lease_file)["worker"] == self.worker_id
+        except (OSError, ValueError):
+            return False
+
+    def release(self, name):
+        """
+        Remove our lease; one taken over since the render ended belongs to its new owner
+        """
+        if not self.owns(name):
+            return
+        try:
+            os.unlink(self._path("leases", name))
+        except FileNotFoundError:
+            pass
+
+    def is_stale(self, name):
+        lease = self._path("leases", name)
+        try:
+            mtime = os.stat(lease).st_mtime
+        except FileNotFoundError:
+            return False
+        seen_mtime, first_seen = self._observed.get(lease, (None, None))
+        now = time.monotonic()
+        if seen_mtime != mtime:
+            self._observed[lease] = (mtime, now)
+            return False
+        return now - first_seen > self.lease_timeout
+
+    def reclaim(self, name):
+        """
+        Move a stale lease out of the way, False when it is gone or turned out to be a fresh one
+        """
+        lease = self._path("leases", name)
+        stale_mtime, _ = self._observed.pop(lease, (None, None))
+        aside = f"{lease}.stale.{self.worker_id}.{uuid.uuid4().hex}"
+        try:
+            os.rename(lease, aside)
+        except FileNotFoundError:
+            return False
+        if os.stat(aside).st_mtime != stale_mtime:
+            # another worker reclaimed the stale lease and claimed the chunk first
+            try:
+                os.link(aside, lease)
+            except FileExistsError:
+                pass
+            os.unlink(aside)
+            return False
+        os.unlink(aside)
+        print(f"[{self.worker_id}] reclaimed stale lease {name}")
+        return True
+
+    def next_chunk(self):
+        """
+        Claim the first pending chunk, reclaiming stale leases on the way; None when nothing is claimable
+        """
+        done = set(os.listdir(os.path.join(self.farm_dir, "done")))
+        for start, end in chunks(self.job):
+            name = chunk_name(start, end)
+            if f"{name}.done" in done:
+                continue
+            if os.path.exists(self._path("leases", name)):
+                if not (self.is_stale(name) and self.reclaim(name)):
+                    continue
+            if self.claim(name):
+                return start, end
+        return None
+
+    def finished(self):
+        done = set(os.listdir(os.path.join(self.farm_dir, "done")))
+        return all(f"{chunk_name(start, end)}.done" in done for start, end in chunks(self.job))
+
+    def render_command(self, start, end):
+        job = self.job
+        args = [job["project"], "--skip-build", "--frames", str(start), str(end),
+                "--output", job["output"], *job.get("render_args", [])]
+        if self.threads:
+            args += ["--threads", str(self.threads)]
+        return cli_command(args, job.get("blend"), self.threads, self.blender, self.fake)
+
+    def render(self, start, end):
+        """
+        Render one chunk while keeping its lease alive, True when it finished and was still ours
+        """
+        name = chunk_name(start, end)
+        lease = self._path("leases", name)
+        log_path = os.path.join(self.farm_dir, "logs", f"{name}.{self.worker_id}.log")
+        with open(log_path, "w") as log_file:
+            process = subprocess.Popen(self.render_command(start, end), cwd=ROOT,
+                                       stdout=log_file, stderr=subprocess.STDOUT, env=blender_env())
+            stolen = threading.Event()
+            exited = threading.Event()
+
+            def keep_alive():
+                while not exited.wait(self.heartbeat):
+                    if not self.owns(name):
+                        stolen.set()
+                        process.terminate()
+                        return
+                    try:
+                        os.utime(lease)
+                    except FileNotFoundError:
+                        pass
+
+            heartbeat = threading.Thread(target=keep_alive, daemon=True)
+            heartbeat.start()
+            returncode = process.wait()
+            exited.set()
+            heartbeat.join()
+
+        if stolen.is_set() or not self.owns(name):
+            print(f"[{self.worker_id}] lost the lease on {name}, dropping it")
+            return False
+        if returncode != 0:
+            print(f"[{self.worker_id}] chunk {name} failed with exit code {returncode}, see {log_path}")
+            self.release(name)
+            return False
+
+        write_atomic(self._path("done", name), json.dumps({"worker": self.worker_id, "finished_at": time.time()}))
+        self.release(name)
+        return True
+
+    def run(self, max_failures=3):
+        failures = 0
+        rendered = 0
+        while not self.finished():
+            claimed = self.next_chunk()
+            if claimed is None:
+                # everything left is leased by someone else, wait for it to finish or go stale
+                time.sleep(self.poll_interval)
+                continue
+            start, end = claimed
+            started = time.perf_counter()
+            if self.render(start, end):
+                rendered += 1
+                print(f"[{self.worker_id}] rendered {chunk_name(start, end)} in {time.perf_counter() - started:.1f}s")
+            else:
+                failures += 1
+                if failures >= max_failures:
+                    print(f"[{self.worker_id}] giving up after {failures} failed chunks")
+                    return 1
+        print(f"[{self.worker_id}] no chunks left, rendered {rendered}")
+        return 0
+
+
+def run_local(farm_dir, workers, threads=None, blender=BLENDER, fake=False):
+    """
+    Coordinator stand-in: run several worker processes on this machine against one farm directory
+    """
+    command = [sys.executable, "-m", "pipeline.farm", "work", os.path.abspath(farm_dir)]
+    if threads:
+        command += ["--threads", str(threads)]
+    if fake:
+        command.append("--fake")
+    else:
+        command += ["--blender", blender]
+    processes = [subprocess.Popen(command + ["--worker-id", f"local-{index}"], cwd=ROOT)
+                 for index in range(workers)]
+    return max(process.wait() for process in processes)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render frame chunks through a shared farm directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    submit_parser = commands.add_parser("submit", help="create a farm directory for a job")
+    submit_parser.add_argument("farm_dir")
+    submit_parser.add_argument("--project", required=True, choices=sorted(PROJECTS))
+    submit_parser.add_argument("--blend", help="built scene every worker renders from, on the shared file system")
+    submit_parser.add_argument("--frames", type=int, nargs=2, required=True, metavar=("START", "END"))
+    submit_parser.add_argument("--chunk-size", type=int, default=10)
+    submit_parser.add_argument("--output", help="shared output directory, defaults to FARM_DIR/frames")
+    submit_parser.add_argument("--lease-timeout", type=float, default=120.0, help="seconds without heartbeat")
+    submit_parser.add_argument("--render-args", default="", help="extra cli.py arguments, e.g. '--profile draft'")
+
+    work_parser = commands.add_parser("work", help="claim and render chunks until the job is done")
+    work_parser.add_argument("farm_dir")
+    work_parser.add_argument("--worker-id")
+    work_parser.add_argument("--threads", type=int)
+    work_parser.add_argument("--blender", default=BLENDER)
+    work_parser.add_argument("--fake", action="store_true")
+
+    status_parser = commands.add_parser("status", help="show the state of every chunk")
+    status_parser.add_argument("farm_dir")
+
+    local_parser = commands.add_parser("local", help="run several workers on this machine")
+    local_parser.add_argument("farm_dir")
+    local_parser.add_argument("--workers", type=int, default=2)
+    local_parser.add_argument("--threads", type=int)
+    local_parser.add_argument("--blender", default=BLENDER)
+    local_parser.add_argument("--fake", action="store_true")
+
+    args = parser.parse_args(argv)
+    if args.command == "submit":
+        farm_dir = os.path.abspath(args.farm_dir)
+        submit(farm_dir, {
+            "project": args.project,
+            "blend": os.path.abspath(args.blend) if args.blend else None,
+            "frames": args.frames,
+            "chunk_size": args.chunk_size,
+            "output": os.path.abspath(args.output or os.path.join(farm_dir, "frames")),
+            "lease_timeout": args.lease_timeout,
+            "render_args": args.render_args.split(),
+        })
+        print(f"{len(chunks(load_job(farm_dir)))} chunks submitted to {farm_dir}")
+        return 0
+    if args.command == "work":
+        return Worker(args.farm_dir, args.worker_id, args.threads, args.blender, args.fake).run()
+    if args.command == "status":
+        state = status(args.farm_dir)
+        for key in ("done", "leased", "pending"):
+            print(f"{key:<8} {len(state[key]):>4}  {' '.join(state[key])}")
+        return 0
+    return run_local(args.farm_dir, args.workers, args.threads, args.blender, args.fake)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+"""
+Frame planning by evaluated state: a content-addressed frame cache and
+rendering each unique state once.
+
+Every frame of the range is evaluated and fingerprinted first (see
+pipeline.evaluated). Frames whose fingerprint already has an image in the
+cache are copied into the output instead of being rendered. Frames whose
+state equals an earlier frame of the same range, which loops built by
+create_animation_loop and static shots produce, are written as symlinks to
+that frame. Only what is left is rendered, in runs of consecutive frames, and
+added to the cache. Evaluating a frame costs a fraction of rendering it.
+
+    blender -b cache/dissolve.blend -P pipeline/cli.py -- dissolve_mesh --skip-build --frame-cache .cache/frames
+    blender -b cache/spike.blend -P pipeline/cli.py -- spike_sphere --skip-build --dedupe --encode renders/spike.mp4
+
+The plan is written next to the frames as <project>_frames.json, with the
+fingerprint of every frame and the frame it was taken from.
+"""
+import os
+import shutil
+import uuid
+
+import bpy
+
+from pipeline.evaluated import frame_fingerprint
+from pipeline.proxy import proxy_enabled, set_proxy
+
+
+def frame_keys(scene, frames):
+    """
+    Fingerprint of each frame, evaluated in order
+
+    Viewport proxies are switched off meanwhile: the depsgraph is evaluated
+    for the viewport, and a file saved with proxies on would otherwise be
+    keyed by its coarse proxy geometry instead of what renders.
+    """
+    proxies = proxy_enabled()
+    set_proxy(False)
+    try:
+        keys = {}
+        for frame in frames:
+            scene.frame_set(frame)
+            keys[frame] = frame_fingerprint(scene, bpy.context.evaluated_depsgraph_get())
+        return keys
+    finally:
+        if proxies:
+            set_proxy(True)
+
+
+def cache_path(cache_dir, key, extension):
+    # two-level fan-out keeps directories small on long projects
+    return os.path.join(cache_dir, key[:2], f"{key}{extension}")
+
+
+def place(source, target):
+    """
+    Copy source to target under a temporary name first, so readers never see half a file
+
+    Not a hard link: Blender truncates existing output files when it writes
+    them, which would change the cached image through the shared inode.
+    """
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    temporary = f"{target}.{uuid.uuid4().hex}.tmp"
+    shutil.copyfile(source, temporary)
+    os.replace(temporary, target)
+
+
+def place_reference(source, target):
+    """
+    Symlink target to source in the same directory, a copy where symlinks are not available
+    """
+    temporary = f"{target}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.symlink(os.path.relpath(source, os.path.dirname(target)), temporary)
+    except OSError:
+        shutil.copyfile(source, temporary)
+    os.replace(temporary, target)
+
+
+def drop_references(scene, frames):
+    """
+    Remove symlinked frames before a render; Blender would write through them into the frame they point at
+    """
+    for frame in frames:
+        path = scene.render.frame_path(frame=frame)
+        if os.path.islink(path):
+            os.unlink(path)
+
+
+def runs(frames):
+    """
+    Split an ordered frame list into runs of neighbouring entries of the full range
+    """
+    groups = []
+    for frame in frames:
+        if groups and frame == groups[-1][-1] + 1:
+            groups[-1].append(frame)
+        else:
+            groups.append([frame])
+    return groups
+
+
+def plan_frames(keys, frames, cache_dir=None, extension=".png", dedupe=True):
+    """
+    Per frame: how it is produced (render, cache or duplicate) and the frame it comes from
+    """
+    plan = {}
+    first_with_key = {}
+    for frame in frames:
+        key = keys[frame]
+        if dedupe and key in first_with_key:
+            plan[frame] = {"key": key, "status": "duplicate", "source": first_with_key[key]}
+            continue
+        first_with_key.setdefault(key, frame)
+        cached = cache_dir is not None and os.path.exists(cache_path(cache_dir, key, extension))
+        plan[frame] = {"key": key, "status": "cached" if cached else "render", "source": frame}
+    return plan
+
+
+def render_frames(scene, cache_dir=None, dedupe=True, on_frame=None):
+    """
+    Render the scene's frame range by plan; on_frame(path) is called for every frame in sequence order as
+    soon as it and all frames before it exist, duplicates with the path of the frame they repeat
+    """
+    if scene.render.image_settings.file_format != "PNG":
+        raise ValueError("frame planning works on PNG sequences")
+    start, end, step = scene.frame_start, scene.frame_end, scene.frame_step
+    frames = list(range(start, end + 1, step))
+    drop_references(scene, frames)
+    keys = frame_keys(scene, frames)
+    extension = os.path.splitext(scene.render.frame_path(frame=start))[1]
+    plan = plan_frames(keys, frames, cache_dir, extension, dedupe)
+
+    available = set()
+    emitted = [0]
+
+    def emit():
+        while emitted[0] < len(frames):
+            frame = frames[emitted[0]]
+            source = plan[frame]["source"]
+            if source not in available:
+                return
+            if on_frame is not None:
+                on_frame(scene.render.frame_path(frame=source))
+            emitted[0] += 1
+
+    for frame in frames:
+        entry = plan[frame]
+        if entry["status"] == "cached":
+            place(cache_path(cache_dir, entry["key"], extension), scene.render.frame_path(frame=frame))
+            available.add(frame)
+        elif entry["status"] == "duplicate":
+            place_reference(scene.render.frame_path(frame=entry["source"]), scene.render.frame_path(frame=frame))
+    emit()
+
+    def on_render_write(scene, *handler_args):
+        available.add(scene.frame_current)
+        emit()
+
+    to_render = [index for index, frame in enumerate(frames) if plan[frame]["status"] == "render"]
+    bpy.app.handlers.render_write.append(on_render_write)
+    try:
+        # neighbouring frames render as one animation so persistent data is reused
+        for run in runs(to_render):
+            scene.frame_start, scene.frame_end = frames[run[0]], frames[run[-1]]
+            bpy.ops.render.render(animation=True)
+            for index in run:
+                frame = frames[index]
+                available.add(frame)
+                if cache_dir is not None:
+                    place(scene.render.frame_path(frame=frame), cache_path(cache_dir, keys[frame], extension))
+            emit()
+    finally:
+        bpy.app.handlers.render_write.remove(on_render_write)
+        scene.frame_start, scene.frame_end, scene.frame_step = start, end, step
+    return plan
+
+
+def summary(plan):
+    counts = {"render": 0, "cached": 0, "duplicate": 0}
+    for entry in plan.values():
+        counts[entry["status"]] += 1
+    return counts
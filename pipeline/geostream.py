@@ -0,0 +1,251 @@
+"""
+Chunked, memory-mappable streams of per-frame geometry.
+
+A stream is a directory written by pipeline/export_geometry.py:
+
+    index.jsonl         a header line, then one line per frame as it is written, then an end line
+    chunk-0000.bin      raw little-endian arrays, each starting on a 64 byte boundary
+    chunk-0001.bin      ...
+
+Every frame line lists the frame's records, one per exported object, with
+each attribute's chunk, byte offset, dtype and shape:
+
+    {"frame": 12, "records": {"textured/points": {"kind": "points", "object": "textured", "count": 2048,
+        "matrix_world": [...16 floats...],
+        "attributes": {"position": {"chunk": 0, "offset": 81920, "dtype": "<f4", "shape": [2048, 3],
+                                    "domain": "POINT"}, ...}}}}
+
+A frame line is appended only after its arrays are flushed, so a reader
+following a stream that is still being written never sees a frame whose
+data is missing. Reading needs NumPy only; arrays are views into
+read-only memory maps of the chunk files, nothing is copied:
+
+    reader = GeometryReader("exports/dissolve")
+    for frame, records in reader:
+        radii = records["textured/points"]["radius"]
+
+    python -m pipeline.geostream info exports/dissolve
+    python -m pipeline.geostream show exports/dissolve --frame 120
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+FORMAT = "pipeline-geostream"
+VERSION = 1
+INDEX = "index.jsonl"
+ALIGNMENT = 64
+CHUNK_BYTES = 256 * 1024 * 1024
+
+
+def chunk_name(index):
+    return f"chunk-{index:04d}.bin"
+
+
+class GeometryWriter:
+    """
+    Appends frames of named arrays to a stream directory
+    """
+    def __init__(self, path, header=None, chunk_bytes=CHUNK_BYTES):
+        self.path = path
+        self.chunk_bytes = chunk_bytes
+        self.chunk = -1
+        self._data = None
+        os.makedirs(path, exist_ok=True)
+        for name in os.listdir(path):
+            if name == INDEX or (name.startswith("chunk-") and name.endswith(".bin")):
+                os.remove(os.path.join(path, name))
+        self._index = open(os.path.join(path, INDEX), "w")
+        self._write_line({"format": FORMAT, "version": VERSION, "alignment": ALIGNMENT, **(header or {})})
+        self._next_chunk()
+
+    def _write_line(self, entry):
+        self._index.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._index.flush()
+
+    def _next_chunk(self):
+        if self._data is not None:
+            self._data.close()
+        self.chunk += 1
+        self._data = open(os.path.join(self.path, chunk_name(self.chunk)), "wb")
+
+    def _write_array(self, array):
+        array = np.ascontiguousarray(array)
+        if self._data.tell() and self._data.tell() + array.nbytes > self.chunk_bytes:
+            self._next_chunk()
+        padding = -self._data.tell() % ALIGNMENT
+        self._data.write(b"\0" * padding)
+        offset = self._data.tell()
+        self._data.write(array.tobytes())
+        return {"chunk": self.chunk, "offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+
+    def add_frame(self, frame, records):
+        """
+        Write one frame; records map a key to {kind, object, ..., attributes: {name: (array, domain)}}
+        """
+        entries = {}
+        for key, record in records.items():
+            entry = {name: value for name, value in record.items() if name != "attributes"}
+            entry["attributes"] = {}
+            for name, (array, domain) in record["attributes"].items():
+                entry["attributes"][name] = {**self._write_array(array), "domain": domain}
+            entries[key] = entry
+        # the data has to be readable before the index line announces it
+        self._data.flush()
+        self._write_line({"frame": frame, "records": entries})
+
+    def close(self):
+        if self._index.closed:
+            return
+        self._data.close()
+        self._write_line({"end": True})
+        self._index.close()
+
+
+class GeometryReader:
+    """
+    Frames of a stream as read-only array views, no Blender needed
+    """
+    def __init__(self, path):
+        self.path = path
+        self.header = None
+        self.complete = False
+        self._frames = {}
+        self._maps = {}
+        self._position = 0
+        self.refresh()
+
+    def refresh(self):
+        """
+        Pick up frames appended since the last call, returns how many were new
+        """
+        added = 0
+        with open(os.path.join(self.path, INDEX)) as index:
+            index.seek(self._position)
+            while True:
+                line = index.readline()
+                if not line.endswith("\n"):
+                    # a line still being written
+                    break
+                self._position = index.tell()
+                entry = json.loads(line)
+                if self.header is None:
+                    if entry.get("format") != FORMAT or entry.get("version") != VERSION:
+                        raise ValueError(f"{self.path} is not a version {VERSION} geometry stream")
+                    self.header = entry
+                elif entry.get("end"):
+                    self.complete = True
+                else:
+                    self._frames[entry["frame"]] = entry["records"]
+                    added += 1
+        return added
+
+    @property
+    def frames(self):
+        return sorted(self._frames)
+
+    def records(self, frame):
+        """
+        Metadata of a frame's records, without their arrays
+        """
+        return self._frames[frame]
+
+    def _map(self, chunk, end):
+        mapped = self._maps.get(chunk)
+        if mapped is None or len(mapped) < end:
+            # chunks grow while a stream is written, map again past the old end
+            mapped = np.memmap(os.path.join(self.path, chunk_name(chunk)), dtype=np.uint8, mode="r")
+            self._maps[chunk] = mapped
+        return mapped
+
+    def read(self, frame, key, attribute):
+        """
+        One attribute of one record as an array view into the chunk file
+        """
+        layout = self._frames[frame][key]["attributes"][attribute]
+        dtype = np.dtype(layout["dtype"])
+        count = int(np.prod(layout["shape"], dtype=np.int64))
+        if count == 0:
+            # nothing to map, empty chunk files cannot be mapped at all
+            return np.empty(layout["shape"], dtype=dtype)
+        end = layout["offset"] + count * dtype.itemsize
+        data = self._map(layout["chunk"], end)[layout["offset"]:end]
+        return data.view(dtype).reshape(layout["shape"])
+
+    def frame(self, frame):
+        """
+        {key: {attribute: array}} for every record of a frame
+        """
+        return {key: {name: self.read(frame, key, name) for name in record["attributes"]}
+                for key, record in self._frames[frame].items()}
+
+    def __iter__(self):
+        for frame in self.frames:
+            yield frame, self.frame(frame)
+
+    def follow(self, poll=0.5, timeout=None):
+        """
+        Yield frames in order as the writer appends them, until the stream is closed
+        """
+        done = set()
+        waited = 0.0
+        while True:
+            pending = [frame for frame in self.frames if frame not in done]
+            for frame in pending:
+                done.add(frame)
+                yield frame, self.frame(frame)
+            if self.complete:
+                return
+            if pending:
+                waited = 0.0
+            elif timeout is not None and waited >= timeout:
+                raise TimeoutError(f"no new frames in {self.path} for {timeout}s")
+            time.sleep(poll)
+            waited += poll
+            self.refresh()
+
+
+def describe(array):
+    if array.size == 0:
+        return f"{array.dtype} {list(array.shape)}"
+    return f"{array.dtype} {list(array.shape)} min {array.min():.4g} max {array.max():.4g}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect a per-frame geometry stream")
+    commands = parser.add_subparsers(dest="command", required=True)
+    info_parser = commands.add_parser("info", help="frames, records and size of a stream")
+    info_parser.add_argument("stream")
+    show_parser = commands.add_parser("show", help="the arrays of one frame")
+    show_parser.add_argument("stream")
+    show_parser.add_argument("--frame", type=int, help="defaults to the first frame")
+    args = parser.parse_args(argv)
+
+    reader = GeometryReader(args.stream)
+    frames = reader.frames
+    if args.command == "info":
+        size = sum(os.path.getsize(os.path.join(args.stream, name)) for name in os.listdir(args.stream)
+                   if name.endswith(".bin"))
+        state = "complete" if reader.complete else "still being written"
+        print(f"{len(frames)} frames ({frames[0]}-{frames[-1]}), {size / 1e6:.1f} MB, {state}" if frames
+              else f"no frames, {state}")
+        for key, record in (reader.records(frames[0]).items() if frames else ()):
+            print(f"  {key:<32} {record['kind']:<10} {record['count']:>8}  {', '.join(record['attributes'])}")
+        return 0
+
+    frame = frames[0] if args.frame is None else args.frame
+    if frame not in frames:
+        raise SystemExit(f"frame {frame} is not in {args.stream}")
+    for key, arrays in reader.frame(frame).items():
+        print(key)
+        for name, array in arrays.items():
+            print(f"  {name:<20} {describe(array)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,159 @@
+"""
+Minimal PNG reading and writing with NumPy and zlib.
+
+Enough for the frames Blender writes (8 or 16 bits, gray, gray+alpha, RGB or
+RGBA, not interlaced), so the tools that stitch, compare or re-encode frames
+run with plain Python. Arrays are (height, width, channels) of uint8 or
+uint16, top row first.
+"""
+import struct
+import zlib
+
+import numpy as np
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# PNG color type per channel count and back
+COLOR_TYPES = {1: 0, 2: 4, 3: 2, 4: 6}
+CHANNELS = {value: key for key, value in COLOR_TYPES.items()}
+
+
+def _chunk(kind, payload):
+    return (struct.pack(">I", len(payload)) + kind + payload
+            + struct.pack(">I", zlib.crc32(kind + payload) & 0xFFFFFFFF))
+
+
+def encode_png(pixels, compression=6):
+    """
+    PNG file contents for an (height, width, channels) uint8 or uint16 array
+    """
+    pixels = np.asarray(pixels)
+    if pixels.ndim == 2:
+        pixels = pixels[:, :, None]
+    height, width, channels = pixels.shape
+    if pixels.dtype == np.uint16:
+        bit_depth = 16
+        rows = pixels.astype(">u2").view(np.uint8).reshape(height, -1)
+    elif pixels.dtype == np.uint8:
+        bit_depth = 8
+        rows = pixels.reshape(height, -1)
+    else:
+        raise ValueError(f"PNG needs uint8 or uint16 pixels, got {pixels.dtype}")
+
+    # "Up" filter on every row: cheap to vectorize and compresses renders well
+    filtered = np.empty((height, rows.shape[1] + 1), dtype=np.uint8)
+    filtered[:, 0] = 2
+    filtered[0, 1:] = rows[0]
+    filtered[1:, 1:] = rows[1:] - rows[:-1]
+
+    header = struct.pack(">IIBBBBB", width, height, bit_depth, COLOR_TYPES[channels], 0, 0, 0)
+    return b"".join((
+        PNG_SIGNATURE,
+        _chunk(b"IHDR", header),
+        _chunk(b"IDAT", zlib.compress(filtered.tobytes(), compression)),
+        _chunk(b"IEND", b""),
+    ))
+
+
+def write_png(path, pixels, compression=6):
+    with open(path, "wb") as png_file:
+        png_file.write(encode_png(pixels, compression))
+
+
+def _paeth(a, b, c):
+    p = a + b - c
+    pa = np.abs(p - a)
+    pb = np.abs(p - b)
+    pc = np.abs(p - c)
+    return np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c))
+
+
+def _unfilter_rows(filters, raw, bpp):
+    """
+    Undo None/Sub/Up filters row by row, each row vectorized
+    """
+    height, stride = raw.shape
+    out = np.empty_like(raw)
+    previous = np.zeros(stride, dtype=np.uint8)
+    for row in range(height):
+        line = raw[row]
+        if filters[row] == 1:
+            line = (np.cumsum(line.reshape(-1, bpp), axis=0, dtype=np.uint32) & 0xFF).astype(np.uint8).ravel()
+        elif filters[row] == 2:
+            line = line + previous
+        out[row] = line
+        previous = out[row]
+    return out
+
+
+def _unfilter_wavefront(filters, raw, bpp):
+    """
+    Undo any mix of filters; a pixel depends on its left, upper and upper-left
+    neighbours, so all pixels on one anti-diagonal are decoded together
+    """
+    height, stride = raw.shape
+    width = stride // bpp
+    pixels = raw.reshape(height, width, bpp).astype(np.int32)
+    # one row and column of zeros in front stand in for the missing neighbours
+    padded = np.zeros((height + 1, width + 1, bpp), dtype=np.int32)
+    row_filters = np.asarray(filters)
+
+    for diagonal in range(height + width - 1):
+        rows = np.arange(max(0, diagonal - width + 1), min(height, diagonal + 1))
+        columns = diagonal - rows
+        a = padded[rows + 1, columns]
+        b = padded[rows, columns + 1]
+        c = padded[rows, columns]
+        kind = row_filters[rows][:, None]
+        predicted = np.select(
+            [kind == 1, kind == 2, kind == 3, kind == 4],
+            [a, b, (a + b) // 2, _paeth(a, b, c)],
+            default=0,
+        )
+        padded[rows + 1, columns + 1] = (pixels[rows, columns] + predicted) & 0xFF
+
+    return padded[1:, 1:].astype(np.uint8).reshape(height, stride)
+
+
+def decode_png(contents):
+    """
+    (height, width, channels) array from PNG file contents
+    """
+    if not contents.startswith(PNG_SIGNATURE):
+        raise ValueError("not a PNG file")
+    position = len(PNG_SIGNATURE)
+    header = None
+    compressed = []
+    while position < len(contents):
+        length, kind = struct.unpack(">I4s", contents[position:position + 8])
+        payload = contents[position + 8:position + 8 + length]
+        position += 12 + length
+        if kind == b"IHDR":
+            header = struct.unpack(">IIBBBBB", payload)
+        elif kind == b"IDAT":
+            compressed.append(payload)
+        elif kind == b"IEND":
+            break
+
+    width, height, bit_depth, color_type, _, _, interlace = header
+    if color_type not in CHANNELS or bit_depth not in (8, 16) or interlace:
+        raise ValueError(f"unsupported PNG layout: color type {color_type}, {bit_depth} bits, interlace {interlace}")
+    channels = CHANNELS[color_type]
+    bpp = channels * bit_depth // 8
+
+    data = np.frombuffer(zlib.decompress(b"".join(compressed)), dtype=np.uint8).reshape(height, width * bpp + 1)
+    filters = data[:, 0]
+    raw = data[:, 1:]
+    if np.any(filters > 2):
+        rows = _unfilter_wavefront(filters, raw, bpp)
+    else:
+        rows = _unfilter_rows(filters, raw, bpp)
+
+    if bit_depth == 16:
+        return rows.view(">u2").astype(np.uint16).reshape(height, width, channels)
+    return rows.reshape(height, width, channels)
+
+
+def read_png(path):
+    with open(path, "rb") as png_file:
+        return decode_png(png_file.read())
@@ -0,0 +1,357 @@
+"""
+Frame interpolation with optical flow for high frame rate output.
+
+Only every other frame is rendered; each missing frame is synthesized from
+its two rendered neighbours by estimating the motion between them and
+warping both half way. A sample of the synthesized frames is rendered for
+real and compared by PSNR, so a loop that does not interpolate well is
+caught before delivery.
+
+    # 60 fps spike sphere loop from 30 fps keys: renders frames 2, 4, ... 480, synthesizes 3, 5, ...
+    python -m pipeline.interpolate run spike_sphere --blend cache/spike.blend --frames 1 240 --time-stretch 2 --out renders/spike60
+
+    python -m pipeline.interpolate fill "renders/spike/spike_sphere_####.png" --frames 1 240
+    python -m pipeline.interpolate check "renders/spike/spike_sphere_####.png" "reference/spike_sphere_####.png" --frames 2 240 --step 2
+
+Motion is estimated on the CPU by block matching over an image pyramid,
+coarse to fine, with sub-pixel refinement. With --vector-pass the keys are
+rendered with Blender's Vector pass (cli.py --vector-pass), which gives the
+exact screen-space motion of every pixel towards the next frame; it needs
+motion blur off and is used wherever a key has its .vectors.npy file.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from pipeline.encode import sequence_path
+from pipeline.imageio import read_png, write_png
+from pipeline.launch import BLENDER, blender_env, cli_command
+from pipeline.profiles import MAX_TIME_STRETCH, PROFILES
+from pipeline.projects import PROJECTS, ROOT
+
+
+def to_float(pixels):
+    return pixels.astype(np.float32) / np.iinfo(pixels.dtype).max
+
+
+def from_float(values, dtype):
+    peak = np.iinfo(dtype).max
+    return np.clip(np.rint(values * peak), 0, peak).astype(dtype)
+
+
+def gray(image):
+    if image.ndim == 2:
+        return image
+    if image.shape[2] >= 3:
+        return image[:, :, 0] * 0.2126 + image[:, :, 1] * 0.7152 + image[:, :, 2] * 0.0722
+    return image[:, :, 0]
+
+
+def downsample(image):
+    height, width = image.shape[0] // 2 * 2, image.shape[1] // 2 * 2
+    image = image[:height, :width]
+    return (image[0::2, 0::2] + image[1::2, 0::2] + image[0::2, 1::2] + image[1::2, 1::2]) * 0.25
+
+
+def resize(field, shape):
+    """
+    Bilinear resize of an (h, w, ...) field to shape[:2], values unchanged
+    """
+    height, width = shape[:2]
+    in_height, in_width = field.shape[:2]
+    y = np.clip((np.arange(height) + 0.5) * in_height / height - 0.5, 0, in_height - 1)
+    x = np.clip((np.arange(width) + 0.5) * in_width / width - 0.5, 0, in_width - 1)
+    y0, x0 = np.floor(y).astype(int), np.floor(x).astype(int)
+    y1, x1 = np.minimum(y0 + 1, in_height - 1), np.minimum(x0 + 1, in_width - 1)
+    fy, fx = (y - y0)[:, None], (x - x0)[None, :]
+    if field.ndim == 3:
+        fy, fx = fy[..., None], fx[..., None]
+    top = field[y0][:, x0] * (1 - fx) + field[y0][:, x1] * fx
+    bottom = field[y1][:, x0] * (1 - fx) + field[y1][:, x1] * fx
+    return (top * (1 - fy) + bottom * fy).astype(np.float32)
+
+
+def warp(image, flow):
+    """
+    Sample image at p + flow(p) with bilinear filtering, clamped at the borders; flow is (dx, dy)
+    """
+    height, width = image.shape[:2]
+    y = np.clip(np.arange(height, dtype=np.float32)[:, None] + flow[:, :, 1], 0, height - 1)
+    x = np.clip(np.arange(width, dtype=np.float32)[None, :] + flow[:, :, 0], 0, width - 1)
+    y0, x0 = np.floor(y).astype(np.intp), np.floor(x).astype(np.intp)
+    y1, x1 = np.minimum(y0 + 1, height - 1), np.minimum(x0 + 1, width - 1)
+    fy, fx = y - y0, x - x0
+    if image.ndim == 3:
+        fy, fx = fy[..., None], fx[..., None]
+    top = image[y0, x0] * (1 - fx) + image[y0, x1] * fx
+    bottom = image[y1, x0] * (1 - fx) + image[y1, x1] * fx
+    return top * (1 - fy) + bottom * fy
+
+
+def _block_sum(image, block):
+    height, width = image.shape[0] // block * block, image.shape[1] // block * block
+    return image[:height, :width].reshape(height // block, block, width // block, block).sum(axis=(1, 3))
+
+
+def block_match(a, b, block=8, radius=2):
+    """
+    Displacement per block of `a` to the best matching place in `b`, sub-pixel refined
+    """
+    height, width = a.shape
+    padded = np.pad(b, radius, mode="edge")
+    size = 2 * radius + 1
+    costs = np.empty((size, size, height // block, width // block), dtype=np.float32)
+    for dy in range(size):
+        for dx in range(size):
+            costs[dy, dx] = _block_sum(np.abs(a - padded[dy:dy + height, dx:dx + width]), block)
+    # slight preference for small motion keeps flat, featureless blocks still
+    offsets = np.arange(-radius, radius + 1, dtype=np.float32)
+    costs += 1e-3 * block * block * (offsets[:, None, None, None] ** 2 + offsets[None, :, None, None] ** 2)
+
+    flat = costs.reshape(size * size, *costs.shape[2:])
+    best = flat.argmin(axis=0)
+    best_y, best_x = np.divmod(best, size)
+    rows, columns = np.indices(best.shape)
+
+    def refine(index, axis):
+        # parabola through the best cost and its two neighbours along one axis
+        inner = np.clip(index, 1, size - 2)
+        lower, upper = [best_y, best_x], [best_y, best_x]
+        lower[axis], upper[axis] = inner - 1, inner + 1
+        middle = [best_y, best_x]
+        middle[axis] = inner
+        c0 = costs[lower[0], lower[1], rows, columns]
+        c1 = costs[middle[0], middle[1], rows, columns]
+        c2 = costs[upper[0], upper[1], rows, columns]
+        curvature = c0 - 2 * c1 + c2
+        shift = np.where(curvature > 1e-6, 0.5 * (c0 - c2) / np.maximum(curvature, 1e-6), 0.0)
+        return np.where(index == inner, index + np.clip(shift, -0.5, 0.5), index) - radius
+
+    return np.stack([refine(best_x, 1), refine(best_y, 0)], axis=-1).astype(np.float32)
+
+
+def estimate_flow(a, b, levels=5, block=8, radius=2):
+    """
+    Dense flow (dx, dy) such that a(p) ~ b(p + flow(p)), for two grayscale float images
+    """
+    pyramid = [(a, b)]
+    while len(pyramid) < levels and min(pyramid[-1][0].shape) >= block * 4:
+        pyramid.append((downsample(pyramid[-1][0]), downsample(pyramid[-1][1])))
+
+    flow = np.zeros(pyramid[-1][0].shape + (2,), dtype=np.float32)
+    for level_a, level_b in reversed(pyramid):
+        if flow.shape[:2] != level_a.shape:
+            flow = resize(flow, level_a.shape) * 2.0
+        residual = block_match(level_a, warp(level_b, flow), block, radius)
+        flow = flow + resize(residual, level_a.shape)
+    return flow
+
+
+def vector_flow(path, step):
+    """
+    Flow towards the next key from a key's Vector pass, None when it was not captured
+    """
+    if not os.path.exists(path):
+        return None
+    vectors = np.load(path)
+    # Blender counts image y upwards, the motion covers one frame of the `step` between keys
+    return np.stack([vectors[:, :, 0], -vectors[:, :, 1]], axis=-1).astype(np.float32) * step
+
+
+def splat_flow(flow, t):
+    """
+    Move the flow of `a` to where its pixels are at time t, so it can be sampled at the in-between frame
+
+    Where several pixels land on the same spot the fastest wins, which keeps
+    moving objects in front of a still background; spots nothing lands on
+    (revealed background) take the average of their filled neighbours.
+    """
+    height, width = flow.shape[:2]
+    rows, columns = np.indices((height, width))
+    target_y = np.clip(np.rint(rows + t * flow[:, :, 1]), 0, height - 1).astype(np.intp).ravel()
+    target_x = np.clip(np.rint(columns + t * flow[:, :, 0]), 0, width - 1).astype(np.intp).ravel()
+    order = np.argsort((flow ** 2).sum(axis=-1).ravel(), kind="stable")
+
+    moved = np.zeros_like(flow)
+    filled = np.zeros((height, width), dtype=np.float32)
+    moved[target_y[order], target_x[order]] = flow.reshape(-1, 2)[order]
+    filled[target_y, target_x] = 1.0
+
+    for _ in range(64):
+        holes = filled == 0
+        if not holes.any():
+            break
+        padded_flow = np.pad(moved * filled[..., None], ((1, 1), (1, 1), (0, 0)))
+        padded_filled = np.pad(filled, 1)
+        total = sum(padded_flow[dy:dy + height, dx:dx + width] for dy in range(3) for dx in range(3))
+        count = sum(padded_filled[dy:dy + height, dx:dx + width] for dy in range(3) for dx in range(3))
+        grown = holes & (count > 0)
+        moved[grown] = total[grown] / count[grown, None]
+        filled[grown] = 1.0
+    return moved
+
+
+def interpolate(a, b, flow, t=0.5):
+    """
+    Frame at time t between float images a and b, given the flow from a to b
+    """
+    flow = splat_flow(flow, t)
+    from_a = warp(a, -t * flow)
+    from_b = warp(b, (1.0 - t) * flow)
+    return (1.0 - t) * from_a + t * from_b
+
+
+def synthesize(path_a, path_b, t=0.5, step=2, use_vectors=True):
+    pixels_a, pixels_b = read_png(path_a), read_png(path_b)
+    a, b = to_float(pixels_a), to_float(pixels_b)
+    flow = vector_flow(os.path.splitext(path_a)[0] + ".vectors.npy", step) if use_vectors else None
+    if flow is not None:
+        # engines disagree on the sign of the pass, keep the one on which both keys agree
+        candidates = [flow, -flow]
+        errors = [np.abs(warp(a, -t * f) - warp(b, (1 - t) * f)).mean() for f in candidates]
+        flow = candidates[int(np.argmin(errors))]
+    else:
+        flow = estimate_flow(gray(a), gray(b))
+    return from_float(interpolate(a, b, flow, t), pixels_a.dtype)
+
+
+def fill(pattern, start, end, use_vectors=True):
+    """
+    Synthesize every missing frame of a sequence between its nearest rendered neighbours
+    """
+    present = [frame for frame in range(start, end + 1) if os.path.exists(sequence_path(pattern, frame))]
+    synthesized = []
+    for before, after in zip(present, present[1:]):
+        for frame in range(before + 1, after):
+            t = (frame - before) / (after - before)
+            pixels = synthesize(sequence_path(pattern, before), sequence_path(pattern, after), t,
+                                after - before, use_vectors)
+            write_png(sequence_path(pattern, frame), pixels)
+            synthesized.append(frame)
+    return synthesized
+
+
+def psnr(a, b):
+    error = np.mean((to_float(a) - to_float(b)) ** 2)
+    return float("inf") if error == 0 else float(10 * np.log10(1.0 / error))
+
+
+def check(pattern, reference_pattern, frames):
+    """
+    PSNR of each synthesized frame that has a fully rendered reference
+    """
+    scores = {}
+    for frame in frames:
+        reference = sequence_path(reference_pattern, frame)
+        if os.path.exists(reference):
+            scores[frame] = psnr(read_png(sequence_path(pattern, frame)), read_png(reference))
+    return scores
+
+
+def report(scores, min_psnr):
+    for frame, score in sorted(scores.items()):
+        print(f"frame {frame:>5}  {score:6.2f} dB  {'ok' if score >= min_psnr else 'BELOW ' + str(min_psnr)}")
+    if not scores:
+        print("no reference frames to check against")
+        return 1
+    print(f"mean {np.mean(list(scores.values())):.2f} dB, worst {min(scores.values()):.2f} dB")
+    return 0 if min(scores.values()) >= min_psnr else 1
+
+
+def run(args):
+    """
+    Render the keys, synthesize the frames in between and check a sample against real renders
+    """
+    out_dir = os.path.abspath(args.out)
+    start, end = args.frames[0] * args.time_stretch, args.frames[1] * args.time_stretch
+    pattern = os.path.join(out_dir, "frames", f"{args.project}_####.png")
+    reference_pattern = os.path.join(out_dir, "reference", f"{args.project}_####.png")
+    blend_file = os.path.abspath(args.blend) if args.blend else None
+    common = [args.project, "--skip-build", "--profile", args.profile, "--time-stretch", str(args.time_stretch)]
+    if args.threads:
+        common += ["--threads", str(args.threads)]
+
+    # with an odd span the last frame is rendered as a still, not synthesized
+    missing = [frame for frame in range(start, end) if (frame - start) % 2]
+    samples = sorted(set(missing[int(index)] for index in np.linspace(0, len(missing) - 1, args.samples)))
+    commands = [common + ["--frames", str(args.frames[0]), str(args.frames[1]), "--step", "2",
+                          "--output", os.path.dirname(pattern)] + (["--vector-pass"] if args.vector_pass else [])]
+    if (end - start) % 2:
+        commands.append(common + ["--still", str(end), "--output", os.path.dirname(pattern)])
+    commands += [common + ["--still", str(frame), "--output", os.path.dirname(reference_pattern)]
+                 for frame in samples]
+
+    started = time.perf_counter()
+    for cli_args in commands:
+        returncode = subprocess.call(cli_command(cli_args, blend_file, args.threads, args.blender, args.fake), cwd=ROOT,
+                                     env=blender_env())
+        if returncode != 0:
+            print(f"render failed: {' '.join(cli_args)}")
+            return 1
+    rendered = time.perf_counter() - started
+
+    started = time.perf_counter()
+    synthesized = fill(pattern, start, end, args.vector_pass)
+    print(f"rendered {len(range(start, end + 1, 2))} keys and {len(samples)} references in {rendered:.1f}s, "
+          f"synthesized {len(synthesized)} frames in {time.perf_counter() - started:.1f}s")
+    return report(check(pattern, reference_pattern, samples), args.min_psnr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Synthesize every other frame of a sequence with optical flow")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="render keys, interpolate and check against sampled references")
+    run_parser.add_argument("project", choices=sorted(PROJECTS))
+    run_parser.add_argument("--blend", help="built scene, see cli.py --save-blend")
+    run_parser.add_argument("--frames", type=int, nargs=2, required=True, metavar=("START", "END"),
+                            help="frame range in the scene's own timing")
+    run_parser.add_argument("--time-stretch", type=int, default=1,
+                            help="frames per original frame, 2 turns a 30 fps scene into 60 fps")
+    run_parser.add_argument("--profile", choices=sorted(PROFILES), default="final")
+    run_parser.add_argument("--samples", type=int, default=4, help="frames rendered for the quality check")
+    run_parser.add_argument("--min-psnr", type=float, default=32.0)
+    run_parser.add_argument("--vector-pass", action="store_true", help="use Blender's Vector pass as motion")
+    run_parser.add_argument("--out", default="renders/interpolated")
+    run_parser.add_argument("--threads", type=int)
+    run_parser.add_argument("--blender", default=BLENDER)
+    run_parser.add_argument("--fake", action="store_true", help="render with the bpy stand-in")
+
+    fill_parser = commands.add_parser("fill", help="synthesize the missing frames of a sequence")
+    fill_parser.add_argument("pattern", help="frame files, e.g. renders/spike_sphere_####.png")
+    fill_parser.add_argument("--frames", type=int, nargs=2, required=True, metavar=("START", "END"))
+    fill_parser.add_argument("--no-vectors", action="store_true", help="estimate motion even where vectors exist")
+
+    check_parser = commands.add_parser("check", help="compare synthesized frames with rendered references")
+    check_parser.add_argument("pattern")
+    check_parser.add_argument("reference_pattern")
+    check_parser.add_argument("--frames", type=int, nargs=2, required=True, metavar=("START", "END"))
+    check_parser.add_argument("--step", type=int, default=1)
+    check_parser.add_argument("--min-psnr", type=float, default=32.0)
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        if not 1 <= args.time_stretch <= MAX_TIME_STRETCH:
+            run_parser.error(f"--time-stretch must be between 1 and {MAX_TIME_STRETCH}")
+        if (args.frames[1] - args.frames[0]) * args.time_stretch < 2:
+            run_parser.error("--frames must span at least 3 frames after --time-stretch, one to synthesize between two keys")
+    if args.command == "fill":
+        started = time.perf_counter()
+        synthesized = fill(args.pattern, *args.frames, use_vectors=not args.no_vectors)
+        print(f"synthesized {len(synthesized)} frames in {time.perf_counter() - started:.1f}s")
+        return 0
+    if args.command == "check":
+        frames = range(args.frames[0], args.frames[1] + 1, args.step)
+        return report(check(args.pattern, args.reference_pattern, frames), args.min_psnr)
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Command lines for running pipeline scripts in a separate Blender process
+"""
+import os
+import sys
+import tempfile
+
+from pipeline.projects import ROOT
+
+BLENDER = os.environ.get("BLENDER", "blender")
+CLI = os.path.join(ROOT, "pipeline", "cli.py")
+# where the worker daemon (pipeline/daemon.py) listens, a named pipe on Windows
+DAEMON_ADDRESS = os.environ.get("PIPELINE_DAEMON") or (
+    r"\\.\pipe\blender-pipeline" if sys.platform == "win32"
+    else os.path.join(tempfile.gettempdir(), f"blender-pipeline-{os.getuid()}.sock"))
+# OpenGL shader disk cache shared by every Blender process the pipeline starts
+SHADER_CACHE = os.environ.get("PIPELINE_SHADER_CACHE", os.path.join(ROOT, ".cache", "shaders"))
+
+
+def shader_cache_env(cache_dir=SHADER_CACHE):
+    """
+    Variables pointing the Mesa and NVIDIA shader disk caches at cache_dir
+    """
+    return {
+        "MESA_SHADER_CACHE_DIR": os.path.join(cache_dir, "mesa"),
+        # Mesa's default of 1G is evicted by a few projects' worth of EEVEE variants
+        "MESA_SHADER_CACHE_MAX_SIZE": "4G",
+        "__GL_SHADER_DISK_CACHE": "1",
+        "__GL_SHADER_DISK_CACHE_PATH": os.path.join(cache_dir, "nvidia"),
+        "__GL_SHADER_DISK_CACHE_SKIP_CLEANUP": "1",
+    }
+
+
+def blender_env(cache_dir=SHADER_CACHE):
+    """
+    Environment for Blender processes, variables the user has set already are kept
+    """
+    env = dict(os.environ)
+    for name, value in shader_cache_env(cache_dir).items():
+        env.setdefault(name, value)
+    # the NVIDIA driver does not create its cache directory
+    os.makedirs(env["__GL_SHADER_DISK_CACHE_PATH"], exist_ok=True)
+    return env
+
+
+def format_param(value):
+    """
+    A build parameter as cli.py expects it after --set NAME=
+    """
+    if isinstance(value, (list, tuple)):
+        return ",".join(str(part) for part in value)
+    return str(value)
+
+
+def param_args(params):
+    args = []
+    for name, value in sorted(params.items()):
+        args += ["--set", f"{name}={format_param(value)}"]
+    return args
+
+
+def script_command(module, script_args, blend_file=None, threads=None, blender=BLENDER, fake=False):
+    """
+    Command running a pipeline module with the given arguments, inside Blender or against the bpy stand-in
+    """
+    if fake:
+        # the stand-in cannot load .blend files, the scene starts out empty
+        return [sys.executable, "-m", f"pipeline.{module}", *script_args, "--fake"]
+    command = [blender, "-b"]
+    if blend_file:
+        command.append(blend_file)
+    if threads:
+        command += ["-t", str(threads)]
+    return command + ["-P", os.path.join(ROOT, "pipeline", f"{module}.py"), "--", *script_args]
+
+
+def cli_command(cli_args, blend_file=None, threads=None, blender=BLENDER, fake=False):
+    """
+    Command running cli.py with the given arguments
+    """
+    return script_command("cli", cli_args, blend_file, threads, blender, fake)
@@ -0,0 +1,259 @@
+"""
+Memory budget guard for scene builds and renders.
+
+A watchdog thread polls the resident set size of the process against a
+budget in megabytes. A project is built and its heaviest frames evaluated
+under the watchdog; when the build crosses the budget, or the evaluated
+scene leaves less than RENDER_HEADROOM of it for rendering, the scene is
+reset and built again with the project's size parameter stepped down.
+Memory freed by a reset mostly stays with the allocator for reuse, so an
+attempt is measured by how far it grows from the RSS right after its
+reset, on top of what the process took before the first one:
+
+    golden_spiral   num_points x 0.75
+    spike_sphere    subdivisions - 1
+    fractal_effect  depth - 1
+    dissolve_mesh   density x 0.5
+
+While rendering, Cycles tiles are halved after any frame that ends above
+the headroom line. A process that still crosses the budget, or a build
+that cannot step down any further, stops with a report of what was tried
+instead of being killed by the kernel hours into a job:
+
+    blender -b -P pipeline/cli.py -- fractal_effect --depth 8 --memory-budget 12000
+"""
+import _thread
+import inspect
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import bpy
+
+from pipeline.profiling import current_rss_mb
+from pipeline.scene import prepare_project, reset_scene
+
+# share of the budget a built scene may use, the rest is left for the render
+RENDER_HEADROOM = 0.8
+POLL_SECONDS = 0.25
+# smallest Cycles tile the render guard steps down to
+MIN_TILE_SIZE = 128
+# exit status of a process stopped by the guard, distinct from render failures
+ABORT_EXIT_CODE = 3
+
+# size parameter of each project, how one step lowers it and the lowest value tried
+DEGRADE = {
+    "golden_spiral": {"param": "num_points", "scale": 0.75, "minimum": 50},
+    "spike_sphere": {"param": "subdivisions", "step": 1, "minimum": 2},
+    "fractal_effect": {"param": "depth", "step": 1, "minimum": 1},
+    "dissolve_mesh": {"param": "density", "scale": 0.5, "minimum": 100.0, "default": 2500.0},
+}
+
+
+class MemoryBudgetExceeded(RuntimeError):
+    def __init__(self, report):
+        super().__init__(f"{report['project']} does not fit in {report['budget_mb']:.0f}MB")
+        self.report = report
+
+
+class Watchdog:
+    """
+    Polls the process RSS on a thread, keeps its peak and calls on_exceed once when it crosses the budget
+    """
+    def __init__(self, budget_mb, on_exceed=None, poll=POLL_SECONDS):
+        self.budget_mb = budget_mb
+        self.on_exceed = on_exceed
+        self.poll = poll
+        self.peak_mb = 0.0
+        self.tripped = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        rss = current_rss_mb() or 0.0
+        self.peak_mb = max(self.peak_mb, rss)
+        if rss > self.budget_mb and not self.tripped:
+            self.tripped = True
+            if self.on_exceed is not None:
+                self.on_exceed(rss)
+        return rss
+
+    def _run(self):
+        while not self._stop.wait(self.poll):
+            self.sample()
+
+    def start(self):
+        self.sample()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.sample()
+
+
+def degrade(project, module, params):
+    """
+    params with the project's size parameter stepped down once, None when it is at its minimum
+    """
+    rule = DEGRADE.get(project)
+    if rule is None:
+        return None
+    value = params.get(rule["param"])
+    if value is None:
+        # build() defaults, dissolve's None stands for the node's own density
+        value = rule.get("default")
+        if value is None:
+            value = inspect.signature(module.build).parameters[rule["param"]].default
+    lowered = value * rule["scale"] if "scale" in rule else value - rule["step"]
+    lowered = type(value)(lowered)
+    if lowered < rule["minimum"] or lowered == value:
+        return None
+    return {**params, rule["param"]: lowered}
+
+
+def heavy_frames(scene):
+    """
+    First, middle and last frame of the range, where animated generators are usually at their extremes
+    """
+    start, end = scene.frame_start, scene.frame_end
+    return sorted({start, (start + end) // 2, end})
+
+
+@contextmanager
+def interruptible():
+    """
+    Python's own SIGINT handler in place, which _thread.interrupt_main needs to raise KeyboardInterrupt
+    """
+    previous = signal.signal(signal.SIGINT, signal.default_int_handler)
+    try:
+        yield
+    finally:
+        # None when the handler was not installed from Python, e.g. by Blender
+        signal.signal(signal.SIGINT, signal.SIG_DFL if previous is None else previous)
+
+
+def guarded_build(project, module, params, budget_mb, build=None, blend_file=None):
+    """
+    Build until the scene fits the budget, returns (params built with, attempts)
+
+    Raises MemoryBudgetExceeded with a report when the lowest parameters do not fit either.
+    """
+    if build is None:
+        def build(params):
+            prepare_project(project)
+            module.build(**params)
+
+    attempts = []
+    base_mb = current_rss_mb() or 0.0
+    while True:
+        # what earlier attempts left with the allocator is reused, not new demand
+        start_mb = current_rss_mb() or 0.0
+        retained_mb = max(0.0, start_mb - base_mb)
+        # the interrupt lands in the build as soon as it is back in Python code
+        watchdog = Watchdog(budget_mb + retained_mb, on_exceed=lambda rss: _thread.interrupt_main())
+        started = time.perf_counter()
+        with interruptible():
+            try:
+                watchdog.start()
+                try:
+                    build(params)
+                    scene = bpy.context.scene
+                    for frame in heavy_frames(scene):
+                        scene.frame_set(frame)
+                        bpy.context.evaluated_depsgraph_get()
+                finally:
+                    # joined here, an interrupt it sent arrives before the outer handler is left
+                    watchdog.stop()
+            except KeyboardInterrupt:
+                if not watchdog.tripped:
+                    raise
+
+        # what the scene needs in a fresh process
+        needed_mb = base_mb + max(0.0, watchdog.peak_mb - start_mb)
+        fits = not watchdog.tripped and needed_mb <= budget_mb * RENDER_HEADROOM
+        attempts.append({"params": dict(params), "start_rss_mb": round(start_mb, 1),
+                         "peak_rss_mb": round(watchdog.peak_mb, 1), "needed_mb": round(needed_mb, 1),
+                         "fits": fits, "seconds": round(time.perf_counter() - started, 3)})
+        print(f"memory guard: {project} {params or 'defaults'} needs {needed_mb:.0f}MB "
+              f"of {budget_mb:.0f}MB{'' if fits else ', too much'}")
+        if fits:
+            return params, attempts
+        lowered = degrade(project, module, params)
+        if lowered is None:
+            raise MemoryBudgetExceeded({"project": project, "budget_mb": budget_mb, "stage": "build",
+                                        "attempts": attempts})
+        reset_scene(blend_file)
+        params = lowered
+
+
+class RenderGuard:
+    """
+    Watches a render: smaller Cycles tiles after frames above the headroom line, a report and exit past the budget
+    """
+    def __init__(self, scene, project, budget_mb, report_path, attempts=None):
+        self.scene = scene
+        self.project = project
+        self.budget_mb = budget_mb
+        self.report_path = report_path
+        self.attempts = attempts or []
+        self.degraded = []
+        self.watchdog = Watchdog(budget_mb, on_exceed=self.abort)
+
+    def report(self, stage, rss=None):
+        return {
+            "project": self.project,
+            "budget_mb": self.budget_mb,
+            "stage": stage,
+            "frame": self.scene.frame_current,
+            "rss_mb": None if rss is None else round(rss, 1),
+            "peak_rss_mb": round(self.watchdog.peak_mb, 1),
+            "attempts": self.attempts,
+            "render_degraded": self.degraded,
+        }
+
+    def abort(self, rss):
+        # called on the watchdog thread while Blender renders, nothing can be unwound from here
+        write_report(self.report("render", rss), self.report_path)
+        print(f"memory guard: {rss:.0f}MB is over the {self.budget_mb:.0f}MB budget at frame "
+              f"{self.scene.frame_current}, stopping; see {self.report_path}")
+        sys.stdout.flush()
+        os._exit(ABORT_EXIT_CODE)
+
+    def on_render_post(self, scene, *handler_args):
+        rss = self.watchdog.sample()
+        if rss <= self.budget_mb * RENDER_HEADROOM or scene.render.engine != "CYCLES":
+            return
+        tile_size = scene.cycles.tile_size
+        if tile_size // 2 >= MIN_TILE_SIZE:
+            scene.cycles.use_auto_tile = True
+            scene.cycles.tile_size = tile_size // 2
+            self.degraded.append({"frame": scene.frame_current, "rss_mb": round(rss, 1),
+                                  "tile_size": scene.cycles.tile_size})
+            print(f"memory guard: {rss:.0f}MB after frame {scene.frame_current}, "
+                  f"tiles down to {scene.cycles.tile_size}px")
+
+    def install(self):
+        bpy.app.handlers.render_post.append(self.on_render_post)
+        self.watchdog.start()
+
+    def uninstall(self):
+        if self.on_render_post in bpy.app.handlers.render_post:
+            bpy.app.handlers.render_post.remove(self.on_render_post)
+        self.watchdog.stop()
+        if len(self.attempts) > 1 or self.degraded:
+            write_report(self.report("done"), self.report_path)
+
+
+def write_report(report, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as report_file:
+        json.dump(report, report_file, indent=2)
+    return path
@@ -0,0 +1,118 @@
+"""
+Several cameras rendered from one evaluation of each frame.
+
+Blender's multi-view rendering, the mechanism behind stereo 3D, renders
+any number of views per frame, each through its own camera. Every view is
+rendered from the same evaluated scene: geometry nodes run once per frame,
+and the engine syncs the scene once and only swaps the camera between
+views. Persistent data is switched on as well, so Cycles also keeps its
+acceleration structures from one frame to the next.
+
+Views are camera objects of the scene, or fixed cameras added for the
+render from a position and a rotation in degrees; they share the scene
+camera's lens. One image is written per view and frame:
+
+    blender -b cache/spiral.blend -P pipeline/cli.py -- golden_spiral --skip-build --views Camera flat=0,0,60,0,0,0
+    renders/golden_spiral_0001_Camera.png
+    renders/golden_spiral_0001_flat.png
+
+Multi-view renders through cameras named with a shared prefix and each
+view's suffix, so every view gets a stand-in camera copying its camera's
+transform; the scene's own cameras keep their names.
+"""
+import math
+
+import bpy
+
+# name prefix of the stand-in cameras, the view name follows after an underscore
+PREFIX = "MultiView"
+
+
+def parse_view(text):
+    """
+    (name, None) for an existing camera, (name, (location, rotation in radians)) for NAME=X,Y,Z,RX,RY,RZ
+    """
+    name, _, pose = text.partition("=")
+    if not pose:
+        return name, None
+    values = [float(value) for value in pose.split(",")]
+    if len(values) != 6:
+        raise ValueError(f"view '{text}' needs six values: X,Y,Z,RX,RY,RZ")
+    return name, (tuple(values[:3]), tuple(math.radians(value) for value in values[3:]))
+
+
+class MultiView:
+    """
+    Sets the scene up to render every frame from several cameras, and puts it back
+    """
+    def __init__(self, scene, views):
+        self.scene = scene
+        self.views = [parse_view(view) if isinstance(view, str) else view for view in views]
+        self.created = []
+        self.render_views = []
+        self.saved = None
+
+    def _camera(self, name, pose):
+        if pose is None:
+            camera = self.scene.objects.get(name)
+            if camera is None or camera.type != "CAMERA":
+                raise ValueError(f"no camera called '{name}' in the scene")
+            return camera
+        camera = bpy.data.objects.new(name, self.scene.camera.data)
+        camera.location, camera.rotation_euler = pose
+        self.scene.collection.objects.link(camera)
+        self.created.append(camera)
+        return camera
+
+    def install(self):
+        render = self.scene.render
+        self.saved = {
+            "camera": self.scene.camera,
+            "use_multiview": render.use_multiview,
+            "views_format": render.views_format,
+            "image_views_format": render.image_settings.views_format,
+            "use_persistent_data": render.use_persistent_data,
+            "views": {view.name: view.use for view in render.views},
+        }
+        stand_ins = []
+        for name, pose in self.views:
+            camera = self._camera(name, pose)
+            stand_in = bpy.data.objects.new(f"{PREFIX}_{name}", camera.data)
+            stand_in.constraints.new("COPY_TRANSFORMS").target = camera
+            self.scene.collection.objects.link(stand_in)
+            self.created.append(stand_in)
+            stand_ins.append(stand_in)
+
+        render.use_multiview = True
+        render.views_format = "MULTIVIEW"
+        render.image_settings.views_format = "INDIVIDUAL"
+        render.use_persistent_data = True
+        for view in render.views:
+            view.use = False
+        for name, _ in self.views:
+            view = render.views.new(name)
+            view.camera_suffix = f"_{name}"
+            self.render_views.append(view)
+        # the view cameras are found from the scene camera's name with its suffix swapped
+        self.scene.camera = stand_ins[0]
+
+    def paths(self, frame):
+        return [self.scene.render.frame_path(frame=frame, view=name) for name, _ in self.views]
+
+    def uninstall(self):
+        if self.saved is None:
+            return
+        render = self.scene.render
+        for view in self.render_views:
+            render.views.remove(view)
+        for view in render.views:
+            view.use = self.saved["views"].get(view.name, view.use)
+        self.scene.camera = self.saved["camera"]
+        render.use_multiview = self.saved["use_multiview"]
+        render.views_format = self.saved["views_format"]
+        render.image_settings.views_format = self.saved["image_views_format"]
+        render.use_persistent_data = self.saved["use_persistent_data"]
+        # stand-ins before the cameras they copy
+        for obj in reversed(self.created):
+            bpy.data.objects.remove(obj, do_unlink=True)
+        self.created, self.render_views, self.saved = [], [], None
@@ -0,0 +1,47 @@
+"""
+Render quality profiles applied on top of a project's own render settings
+"""
+import math
+
+# None keeps whatever the project's set_environment chose; the output keys
+# are the PNG bit depth and zlib level and the EXR codec, see apply_output
+PROFILES = {
+    "draft": {"resolution_percentage": 25, "cycles_samples": 16, "eevee_samples": 8,
+              "png_depth": "8", "png_level": 1, "exr_codec": "DWAA"},
+    "preview": {"resolution_percentage": 50, "cycles_samples": 128, "eevee_samples": 32,
+                "png_depth": "8", "png_level": 3, "exr_codec": "DWAA"},
+    "final": {"resolution_percentage": 100, "cycles_samples": None, "eevee_samples": None,
+              "png_depth": None, "png_level": 6, "exr_codec": "ZIP"},
+}
+
+# Time Remapping maps 100 old frames onto at most 900 new ones
+MAX_TIME_STRETCH = 9
+
+
+def apply_profile(scene, name):
+    """
+    Scale resolution and samples of the scene down to the given profile
+    """
+    profile = PROFILES[name]
+    scene.render.resolution_percentage = profile["resolution_percentage"]
+    if profile["cycles_samples"] is not None:
+        scene.cycles.samples = profile["cycles_samples"]
+    if profile["eevee_samples"] is not None:
+        scene.eevee.taa_render_samples = profile["eevee_samples"]
+
+
+def apply_output(scene, name):
+    """
+    Bit depth and compression of the scene's image output for the given profile
+    """
+    profile = PROFILES[name]
+    settings = scene.render.image_settings
+    if settings.file_format == "PNG":
+        if profile["png_depth"] is not None:
+            settings.color_depth = profile["png_depth"]
+        # Blender divides the percentage by 11.1 and truncates to the zlib level
+        settings.compression = math.ceil(profile["png_level"] * 100 / 9)
+    elif settings.file_format in ("OPEN_EXR", "OPEN_EXR_MULTILAYER"):
+        settings.exr_codec = profile["exr_codec"]
+        # half floats; DWAA is lossy already and ZIP halves in size
+        settings.color_depth = "16"
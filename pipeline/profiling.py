@@ -0,0 +1,279 @@
+"""
+Per-phase timing and profiling of scene builds.
+
+Wraps the build functions of a project script so that every call records its
+wall time, bpy.ops calls, datablock counts and how much the resident set
+grew, and writes one JSON report per run along with the process's peak RSS.
+Any phase can also be run under cProfile.
+
+    blender -b -P pipeline/profiling.py -- golden_spiral --out reports --cprofile generate_golden_spiral
+"""
+import argparse
+import cProfile
+import functools
+import json
+import os
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bpy
+
+from pipeline.projects import PROJECTS, load_project, script_argv
+
+try:
+    import resource
+except ImportError:
+    # not available on Windows, peak RSS is reported as null there
+    resource = None
+
+# build functions reported as phases whenever a project script defines them
+PHASES = (
+    "clean_scene",
+    "set_environment",
+    "set_camera",
+    "add_lights",
+    # node-tree construction
+    "geometry_node_setup",
+    "create_dissolve_effect",
+    # materials
+    "create_reflective_plane",
+    "create_sphere_shader",
+    "create_mesh_sand_shader",
+    "apply_emission_material",
+    # geometry
+    "generate_golden_spiral",
+    "generate_spike_sphere",
+    "generate_fractal_sphere",
+    "render_loop",
+)
+
+# bpy.data collections counted at the end of every phase
+DATABLOCKS = (
+    "objects",
+    "meshes",
+    "curves",
+    "materials",
+    "node_groups",
+    "cameras",
+    "lights",
+    "worlds",
+    "collections",
+    "images",
+    "actions",
+)
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process in megabytes
+    """
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def current_rss_mb():
+    """
+    Current resident set size in megabytes, where the platform makes it cheap to read
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+    except OSError:
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def datablock_counts():
+    return {name: len(getattr(bpy.data, name)) for name in DATABLOCKS}
+
+
+class OpsCounter:
+    """
+    Counts bpy.ops calls by patching the class Blender wraps every operator in
+    """
+    def __init__(self):
+        self.calls = Counter()
+        self._op_class = None
+        self._original_call = None
+
+    def install(self):
+        if self._op_class is not None:
+            return
+        op_class = type(bpy.ops.object.select_all)
+        original_call = op_class.__call__
+        calls = self.calls
+
+        def counted_call(op, *args, **kwargs):
+            calls[op.idname_py()] += 1
+            return original_call(op, *args, **kwargs)
+
+        op_class.__call__ = counted_call
+        self._op_class = op_class
+        self._original_call = original_call
+
+    def uninstall(self):
+        if self._op_class is None:
+            return
+        self._op_class.__call__ = self._original_call
+        self._op_class = None
+        self._original_call = None
+
+
+class PhaseProfiler:
+    """
+    Collects per-phase statistics for one run, nested phases are keyed by their path
+    """
+    def __init__(self, run_name, cprofile_phases=()):
+        self.run_name = run_name
+        self.cprofile_phases = set(cprofile_phases)
+        self.phases = {}
+        self.ops = OpsCounter()
+        self.started_at = None
+        self.wall_time = 0.0
+        self._start = None
+        self._stack = []
+        self._profiles = {}
+        self._profiling = False
+
+    def start(self):
+        self.ops.install()
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self._start = time.perf_counter()
+
+    def stop(self):
+        self.wall_time = time.perf_counter() - self._start
+        self.ops.uninstall()
+
+    @contextmanager
+    def phase(self, name):
+        self._stack.append(name)
+        path = "/".join(self._stack)
+        stats = self.phases.setdefault(path, {"calls": 0, "wall_time": 0.0, "ops_by_name": Counter()})
+
+        # cProfile cannot nest, so only the outermost requested phase is profiled
+        profile = None
+        if name in self.cprofile_phases and not self._profiling:
+            profile = self._profiles.setdefault(name, cProfile.Profile())
+            self._profiling = True
+            profile.enable()
+
+        ops_before = Counter(self.ops.calls)
+        rss_before = current_rss_mb()
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            elapsed = time.perf_counter() - start
+            if profile is not None:
+                profile.disable()
+                self._profiling = False
+            stats["calls"] += 1
+            stats["wall_time"] += elapsed
+            stats["ops_by_name"].update(self.ops.calls - ops_before)
+            stats["datablocks"] = datablock_counts()
+            # the peak is process-wide, only the growth belongs to the phase; it
+            # includes its nested phases and can be negative when memory is freed
+            rss_after = current_rss_mb()
+            if rss_before is not None and rss_after is not None:
+                stats["rss_growth_mb"] = stats.get("rss_growth_mb", 0.0) + rss_after - rss_before
+            self._stack.pop()
+
+    def wrap(self, module, names=PHASES):
+        """
+        Replace the module's build functions with versions that run inside a phase
+        """
+        wrapped = []
+        for name in names:
+            function = getattr(module, name, None)
+            if not callable(function):
+                continue
+            setattr(module, name, self._wrap_function(name, function))
+            wrapped.append(name)
+        return wrapped
+
+    def _wrap_function(self, name, function):
+        @functools.wraps(function)
+        def phase_wrapper(*args, **kwargs):
+            with self.phase(name):
+                return function(*args, **kwargs)
+        return phase_wrapper
+
+    def report(self):
+        phases = []
+        for path, stats in self.phases.items():
+            phases.append({
+                "phase": path,
+                "calls": stats["calls"],
+                "wall_time": stats["wall_time"],
+                "ops": sum(stats["ops_by_name"].values()),
+                "ops_by_name": dict(stats["ops_by_name"]),
+                "datablocks": stats.get("datablocks"),
+                "rss_growth_mb": stats.get("rss_growth_mb"),
+            })
+        return {
+            "run": self.run_name,
+            "started_at": self.started_at,
+            "blender_version": bpy.app.version_string,
+            "wall_time": self.wall_time,
+            "ops": sum(self.ops.calls.values()),
+            "ops_by_name": dict(self.ops.calls),
+            "datablocks": datablock_counts(),
+            "peak_rss_mb": peak_rss_mb(),
+            "phases": phases,
+        }
+
+    def write(self, directory):
+        """
+        Write the JSON report and one .prof file per cProfile'd phase, returns the report path
+        """
+        os.makedirs(directory, exist_ok=True)
+        for name, profile in self._profiles.items():
+            profile.dump_stats(os.path.join(directory, f"{self.run_name}.{name}.prof"))
+        report_path = os.path.join(directory, f"{self.run_name}.json")
+        with open(report_path, "w") as report_file:
+            json.dump(self.report(), report_file, indent=2)
+        return report_path
+
+
+def profile_run(module, run_name, entry, out_dir, cprofile_phases=()):
+    """
+    Run entry() with the module's build functions instrumented and write the report
+    """
+    profiler = PhaseProfiler(run_name, cprofile_phases)
+    profiler.wrap(module)
+    profiler.start()
+    try:
+        with profiler.phase("run"):
+            entry()
+    finally:
+        profiler.stop()
+    return profiler.write(out_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile the build phases of a project script")
+    parser.add_argument("project", choices=sorted(PROJECTS))
+    parser.add_argument("--out", default="reports", help="directory for the JSON report and .prof files")
+    parser.add_argument("--cprofile", action="append", default=[], metavar="PHASE",
+                        help="also run this phase under cProfile, can be repeated")
+    args = parser.parse_args(script_argv())
+
+    module = load_project(args.project)
+    run_name = f"{args.project}-{datetime.now():%Y%m%d-%H%M%S}"
+    report_path = profile_run(module, run_name, module.main, args.out, args.cprofile)
+    print(f"profile report written to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Registry of the project scripts and helpers to import them as modules
+"""
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROJECTS = {
+    "golden_spiral": "golden_spiral/golden_spiral.py",
+    "spike_sphere": "spike_sphere/spike_sphere.py",
+    "fractal_effect": "fractal_effect/fractal_effect.py",
+    "dissolve_mesh": "dissolve_mesh/dissolve_mesh.py",
+}
+
+
+# keyword arguments each project's build() accepts, with their types
+BUILD_PARAMS = {
+    "golden_spiral": {"num_points": int, "color": tuple},
+    "spike_sphere": {"subdivisions": int, "noise_range": float},
+    "fractal_effect": {"depth": int},
+    "dissolve_mesh": {"density": float},
+}
+
+
+def project_path(name):
+    """
+    Absolute path of a project's script
+    """
+    if name not in PROJECTS:
+        raise KeyError(f"unknown project '{name}', expected one of {', '.join(PROJECTS)}")
+    return os.path.join(ROOT, PROJECTS[name])
+
+
+def load_project(name):
+    """
+    Import a project script as a module without running its main()
+    """
+    spec = importlib.util.spec_from_file_location(name, project_path(name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def script_argv(argv=None):
+    """
+    Arguments meant for the script, i.e. everything after "--" when run through Blender
+    """
+    argv = sys.argv if argv is None else argv
+    if "--" in argv:
+        return argv[argv.index("--") + 1:]
+    return argv[1:]
@@ -0,0 +1,35 @@
+"""
+Global viewport proxy switch.
+
+The heavy generators (the spike sphere's ico sphere, the fractal's
+extrusion levels, the dissolve cutter and point density) read the shared
+"Proxy" node group, which is True while proxies are enabled and the tree is
+evaluated for the viewport. Switching it on keeps timeline scrubbing
+interactive; renders always evaluate at full resolution, whatever the switch
+says. From Blender's Python console:
+
+    from pipeline.proxy import set_proxy
+    set_proxy(True)
+
+or for a saved scene, through pipeline/cli.py with --proxy on.
+"""
+import bpy
+
+GROUP = "Proxy"
+SWITCH = "Proxy Enabled"
+
+
+def set_proxy(enabled=True):
+    """
+    Turn the viewport proxies of every project in the file on or off, False when the file has none
+    """
+    if GROUP not in bpy.data.node_groups:
+        return False
+    bpy.data.node_groups[GROUP].nodes[SWITCH].boolean = enabled
+    return True
+
+
+def proxy_enabled():
+    if GROUP not in bpy.data.node_groups:
+        return False
+    return bool(bpy.data.node_groups[GROUP].nodes[SWITCH].boolean)
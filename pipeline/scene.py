@@ -0,0 +1,25 @@
+"""
+Scene-level helpers shared by the headless tools
+"""
+import bpy
+
+
+def reset_scene(blend_file=None):
+    """
+    Start from the given .blend, or from an empty file
+    """
+    if blend_file:
+        bpy.ops.wm.open_mainfile(filepath=blend_file)
+    else:
+        bpy.ops.wm.read_homefile(use_empty=True)
+
+
+def prepare_project(name):
+    """
+    Make sure the scene holds what a project expects to find before its build runs
+    """
+    # the dissolve effect is applied to a mesh called 'textured' that comes
+    # with the project's .blend file; use a stand-in when building without it
+    if name == "dissolve_mesh" and "textured" not in bpy.data.objects:
+        bpy.ops.mesh.primitive_ico_sphere_add(subdivisions=5, radius=1.5, location=(0, 0, 1.5))
+        bpy.context.active_object.name = "textured"
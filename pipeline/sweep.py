@@ -0,0 +1,249 @@
+"""
+Parallel parameter sweeps over a pool of headless Blender processes.
+
+A sweep file names a project and a grid of values; every combination becomes
+a render job. Grid keys that are build() parameters of the project decide
+the scene build, the others (profile, frames, step, format) only change the
+render. Each distinct build runs once and is saved to a cached .blend that
+every render job with the same build parameters starts from; builds cached
+by earlier sweeps are reused as long as the project script is unchanged.
+
+    {
+        "project": "golden_spiral",
+        "grid": {
+            "color": [[0.91, 0.2, 1, 1], [0.2, 0.6, 1, 1]],
+            "num_points": [500, 1000],
+            "profile": ["draft", "final"]
+        },
+        "frames": [1, 90]
+    }
+
+    python -m pipeline.sweep sweeps/spiral.json --out sweeps/spiral --threads-per-job 4
+
+Jobs run on at most cpu_count // threads-per-job processes at once, each
+limited to its thread quota, and a manifest with per-job timings is written
+to the output directory.
+"""
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import deque
+from datetime import datetime
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pipeline.launch import BLENDER, blender_env, cli_command, param_args
+from pipeline.projects import BUILD_PARAMS, ROOT, project_path
+
+# grid keys that only affect the render, never the build
+RENDER_KEYS = ("profile", "frames", "step", "format")
+
+
+def expand_grid(grid):
+    """
+    Every combination of the grid values, as a list of dicts
+    """
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def build_key(project, build_params, blend_file=None):
+    """
+    Cache key of a scene build, changes with the parameters and with the project's source
+    """
+    with open(project_path(project), "rb") as script:
+        source = hashlib.sha1(script.read()).hexdigest()
+    payload = json.dumps({"project": project, "params": build_params, "blend": blend_file, "source": source},
+                         sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+def variant_name(index, variant):
+    parts = []
+    for key, value in sorted(variant.items()):
+        if isinstance(value, (list, tuple)):
+            value = "-".join(f"{part:g}" if isinstance(part, float) else str(part) for part in value)
+        parts.append(f"{key}-{value}")
+    return f"{index:03d}_" + "_".join(parts)
+
+
+def plan_jobs(spec, out_dir, cache_dir):
+    """
+    Build jobs for the distinct builds that are not cached yet, and one render job per variant
+    """
+    project = spec["project"]
+    accepted = BUILD_PARAMS[project]
+    blend_file = spec.get("blend")
+    builds = {}
+    renders = []
+
+    for index, variant in enumerate(expand_grid(spec.get("grid", {}))):
+        unknown = [key for key in variant if key not in accepted and key not in RENDER_KEYS]
+        if unknown:
+            raise SystemExit(f"{project} has no parameter {', '.join(unknown)}")
+        build_params = {key: value for key, value in variant.items() if key in accepted}
+        render_params = {key: spec[key] for key in RENDER_KEYS if key in spec}
+        render_params.update({key: value for key, value in variant.items() if key in RENDER_KEYS})
+
+        key = build_key(project, build_params, blend_file)
+        cached_blend = os.path.join(cache_dir, f"{project}-{key}.blend")
+        if key not in builds:
+            builds[key] = {
+                "id": f"build-{key}",
+                "kind": "build",
+                "build_key": key,
+                "project": project,
+                "params": build_params,
+                "blend": cached_blend,
+                "source_blend": blend_file,
+                "cache_hit": os.path.exists(cached_blend),
+            }
+
+        renders.append({
+            "id": variant_name(index, variant),
+            "kind": "render",
+            "project": project,
+            "params": variant,
+            "render_params": render_params,
+            "build": key,
+            "blend": cached_blend,
+            "output": os.path.join(out_dir, variant_name(index, variant)),
+        })
+    return builds, renders
+
+
+def job_command(job, threads, blender, fake):
+    if job["kind"] == "build":
+        args = [job["project"], *param_args(job["params"]), "--skip-render", "--save-blend", job["blend"]]
+        return cli_command(args, job["source_blend"], threads, blender, fake)
+
+    params = job["render_params"]
+    args = [job["project"], "--skip-build", "--output", job["output"], "--threads", str(threads)]
+    if "frames" in params:
+        args += ["--frames", *(str(frame) for frame in params["frames"])]
+    if "step" in params:
+        args += ["--step", str(params["step"])]
+    if "profile" in params:
+        args += ["--profile", params["profile"]]
+    if "format" in params:
+        args += ["--format", params["format"]]
+    return cli_command(args, job["blend"], threads, blender, fake)
+
+
+def run_jobs(builds, renders, workers, threads, log_dir, blender=BLENDER, fake=False):
+    """
+    Run the jobs on at most `workers` processes; renders start as soon as their build is available
+    """
+    os.makedirs(log_dir, exist_ok=True)
+    ready = deque(build for build in builds.values() if not build["cache_hit"])
+    waiting = {}
+    for render in renders:
+        if builds[render["build"]]["cache_hit"]:
+            ready.append(render)
+        else:
+            waiting.setdefault(render["build"], []).append(render)
+
+    start = time.perf_counter()
+    running = {}
+    finished = []
+    while ready or running:
+        while ready and len(running) < workers:
+            job = ready.popleft()
+            job["command"] = job_command(job, threads, blender, fake)
+            job["log"] = os.path.join(log_dir, f"{job['id']}.log")
+            log_file = open(job["log"], "w")
+            job["started"] = time.perf_counter() - start
+            process = subprocess.Popen(job["command"], cwd=ROOT, stdout=log_file, stderr=subprocess.STDOUT,
+                                       env=blender_env())
+            running[process] = (job, log_file)
+
+        for process in list(running):
+            if process.poll() is None:
+                continue
+            job, log_file = running.pop(process)
+            log_file.close()
+            job["returncode"] = process.returncode
+            job["wall_time"] = time.perf_counter() - start - job["started"]
+            finished.append(job)
+            print(f"{'ok  ' if process.returncode == 0 else 'FAIL'} {job['id']} {job['wall_time']:.1f}s")
+
+            if job["kind"] == "build":
+                dependents = waiting.pop(job["build_key"], [])
+                if process.returncode == 0:
+                    ready.extend(dependents)
+                else:
+                    for render in dependents:
+                        render["returncode"] = None
+                        render["skipped"] = f"build {job['id']} failed"
+                        finished.append(render)
+        time.sleep(0.05)
+
+    return finished, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a parameter sweep on a pool of headless Blender processes")
+    parser.add_argument("spec", help="sweep file, see the module docstring")
+    parser.add_argument("--out", default="sweeps", help="output directory for renders, logs and the manifest")
+    parser.add_argument("--cache", default=os.path.join(ROOT, ".cache", "builds"), help="cached scene builds")
+    parser.add_argument("--threads-per-job", type=int, default=4)
+    parser.add_argument("--workers", type=int, help="parallel processes, defaults to cpu_count // threads-per-job")
+    parser.add_argument("--blender", default=BLENDER)
+    parser.add_argument("--fake", action="store_true", help="run the jobs against the bpy stand-in")
+    parser.add_argument("--dry-run", action="store_true", help="only print the planned jobs")
+    args = parser.parse_args(argv)
+
+    with open(args.spec) as spec_file:
+        spec = json.load(spec_file)
+    out_dir = os.path.abspath(args.out)
+    cache_dir = os.path.abspath(args.cache)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    cores = os.cpu_count() or 1
+    workers = args.workers or max(1, cores // args.threads_per_job)
+    builds, renders = plan_jobs(spec, out_dir, cache_dir)
+    cache_hits = sum(build["cache_hit"] for build in builds.values())
+    print(f"{len(renders)} renders, {len(builds)} builds ({cache_hits} cached), "
+          f"{workers} workers x {args.threads_per_job} threads")
+
+    if args.dry_run:
+        for job in [build for build in builds.values() if not build["cache_hit"]] + renders:
+            print(" ".join(job_command(job, args.threads_per_job, args.blender, args.fake)))
+        return 0
+
+    started_at = datetime.now().isoformat(timespec="seconds")
+    finished, wall_time = run_jobs(builds, renders, workers, args.threads_per_job,
+                                   os.path.join(out_dir, "logs"), args.blender, args.fake)
+
+    busy = sum(job.get("wall_time", 0.0) for job in finished) * args.threads_per_job
+    manifest = {
+        "spec": os.path.abspath(args.spec),
+        "project": spec["project"],
+        "started_at": started_at,
+        "wall_time": wall_time,
+        "cpu_count": cores,
+        "workers": workers,
+        "threads_per_job": args.threads_per_job,
+        "core_utilization": busy / (wall_time * cores) if wall_time else 0.0,
+        "cache_hits": cache_hits,
+        "jobs": finished,
+    }
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, "manifest.json")
+    with open(manifest_path, "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+
+    failed = [job for job in finished if job.get("returncode") != 0]
+    print(f"{len(finished)} jobs in {wall_time:.1f}s, core utilization {manifest['core_utilization']:.0%}, "
+          f"{len(failed)} failed, manifest at {manifest_path}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""
+Per-frame render telemetry.
+
+Render and frame-change handlers record, for every rendered frame, the
+render time, the peak memory reported by the renderer, the sample count and
+the depsgraph evaluation time. The rows are written to CSV and JSON when the
+render completes; compare two runs with pipeline/compare_runs.py.
+
+    blender -b -P pipeline/telemetry.py -- dissolve_mesh --out telemetry/dissolve
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bpy
+
+from pipeline.profiling import peak_rss_mb
+from pipeline.projects import PROJECTS, load_project, script_argv
+
+FIELDS = ("frame", "render_time", "eval_time", "peak_memory_mb", "peak_rss_mb", "samples")
+
+# Cycles reports "Mem:12.3M (Peak 45.6M)" or "Peak:45.6M", EEVEE "Rendering 16 / 64 samples"
+PEAK_PATTERN = re.compile(r"Peak[: ]\s*([\d.]+)([KMG])")
+SAMPLE_PATTERN = re.compile(r"Sample (\d+)\s*/\s*(\d+)|Rendering (\d+)\s*/\s*(\d+) samples")
+
+UNITS_MB = {"K": 1 / 1024, "M": 1.0, "G": 1024.0}
+
+
+def configured_samples(scene):
+    if scene.render.engine == "CYCLES":
+        return scene.cycles.samples
+    return scene.eevee.taa_render_samples
+
+
+class FrameTelemetry:
+    """
+    Records one row per rendered frame through bpy.app.handlers
+    """
+    def __init__(self, out_dir, name="telemetry"):
+        self.out_dir = out_dir
+        self.name = name
+        self.frames = []
+        self._eval_start = None
+        self._eval_time = None
+        self._render_start = None
+        self._peak_memory = None
+        self._samples = None
+        self._handlers = (
+            ("frame_change_pre", self.on_frame_change_pre),
+            ("frame_change_post", self.on_frame_change_post),
+            ("render_pre", self.on_render_pre),
+            ("render_stats", self.on_render_stats),
+            ("render_post", self.on_render_post),
+            ("render_complete", self.on_render_end),
+            ("render_cancel", self.on_render_end),
+        )
+
+    def install(self):
+        for event, handler in self._handlers:
+            getattr(bpy.app.handlers, event).append(handler)
+
+    def uninstall(self):
+        for event, handler in self._handlers:
+            handlers = getattr(bpy.app.handlers, event)
+            if handler in handlers:
+                handlers.remove(handler)
+
+    def on_frame_change_pre(self, *args):
+        self._eval_start = time.perf_counter()
+
+    def on_frame_change_post(self, *args):
+        if self._eval_start is not None:
+            self._eval_time = time.perf_counter() - self._eval_start
+            self._eval_start = None
+
+    def on_render_pre(self, scene, *args):
+        self._render_start = time.perf_counter()
+        self._peak_memory = None
+        self._samples = configured_samples(scene)
+
+    def on_render_stats(self, stats, *args):
+        for value, unit in PEAK_PATTERN.findall(stats):
+            peak = float(value) * UNITS_MB[unit]
+            self._peak_memory = max(peak, self._peak_memory or 0.0)
+        match = SAMPLE_PATTERN.search(stats)
+        if match:
+            self._samples = int(match.group(2) or match.group(4))
+
+    def on_render_post(self, scene, *args):
+        if self._render_start is None:
+            return
+        self.frames.append({
+            "frame": scene.frame_current,
+            "render_time": time.perf_counter() - self._render_start,
+            "eval_time": self._eval_time,
+            "peak_memory_mb": self._peak_memory,
+            "peak_rss_mb": peak_rss_mb(),
+            "samples": self._samples,
+        })
+        self._render_start = None
+        self._eval_time = None
+
+    def on_render_end(self, *args):
+        self.write()
+
+    def write(self):
+        """
+        Write the rows collected so far as <name>.csv and <name>.json
+        """
+        os.makedirs(self.out_dir, exist_ok=True)
+        csv_path = os.path.join(self.out_dir, f"{self.name}.csv")
+        with open(csv_path, "w", newline="") as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(self.frames)
+        json_path = os.path.join(self.out_dir, f"{self.name}.json")
+        with open(json_path, "w") as json_file:
+            json.dump({"name": self.name, "frames": self.frames}, json_file, indent=2)
+        return json_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a project and record per-frame telemetry")
+    parser.add_argument("project", choices=sorted(PROJECTS))
+    parser.add_argument("--out", default="telemetry", help="directory for the CSV and JSON files")
+    args = parser.parse_args(script_argv())
+
+    module = load_project(args.project)
+    telemetry = FrameTelemetry(args.out, name=args.project)
+    telemetry.install()
+    try:
+        module.main()
+        # the dissolve script leaves rendering to the user
+        if not telemetry.frames:
+            module.render_loop()
+    finally:
+        telemetry.uninstall()
+    print(f"telemetry for {len(telemetry.frames)} frames written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Single-frame rendering split into border tiles across processes.
+
+Frame-level parallelism does nothing for a still or for re-rendering one
+problem frame, so this splits the frame into a grid of render borders,
+renders every tile in its own headless Blender process and stitches the
+cropped tiles back into one image. Tiles are written as 16-bit PNGs next to
+a sidecar with their pixel placement and copied into the frame unchanged,
+so the stitched frame holds exactly the rendered pixel values.
+
+    python -m pipeline.tiling render dissolve_mesh --blend cache/dissolve.blend --frame 240 --workers 8
+    python -m pipeline.tiling render dissolve_mesh --blend cache/dissolve.blend --frame 240 --tiles 4 4 --dry-run
+    python -m pipeline.tiling stitch stills/dissolve_mesh_0240_tiles --out stills/dissolve_mesh_0240.png
+
+Cycles samples every pixel the same way whichever border it is rendered in,
+but the denoiser only sees its own tile; --overlap renders a margin around
+each tile that is cropped away when stitching, which keeps denoised tiles
+from showing seams. Screen-space effects such as EEVEE bloom need the whole
+frame, tile those projects with bloom off or not at all.
+
+Every process loads the scene and builds its own BVH, so use more tiles than
+workers only when tiles differ a lot in cost. --dry-run prints the tile
+commands to spread them over other machines; `stitch` puts the tiles
+together once they are in one directory.
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from pipeline.imageio import read_png, write_png
+from pipeline.launch import BLENDER, blender_env, cli_command
+from pipeline.profiles import PROFILES
+from pipeline.projects import PROJECTS, ROOT
+
+
+def default_grid(workers):
+    """
+    Columns and rows of a near-square grid with at least one tile per worker
+    """
+    columns = math.ceil(math.sqrt(workers))
+    return columns, math.ceil(workers / columns)
+
+
+def tile_commands(project, frame, tile_dir, grid, overlap=0, profile="final", blend_file=None, threads=None,
+                  blender=BLENDER, fake=False, extra_args=()):
+    columns, rows = grid
+    commands = []
+    for index in range(columns * rows):
+        args = [project, "--skip-build", "--still", str(frame), "--tile", str(index), str(columns), str(rows),
+                "--overlap", str(overlap), "--profile", profile, "--color-depth", "16", "--output", tile_dir,
+                *extra_args]
+        if threads:
+            args += ["--threads", str(threads)]
+        commands.append(cli_command(args, blend_file, threads, blender, fake))
+    return commands
+
+
+def run_tiles(commands, workers, log_dir):
+    """
+    Run the tile commands on at most `workers` processes, return the failed tile indices
+    """
+    os.makedirs(log_dir, exist_ok=True)
+    pending = list(enumerate(commands))
+    running = {}
+    failed = []
+    while pending or running:
+        while pending and len(running) < workers:
+            index, command = pending.pop(0)
+            log_file = open(os.path.join(log_dir, f"tile{index:03d}.log"), "w")
+            process = subprocess.Popen(command, cwd=ROOT, stdout=log_file, stderr=subprocess.STDOUT, env=blender_env())
+            running[process] = (index, log_file, time.perf_counter())
+
+        for process in list(running):
+            if process.poll() is None:
+                continue
+            index, log_file, started = running.pop(process)
+            log_file.close()
+            if process.returncode != 0:
+                failed.append(index)
+            print(f"{'ok  ' if process.returncode == 0 else 'FAIL'} tile {index} {time.perf_counter() - started:.1f}s")
+        time.sleep(0.05)
+    return failed
+
+
+def stitch(tile_dir):
+    """
+    Full frame from the tiles and sidecars in a directory, checking that the tiles cover it exactly
+    """
+    sidecars = sorted(glob.glob(os.path.join(tile_dir, "*.json")))
+    if not sidecars:
+        raise SystemExit(f"no tiles in {tile_dir}")
+
+    frame = covered = None
+    for path in sidecars:
+        with open(path) as sidecar:
+            tile = json.load(sidecar)
+        pixels = read_png(os.path.join(tile_dir, tile["image"]))
+        width, height = tile["size"]
+        x_min, x_max, y_min, y_max = tile["rendered"]
+        if pixels.shape[:2] != (y_max - y_min, x_max - x_min):
+            raise SystemExit(f"{tile['image']} is {pixels.shape[1]}x{pixels.shape[0]}, "
+                             f"its border is {x_max - x_min}x{y_max - y_min}")
+        if frame is None:
+            frame = np.zeros((height, width, pixels.shape[2]), dtype=pixels.dtype)
+            covered = np.zeros((height, width), dtype=bool)
+
+        # keep only the tile's own pixels, images are stored top row first
+        core_x_min, core_x_max, core_y_min, core_y_max = tile["core"]
+        source = pixels[y_max - core_y_max:y_max - core_y_min, core_x_min - x_min:core_x_max - x_min]
+        target = (slice(height - core_y_max, height - core_y_min), slice(core_x_min, core_x_max))
+        frame[target] = source
+        covered[target] = True
+
+    if not covered.all():
+        raise SystemExit(f"tiles in {tile_dir} leave {np.count_nonzero(~covered)} pixels uncovered")
+    return frame
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render one frame as tiles in parallel processes and stitch it")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    render_parser = commands.add_parser("render", help="render the tiles of a frame and stitch them")
+    render_parser.add_argument("project", choices=sorted(PROJECTS))
+    render_parser.add_argument("--frame", type=int, required=True)
+    render_parser.add_argument("--blend", help="built scene to render, see cli.py --save-blend")
+    render_parser.add_argument("--tiles", type=int, nargs=2, metavar=("COLUMNS", "ROWS"),
+                               help="tile grid, defaults to one tile per worker")
+    render_parser.add_argument("--workers", type=int, default=4, help="tiles rendered at once")
+    render_parser.add_argument("--threads-per-job", type=int, help="defaults to cpu_count // workers")
+    render_parser.add_argument("--overlap", type=int, default=16, help="margin in pixels rendered around each tile")
+    render_parser.add_argument("--profile", choices=sorted(PROFILES), default="final")
+    render_parser.add_argument("--out", default="stills", help="output directory")
+    render_parser.add_argument("--keep-tiles", action="store_true")
+    render_parser.add_argument("--blender", default=BLENDER)
+    render_parser.add_argument("--fake", action="store_true", help="render the tiles with the bpy stand-in")
+    render_parser.add_argument("--dry-run", action="store_true", help="only print the tile commands")
+
+    stitch_parser = commands.add_parser("stitch", help="stitch already rendered tiles")
+    stitch_parser.add_argument("tile_dir")
+    stitch_parser.add_argument("--out", required=True, help="PNG file to write")
+
+    args = parser.parse_args(argv)
+    if args.command == "stitch":
+        write_png(args.out, stitch(args.tile_dir))
+        print(f"wrote {args.out}")
+        return 0
+
+    out_dir = os.path.abspath(args.out)
+    name = f"{args.project}_{args.frame:04d}"
+    tile_dir = os.path.join(out_dir, f"{name}_tiles")
+    grid = tuple(args.tiles) if args.tiles else default_grid(args.workers)
+    threads = args.threads_per_job or max(1, (os.cpu_count() or 1) // args.workers)
+    blend_file = os.path.abspath(args.blend) if args.blend else None
+    commands = tile_commands(args.project, args.frame, tile_dir, grid, args.overlap, args.profile,
+                             blend_file, threads, args.blender, args.fake)
+    if args.dry_run:
+        for command in commands:
+            print(" ".join(command))
+        return 0
+
+    # stale tiles from an earlier grid would be stitched in too
+    for stale in glob.glob(os.path.join(tile_dir, "*.json")):
+        os.unlink(stale)
+    print(f"{len(commands)} tiles ({grid[0]}x{grid[1]}) on {args.workers} workers x {threads} threads")
+    started = time.perf_counter()
+    failed = run_tiles(commands, args.workers, os.path.join(tile_dir, "logs"))
+    if failed:
+        print(f"tiles {', '.join(map(str, failed))} failed, logs in {os.path.join(tile_dir, 'logs')}")
+        return 1
+
+    output = os.path.join(out_dir, f"{name}.png")
+    write_png(output, stitch(tile_dir))
+    if not args.keep_tiles:
+        for path in glob.glob(os.path.join(tile_dir, f"{args.project}_tile*")):
+            os.unlink(path)
+    print(f"wrote {output} in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Shader warm-up for EEVEE renders.
+
+EEVEE compiles the shaders of a material the first time it renders it, so
+the first frame of an animation stalls until every material of the scene
+is ready. warm_up() compiles them before the frame loop with tiny probe
+renders: one with the material objects hidden for the world, one per
+material with only its objects shown, and one of the whole scene for what
+geometry nodes assign. The compiled shaders stay in the process for the
+frames that follow, and the time of each probe is reported.
+
+Across processes, compiled programs are kept by the OpenGL driver's shader
+disk cache. The Blender processes the pipeline starts point it at one
+directory shared by every worker and run (see pipeline.launch.blender_env),
+so a worker loads from disk what an earlier one already compiled.
+
+    blender -b cache/spike.blend -P pipeline/cli.py -- spike_sphere --skip-build --warm-up
+"""
+import time
+
+import bpy
+
+EEVEE_ENGINES = ("BLENDER_EEVEE", "BLENDER_EEVEE_NEXT")
+
+# probe renders are as small and cheap as possible, compiling dominates their time
+PROBE_PERCENTAGE = 1
+PROBE_SAMPLES = 1
+
+
+def material_users(scene):
+    """
+    {material name: [objects]} over the objects of the scene that render
+    """
+    users = {}
+    for obj in scene.objects:
+        if obj.hide_render:
+            continue
+        for slot in obj.material_slots:
+            if slot.material is not None:
+                users.setdefault(slot.material.name, []).append(obj)
+    return users
+
+
+def probe():
+    started = time.perf_counter()
+    bpy.ops.render.render()
+    return time.perf_counter() - started
+
+
+def warm_up(scene):
+    """
+    Compile the shaders of the scene ahead of the frames, returns (what, seconds) per probe render
+    """
+    if scene.render.engine not in EEVEE_ENGINES:
+        return []
+    users = material_users(scene)
+    shown = list({obj.name: obj for objects in users.values() for obj in objects}.values())
+    saved = (scene.render.resolution_percentage, scene.eevee.taa_render_samples)
+
+    timings = []
+    try:
+        scene.render.resolution_percentage = PROBE_PERCENTAGE
+        scene.eevee.taa_render_samples = PROBE_SAMPLES
+        for obj in shown:
+            obj.hide_render = True
+        timings.append(("world", probe()))
+        # an object with several materials compiles them all in the first probe it shows up in
+        for name, objects in users.items():
+            for obj in objects:
+                obj.hide_render = False
+            timings.append((name, probe()))
+            for obj in objects:
+                obj.hide_render = True
+        for obj in shown:
+            obj.hide_render = False
+        timings.append(("whole scene", probe()))
+    finally:
+        for obj in shown:
+            obj.hide_render = False
+        scene.render.resolution_percentage, scene.eevee.taa_render_samples = saved
+    return timings
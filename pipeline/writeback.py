@@ -0,0 +1,245 @@
+"""
+Frame write-back on background threads.
+
+Blender compresses and writes each frame on the render thread before the
+next frame starts. With the writer installed, Blender writes frames
+uncompressed to a staging directory, on a RAM disk (/dev/shm) where there
+is one, and a pool of threads does the rest while the next frame renders:
+
+    read the staged frame
+    compress it at the profile's zlib level (draft 1, preview 3, final 6)
+    write it to a temporary file next to its final name, fsync, rename, fsync the directory
+    append a line for the frame to <project>_manifest.jsonl and fsync it
+
+A frame listed in the manifest is complete on disk. With resume=True
+(cli.py --resume) a crashed or killed render picks up from the manifest
+rather than from whatever files exist: each listed frame gets an empty
+placeholder at its staging path, and Blender, told not to overwrite,
+skips those frames. Anything else staged for the range is left over from
+the crash, possibly half written, and is deleted so the frame renders
+again. A render without resume starts a new manifest.
+zlib and NumPy run without the GIL, so the threads compress in parallel.
+At most a queue depth of frames waits for a thread; the render only stops
+for the writer when it falls that far behind:
+
+    blender -b cache/spiral.blend -P pipeline/cli.py -- golden_spiral --skip-build --write-workers 4
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bpy
+
+from pipeline.imageio import encode_png, read_png
+
+# frames waiting for a thread, per thread
+QUEUE_PER_WORKER = 2
+# RAM disk for the staged frames, the output directory is used without one
+SHARED_MEMORY = "/dev/shm"
+
+
+def fsync_directory(path):
+    """
+    Make a rename in the directory durable; Windows has no directory handles to sync
+    """
+    if os.name == "nt":
+        return
+    descriptor = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+
+def write_durably(path, contents):
+    """
+    Replace path with contents so that a crash leaves the old file or the whole new one
+    """
+    directory, name = os.path.split(path)
+    # one writer per frame, the name cannot clash
+    temporary = os.path.join(directory, f".{name}.part")
+    try:
+        with open(temporary, "wb") as part:
+            part.write(contents)
+            part.flush()
+            os.fsync(part.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    fsync_directory(directory)
+
+
+def remove_stale_staging(parent, project):
+    """
+    Delete the staging directories of the project's runs that were killed or crashed
+
+    A run's directory carries its pid; uncompressed frames in RAM would
+    otherwise stay there until the next reboot.
+    """
+    prefix = f".{project}_staging_"
+    for name in os.listdir(parent):
+        if not name.startswith(prefix):
+            continue
+        pid = name[len(prefix):].partition("_")[0]
+        if not pid.isdigit() or pid_alive(int(pid)):
+            continue
+        shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+
+
+def pid_alive(pid):
+    if os.name == "nt":
+        # signal 0 is CTRL_C_EVENT there, never send it
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # someone else's process
+        return True
+    return True
+
+
+class AsyncFrameWriter:
+    """
+    Takes the frames Blender writes off the render thread, see the module docstring
+    """
+    def __init__(self, scene, project, output, level, workers, queue_depth=None, staging=None, resume=False):
+        self.scene = scene
+        self.project = project
+        self.output = os.path.abspath(output)
+        self.level = level
+        self.workers = workers
+        self.queue_depth = queue_depth or QUEUE_PER_WORKER * workers
+        self.staging = staging
+        self.resume = resume
+        self.skipped = []
+        self.manifest_path = os.path.join(self.output, f"{project}_manifest.jsonl")
+        self.frames = 0
+        self.failed = []
+        self.waited = 0.0
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_depth)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._manifest = None
+        self._created_staging = False
+        self._saved = None
+
+    def _staging_dir(self):
+        if self.staging is not None:
+            os.makedirs(self.staging, exist_ok=True)
+            return os.path.abspath(self.staging)
+        self._created_staging = True
+        parent = SHARED_MEMORY if os.path.isdir(SHARED_MEMORY) else self.output
+        remove_stale_staging(parent, self.project)
+        return tempfile.mkdtemp(prefix=f".{self.project}_staging_{os.getpid()}_", dir=parent)
+
+    def _clear_staged(self, done):
+        """
+        Delete what a crashed run left staged for frames the manifest does not list
+        """
+        render = self.scene.render
+        for frame in range(self.scene.frame_start, self.scene.frame_end + 1, self.scene.frame_step):
+            staged = render.frame_path(frame=frame)
+            if frame not in done and os.path.exists(staged):
+                os.remove(staged)
+
+    def completed(self):
+        """
+        {frame: image} of the manifest entries whose image is in the output directory
+        """
+        frames = {}
+        if not os.path.exists(self.manifest_path):
+            return frames
+        with open(self.manifest_path) as manifest:
+            for line in manifest:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # a line cut short by the crash, its frame is rendered again
+                    continue
+                if os.path.exists(os.path.join(self.output, entry["image"])):
+                    frames[entry["frame"]] = entry["image"]
+        return frames
+
+    def install(self):
+        render = self.scene.render
+        settings = render.image_settings
+        self._saved = (render.filepath, settings.compression, render.use_overwrite)
+        done = self.completed() if self.resume else {}
+        self.staging = self._staging_dir()
+        render.filepath = os.path.join(self.staging, os.path.basename(render.filepath))
+        # Blender only copies the pixels out, the threads compress
+        settings.compression = 0
+        if done:
+            self._clear_staged(done)
+            render.use_overwrite = False
+            for frame in sorted(done):
+                open(render.frame_path(frame=frame), "w").close()
+                self.skipped.append(frame)
+        self._manifest = open(self.manifest_path, "a" if self.resume else "w")
+        if self._manifest.tell() > 0:
+            with open(self.manifest_path, "rb") as manifest:
+                manifest.seek(-1, os.SEEK_END)
+                # the entries after a cut short line start on a line of their own
+                if manifest.read() != b"\n":
+                    self._manifest.write("\n")
+        self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="frame-writer")
+        bpy.app.handlers.render_write.append(self.on_render_write)
+
+    def on_render_write(self, scene, *handler_args):
+        staged = scene.render.frame_path(frame=scene.frame_current)
+        started = time.perf_counter()
+        self._slots.acquire()
+        self.waited += time.perf_counter() - started
+        self._pool.submit(self._write, scene.frame_current, staged).add_done_callback(self._done)
+
+    def _done(self, future):
+        self._slots.release()
+
+    def _write(self, frame, staged):
+        started = time.perf_counter()
+        path = os.path.join(self.output, os.path.basename(staged))
+        try:
+            contents = encode_png(read_png(staged), self.level)
+            write_durably(path, contents)
+            os.remove(staged)
+        except Exception as error:
+            with self._lock:
+                self.failed.append((frame, f"{type(error).__name__}: {error}"))
+            return
+        entry = {"frame": frame, "image": os.path.basename(path), "bytes": len(contents),
+                 "level": self.level, "seconds": round(time.perf_counter() - started, 4)}
+        # frames finish out of order, the manifest lists them as they become durable
+        with self._lock:
+            self._manifest.write(json.dumps(entry) + "\n")
+            self._manifest.flush()
+            os.fsync(self._manifest.fileno())
+            self.frames += 1
+
+    def uninstall(self):
+        """
+        Wait for the frames in flight and put the output settings back, returns the frames that failed
+        """
+        if self._saved is None:
+            return self.failed
+        if self.on_render_write in bpy.app.handlers.render_write:
+            bpy.app.handlers.render_write.remove(self.on_render_write)
+        self._pool.shutdown(wait=True)
+        self._manifest.close()
+        render = self.scene.render
+        for frame in self.skipped:
+            placeholder = render.frame_path(frame=frame)
+            if os.path.exists(placeholder):
+                os.remove(placeholder)
+        render.filepath, render.image_settings.compression, render.use_overwrite = self._saved
+        if self._created_staging and not self.failed:
+            shutil.rmtree(self.staging, ignore_errors=True)
+        self._saved = None
+        return self.failed
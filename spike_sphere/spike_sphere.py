@@ -3,6 +3,9 @@ import math
 import random
 import numpy as np
 
+# ico sphere subdivisions of the viewport proxy
+PROXY_SUBDIVISIONS = 3
+
 
 def purge_orphans():
     """
@@ -11,6 +14,20 @@ def purge_orphans():
     bpy.ops.outliner.orphans_purge(do_local_ids=True, do_linked_ids=True, do_recursive=True)
 
 
+def create_world():
+    """
+    Replace every world with a new one called "World"
+    """
+    # in the case when you modify the world shader
+    # delete and recreate the world object
+    world_names = [world.name for world in bpy.data.worlds]
+    for name in world_names:
+        bpy.data.worlds.remove(bpy.data.worlds[name])
+    # create a new world data block
+    bpy.ops.world.new()
+    bpy.context.scene.world = bpy.data.worlds["World"]
+
+
 def clean_scene():
     """
     Removing all of the objects, collection, materials, particles,
@@ -35,14 +52,7 @@ def clean_scene():
     for name in collection_names:
         bpy.data.collections.remove(bpy.data.collections[name])
 
-    # in the case when you modify the world shader
-    # delete and recreate the world object
-    world_names = [world.name for world in bpy.data.worlds]
-    for name in world_names:
-        bpy.data.worlds.remove(bpy.data.worlds[name])
-    # create a new world data block
-    bpy.ops.world.new()
-    bpy.context.scene.world = bpy.data.worlds["World"]
+    create_world()
 
     purge_orphans()
 
@@ -173,7 +183,59 @@ def create_animation_loop(obj,
     obj.keyframe_insert(data_path, frame=end_frame)
 
 
-def geometry_node_setup(base_sphere):
+def proxy_group():
+    """
+    Shared node group whose output is True in the viewport while proxies are enabled
+    """
+    # one group for every project, toggled through its 'Proxy Enabled' node
+    # (see pipeline/proxy.py); renders are never viewport, they get full resolution
+    if "Proxy" in bpy.data.node_groups:
+        return bpy.data.node_groups["Proxy"]
+    group = bpy.data.node_groups.new(name="Proxy", type='GeometryNodeTree')
+    group.interface.new_socket('Proxy', in_out='OUTPUT', socket_type='NodeSocketBool')
+
+    enabled = group.nodes.new(type='FunctionNodeInputBool')
+    enabled.name = "Proxy Enabled"
+    enabled.boolean = False
+    enabled.location = (-200, 100)
+
+    is_viewport = group.nodes.new(type='GeometryNodeIsViewport')
+    is_viewport.location = (-200, -100)
+
+    both = group.nodes.new(type='FunctionNodeBooleanMath')
+    both.operation = 'AND'
+    both.location = (0, 0)
+
+    group_output = group.nodes.new(type='NodeGroupOutput')
+    group_output.location = (200, 0)
+
+    group.links.new(enabled.outputs['Boolean'], both.inputs[0])
+    group.links.new(is_viewport.outputs['Is Viewport'], both.inputs[1])
+    group.links.new(both.outputs['Boolean'], group_output.inputs['Proxy'])
+    return group
+
+
+def add_proxy_node(node_tree, location=(0, 0)):
+    proxy = node_tree.nodes.new(type='GeometryNodeGroup')
+    proxy.node_tree = proxy_group()
+    proxy.location = location
+    return proxy
+
+
+def proxy_value(node_tree, proxy, full, low, location=(0, 0)):
+    """
+    Math node giving `low` while the proxy is on and `full` otherwise
+    """
+    value = node_tree.nodes.new(type='ShaderNodeMath')
+    value.operation = 'MULTIPLY_ADD'
+    value.inputs[1].default_value = low - full
+    value.inputs[2].default_value = full
+    value.location = location
+    node_tree.links.new(proxy.outputs['Proxy'], value.inputs[0])
+    return value
+
+
+def geometry_node_setup(base_sphere, subdivisions=6, noise_range=15.0):
     # Add a Geometry Nodes modifier to the base sphere
     mod = base_sphere.modifiers.new(name="GeometryNodes", type='NODES')
     node_tree = bpy.data.node_groups.new(name="SpikeNodes", type='GeometryNodeTree')
@@ -189,9 +251,15 @@ def geometry_node_setup(base_sphere):
 
     # Create IcoSphere
     ico_sphere_node = node_tree.nodes.new(type='GeometryNodeMeshIcoSphere')
-    ico_sphere_node.inputs['Subdivisions'].default_value = 6
+    ico_sphere_node.inputs['Subdivisions'].default_value = subdivisions
     ico_sphere_node.location = (-100, 0)
 
+    # fewer subdivisions in the viewport while proxies are on
+    proxy = add_proxy_node(node_tree, location=(-500, 200))
+    proxy_subdivisions = proxy_value(node_tree, proxy, subdivisions, min(subdivisions, PROXY_SUBDIVISIONS),
+                                     location=(-300, 200))
+    node_tree.links.new(proxy_subdivisions.outputs['Value'], ico_sphere_node.inputs['Subdivisions'])
+
     # Create Extrude Mesh
     extrude_node = node_tree.nodes.new(type='GeometryNodeExtrudeMesh')
     extrude_node.location = (100, 30)
@@ -209,9 +277,9 @@ def geometry_node_setup(base_sphere):
     create_animation_loop(
         noise_tex_node.inputs["Scale"],
         "default_value",
-        start_value=-15.0,
+        start_value=-noise_range,
         mid_value=0.0,
-        end_value=15.0,
+        end_value=noise_range,
         start_frame=1
     )
 
@@ -242,18 +310,40 @@ def create_sphere_shader(sphere):
     sphere.data.materials.append(mat)
 
 
-def generate_spike_sphere():
+def generate_spike_sphere(subdivisions=6, noise_range=15.0):
     sphere = generate_sphere()
-    geometry_node_setup(sphere)
+    geometry_node_setup(sphere, subdivisions, noise_range)
     create_sphere_shader(sphere)
 
 
+def build(subdivisions=6, noise_range=15.0):
+    """
+    Build the scene without rendering it
+    """
+    scene_setup()
+    generate_spike_sphere(subdivisions, noise_range)
+
+
+def build_steps(subdivisions=6, noise_range=15.0):
+    """
+    build() as named steps, for incremental rebuilds with pipeline/reconcile.py
+    """
+    # values as scene_setup() uses them
+    return [
+        {"id": "output", "run": save_as_mp4},
+        {"id": "world", "run": create_world},
+        {"id": "lights", "run": add_lights},
+        {"id": "environment", "run": set_environment, "args": (90,), "depends": ("world",)},
+        {"id": "camera", "run": set_camera, "args": ((0.0, -11.0, 9.2), (math.radians(50), 0, 0))},
+        {"id": "sphere", "run": generate_spike_sphere, "args": (subdivisions, noise_range)},
+    ]
+
+
 def main():
     """
     Python code that creates a Spike Sphere
     """
-    scene_setup()
-    generate_spike_sphere()
+    build()
     render_loop()
     
 